@@ -0,0 +1,370 @@
+"""Times each phase of the exporter on a synthetic (or real) tree and saves the results as JSON.
+
+Usage:
+    python benchmarks/bench_phases.py --files 100000 --json-out new.json
+    python benchmarks/bench_phases.py --files 100000 --compare new.json   # exit code 1 on regressions
+    python benchmarks/bench_phases.py --folder /path/to/repo --ui skip
+
+Phases: walk (listing only), filter (exclusion matching), analyze (walk + filter, cold and with
+the directory index warm), classify (binary/size probe), select (bulk selection operations on the
+file store), ui_populate (file list, needs a display; --ui xvfb starts a virtual one), export,
+state_save and state_load. Each phase reports seconds,
+files/s, MB/s where bytes are involved, and peak RSS. On Linux the peak is reset before every phase,
+elsewhere it is the process peak so far.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dir_index import DirectoryIndex  # noqa: E402
+from exporter_core import (  # noqa: E402
+    build_matcher, build_state_data, load_blacklist, read_state_file, state_file_lists, write_export_bundle, write_state_file,
+)
+from file_probe import DEFAULT_MAX_FILE_BYTES  # noqa: E402
+from path_matcher import ExclusionMatcher  # noqa: E402
+from selection_model import FileStore  # noqa: E402
+from synthetic_repo import add_tree_arguments, generate_tree, tree_kwargs  # noqa: E402
+
+RESULTS_VERSION = 1
+UI_SCROLL_STEPS = 20 # Scroll positions rendered after populating the list
+
+
+def _reset_peak_rss():
+    """Resets the kernel's peak RSS counter (Linux only). Returns True if it worked."""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def _peak_rss_bytes():
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024 # macOS reports bytes, Linux KB
+
+
+class PhaseTimer:
+    def __init__(self, repeat):
+        self.repeat = repeat
+        self.phases = {}
+
+    def run(self, name, func, files=None, bytes_count=None):
+        """Runs func repeat times and records the best time. func may return (files, bytes) to override the counts."""
+        best = None
+        peak_rss = None
+        per_phase_peak = False
+        result = None
+        for _ in range(self.repeat):
+            per_phase_peak = _reset_peak_rss()
+            start = time.perf_counter()
+            result = func()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+            rss = _peak_rss_bytes()
+            peak_rss = rss if peak_rss is None or (rss or 0) > peak_rss else peak_rss
+        if isinstance(result, tuple):
+            files, bytes_count = result
+        phase = {'seconds': round(best, 6), 'files': files, 'peak_rss_bytes': peak_rss,
+                 'peak_rss_scope': 'phase' if per_phase_peak else 'process'}
+        if files is not None:
+            phase['files_per_s'] = round(files / best, 1) if best else None
+        if bytes_count is not None:
+            phase['bytes'] = bytes_count
+            phase['mb_per_s'] = round(bytes_count / (1024 * 1024) / best, 2) if best else None
+        self.phases[name] = phase
+        print(_format_phase(name, phase), flush=True)
+        return result
+
+
+def _format_phase(name, phase):
+    parts = [f"{name:<16} {phase['seconds']:9.3f}s"]
+    if phase.get('files_per_s') is not None:
+        parts.append(f"{phase['files_per_s']:>12,.0f} files/s")
+    if phase.get('mb_per_s') is not None:
+        parts.append(f"{phase['mb_per_s']:>9.1f} MB/s")
+    if phase.get('peak_rss_bytes'):
+        parts.append(f"peak {phase['peak_rss_bytes'] / (1024 * 1024):8.1f} MB ({phase['peak_rss_scope']})")
+    return "  ".join(parts)
+
+
+def _start_virtual_display():
+    """Starts Xvfb on a free display number. Returns the process, or raises RuntimeError."""
+    xvfb = shutil.which('Xvfb')
+    if xvfb is None:
+        raise RuntimeError("Xvfb is not installed")
+    for display in range(99, 120):
+        if os.path.exists(f"/tmp/.X{display}-lock"):
+            continue
+        process = subprocess.Popen([xvfb, f":{display}", "-screen", "0", "1280x1024x24", "-nolisten", "tcp"],
+                                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        for _ in range(50):
+            if os.path.exists(f"/tmp/.X11-unix/X{display}"):
+                os.environ['DISPLAY'] = f":{display}"
+                return process
+            if process.poll() is not None:
+                break
+            time.sleep(0.1)
+        process.kill()
+    raise RuntimeError("could not start Xvfb")
+
+
+def _bench_ui(timer, folder, index_dir, relative_paths):
+    """Times what _populate_file_list_ui and the first screens of scrolling cost. Returns a skip reason or None."""
+    try:
+        import tkinter as tk
+        root = tk.Tk()
+    except Exception as e: # ImportError without Tk, TclError without a display
+        return f"no display or Tk ({e})"
+    try:
+        from file_list_view import VirtualFileList
+        from selection_model import FileStore
+        from token_budget import TokenEstimator
+        root.geometry("900x700")
+        view = VirtualFileList(root)
+        view.pack(fill='both', expand=True)
+        root.update()
+        estimator = TokenEstimator()
+        index = DirectoryIndex(folder, index_dir)
+        index.load()
+
+        def populate():
+            records = []
+            for relative_path in relative_paths:
+                stat = index.file_stat(relative_path)
+                tokens = estimator.heuristic(relative_path, stat[0]) if stat else None
+                records.append((relative_path, False, tokens, None))
+            store = FileStore(records)
+            view.set_store(store)
+            root.update()
+            for step in range(1, UI_SCROLL_STEPS + 1):
+                view.yview('moveto', step / UI_SCROLL_STEPS)
+                root.update()
+            return len(store), None
+
+        timer.run('ui_populate', populate)
+    finally:
+        root.destroy()
+    return None
+
+
+def _git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(args, folder, scratch, manifest):
+    timer = PhaseTimer(args.repeat)
+    if manifest:
+        blacklist = manifest['blacklist']
+    else:
+        try:
+            blacklist = load_blacklist()
+        except OSError:
+            blacklist = []
+    exclude_strings = args.exclude_strings if args.exclude_strings is not None else (manifest or {}).get('exclude_strings', '')
+    matcher = build_matcher(blacklist, exclude_strings, args.exclude_extensions)
+    nothing_excluded = ExclusionMatcher()
+    index_dir = os.path.join(scratch, "index")
+
+    def walk():
+        index = DirectoryIndex(folder, index_dir)
+        paths = list(index.iter_files(nothing_excluded, threading.Event()))
+        return len(paths), None
+    timer.run('walk', walk)
+
+    all_paths = list(DirectoryIndex(folder, index_dir).iter_files(nothing_excluded, threading.Event()))
+
+    def filter_paths():
+        excludes_path = matcher.excludes_path
+        return len(all_paths) - sum(1 for p in all_paths if excludes_path(p)), None
+    timer.run('filter', filter_paths, files=len(all_paths))
+
+    listed = []
+
+    def analyze_cold():
+        index = DirectoryIndex(folder, index_dir)
+        listed[:] = index.iter_files(matcher, threading.Event())
+        index.save()
+        return len(listed), None
+    timer.run('analyze_cold', analyze_cold)
+
+    def analyze_warm():
+        index = DirectoryIndex(folder, index_dir)
+        index.load()
+        return len(list(index.iter_files(matcher, threading.Event()))), None
+    # The index only trusts directories older than its scan by MTIME_RACE_WINDOW_NS; a fresh tree needs a moment
+    if manifest:
+        time.sleep(2.1)
+        analyze_cold()
+    timer.run('analyze_warm', analyze_warm)
+
+    def classify():
+        index = DirectoryIndex(folder, index_dir)
+        list(index.iter_files(matcher, threading.Event())) # Fresh listing, so nothing is classified yet
+        for relative_path in listed:
+            index.classify(relative_path, DEFAULT_MAX_FILE_BYTES)
+        return len(listed), None
+    timer.run('classify', classify)
+
+    def select():
+        # One of each bulk operation the file list buttons run, plus what every toggle recomputes
+        store = FileStore((relative_path, False, 1, None) for relative_path in listed)
+        store.select_type('py')
+        store.invert()
+        store.set_positions(store.index.search('substring', 'test'), False)
+        store.selected_count()
+        store.selected_tokens()
+        store.selected_paths()
+        store.select_all()
+        store.clear()
+        return len(store), None
+    timer.run('select', select)
+
+    if args.ui == 'skip':
+        timer.phases['ui_populate'] = {'skipped': "--ui skip"}
+    else:
+        skip_reason = _bench_ui(timer, folder, index_dir, listed)
+        if skip_reason:
+            print(f"{'ui_populate':<16} skipped: {skip_reason}")
+            timer.phases['ui_populate'] = {'skipped': skip_reason}
+
+    export_paths = listed[:args.export_files] if args.export_files else listed
+    output_path = os.path.join(scratch, "bundle.txt")
+
+    def export():
+        exported_count, _errors, _committed = write_export_bundle(folder, export_paths, output_path)
+        return exported_count, os.path.getsize(output_path)
+    timer.run('export', export)
+
+    state_path = os.path.join(scratch, "state.llmexport")
+    selected = listed[::2]
+
+    def state_save():
+        state_data = build_state_data(folder, output_path, exclude_strings, args.exclude_extensions, '*', listed, selected)
+        write_state_file(state_path, state_data)
+        return len(listed), os.path.getsize(state_path)
+    timer.run('state_save', state_save)
+
+    def state_load():
+        analyzed, _selected = state_file_lists(read_state_file(state_path))
+        return len(analyzed), os.path.getsize(state_path)
+    timer.run('state_load', state_load)
+
+    return timer.phases
+
+
+def compare_results(baseline, current, threshold):
+    """Prints per-phase changes. Returns the names of phases slower than baseline by more than threshold."""
+    regressions = []
+    print(f"\n{'phase':<16} {'baseline':>10} {'current':>10} {'change':>8}")
+    for name, phase in current['phases'].items():
+        old = baseline.get('phases', {}).get(name)
+        if not old or 'seconds' not in old or 'seconds' not in phase:
+            continue
+        change = (phase['seconds'] - old['seconds']) / old['seconds'] if old['seconds'] else 0.0
+        flag = ""
+        if change > threshold:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"{name:<16} {old['seconds']:9.3f}s {phase['seconds']:9.3f}s {change:+8.1%}{flag}")
+    if baseline.get('tree') != current.get('tree'):
+        print("Note: the baseline was run on a different tree, compare with care.")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--folder", help="Existing folder to benchmark instead of a synthetic tree")
+    add_tree_arguments(parser)
+    parser.add_argument("--exclude-strings", help="Exclusions for the filter/analyze phases "
+                                                  "(default: the synthetic tree's node_modules)")
+    parser.add_argument("--exclude-extensions", default="", help="Comma separated extensions to exclude")
+    parser.add_argument("--export-files", type=int, default=0, help="Export only the first N listed files (0: all)")
+    parser.add_argument("--ui", choices=('auto', 'skip', 'xvfb'), default='auto',
+                        help="auto uses the current display if there is one, xvfb starts a virtual display")
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per phase, the best is reported")
+    parser.add_argument("--json-out", metavar="PATH", help="Save the results as JSON")
+    parser.add_argument("--compare", metavar="PATH", help="Earlier --json-out results to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="Relative slowdown counted as a regression with --compare (default 0.10)")
+    args = parser.parse_args()
+
+    xvfb_process = None
+    if args.ui == 'xvfb' and not os.environ.get('DISPLAY'):
+        try:
+            xvfb_process = _start_virtual_display()
+        except RuntimeError as e:
+            print(f"Virtual display unavailable, UI phase will be skipped: {e}")
+
+    try:
+        with tempfile.TemporaryDirectory() as scratch:
+            manifest = None
+            if args.folder:
+                folder = os.path.abspath(args.folder)
+                tree = {'folder': folder}
+            else:
+                folder = os.path.join(scratch, "tree")
+                start = time.perf_counter()
+                manifest = generate_tree(folder, **tree_kwargs(args))
+                print(f"generated {manifest['files']} files, {manifest['total_bytes'] / (1024 * 1024):.1f} MB "
+                      f"in {manifest['directories']} folders ({time.perf_counter() - start:.1f}s)")
+                tree = {'synthetic': manifest['params'], 'files': manifest['files'], 'total_bytes': manifest['total_bytes']}
+            phases = run_benchmarks(args, folder, scratch, manifest)
+    finally:
+        if xvfb_process is not None:
+            xvfb_process.terminate()
+
+    results = {
+        'version': RESULTS_VERSION,
+        'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+        'git_revision': _git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'tree': tree,
+        'repeat': args.repeat,
+        'phases': phases,
+    }
+    if args.json_out:
+        with open(args.json_out, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=4)
+        print(f"Results saved to {args.json_out}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare_results(baseline, results, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} phase(s) slower than the baseline by more than {args.threshold:.0%}: "
+                  + ", ".join(regressions))
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,148 @@
+"""Generates reproducible synthetic codebases for the benchmarks.
+
+    python benchmarks/synthetic_repo.py /tmp/tree --files 100000 --depth 4 --fanout 8
+
+The tree mixes source files spread over a directory hierarchy with node_modules-style noise
+(deep, many small files) and paths that the generated blacklist excludes, so the exclusion
+logic has real work to do. The same arguments and seed always produce the same tree.
+"""
+import argparse
+import json
+import math
+import os
+import random
+
+SOURCE_EXTENSIONS = ('py', 'js', 'ts', 'md', 'json', 'css', 'txt', 'yml')
+NOISE_DIR = "node_modules"
+BLACKLISTED_DIRS = ("build", "dist", ".cache")
+SIZE_DISTRIBUTIONS = ('fixed', 'lognormal', 'pareto')
+_LINE = "def function_{0}(value):\n    return value * {0}  # synthetic line\n"
+
+
+def _content_pool(max_size):
+    """One block of source-looking text; files are slices of it so generation stays I/O bound."""
+    lines = []
+    size = 0
+    i = 0
+    while size < max_size:
+        line = _LINE.format(i)
+        lines.append(line)
+        size += len(line)
+        i += 1
+    return "".join(lines).encode('ascii')
+
+
+def _file_size(rng, distribution, mean_size, max_size):
+    if distribution == 'fixed':
+        size = mean_size
+    elif distribution == 'lognormal':
+        sigma = 1.0
+        size = rng.lognormvariate(math.log(mean_size) - sigma * sigma / 2, sigma)
+    else:
+        alpha = 1.5 # Few huge files, many small ones, like real repositories
+        size = (rng.paretovariate(alpha) - 1) * mean_size * (alpha - 1) + 1
+    return max(1, min(int(size), max_size))
+
+
+def _directories(depth, fanout):
+    """Every directory of a tree with the given depth and fan-out, '' being the root."""
+    dirs = ['']
+    level = ['']
+    for d in range(depth):
+        level = [f"{parent}/dir{d}_{i}".lstrip('/') for parent in level for i in range(fanout)]
+        dirs.extend(level)
+    return dirs
+
+
+def generate_tree(root, files=10000, depth=3, fanout=6, size_distribution='lognormal', mean_size=4096,
+                  max_size=1024 * 1024, noise_ratio=0.3, blacklist_ratio=0.1, seed=1):
+    """Writes files to root and returns a manifest dict describing the tree.
+
+    noise_ratio of the files go into node_modules trees, blacklist_ratio into directories
+    listed in manifest['blacklist']; the rest are regular source files.
+    """
+    if size_distribution not in SIZE_DISTRIBUTIONS:
+        raise ValueError(f"size_distribution must be one of {SIZE_DISTRIBUTIONS}")
+    rng = random.Random(seed)
+    pool = _content_pool(max_size)
+    source_dirs = _directories(depth, fanout)
+    noise_count = int(files * noise_ratio)
+    blacklisted_count = int(files * blacklist_ratio)
+    source_count = files - noise_count - blacklisted_count
+
+    counts = {'source': 0, 'noise': 0, 'blacklisted': 0}
+    total_bytes = 0
+    created_dirs = set()
+
+    def write(relative_path, category):
+        nonlocal total_bytes
+        full_path = os.path.join(root, relative_path)
+        parent = os.path.dirname(full_path)
+        if parent not in created_dirs:
+            os.makedirs(parent, exist_ok=True)
+            created_dirs.add(parent)
+        size = _file_size(rng, size_distribution, mean_size, max_size)
+        with open(full_path, 'wb') as f:
+            f.write(pool[:size])
+        counts[category] += 1
+        total_bytes += size
+
+    for i in range(source_count):
+        directory = source_dirs[rng.randrange(len(source_dirs))]
+        extension = SOURCE_EXTENSIONS[rng.randrange(len(SOURCE_EXTENSIONS))]
+        write(f"{directory}/module_{i}.{extension}".lstrip('/'), 'source')
+    for i in range(noise_count):
+        # Packages of ~40 files nested a few levels, like an installed dependency tree
+        package = i // 40
+        write(f"{NOISE_DIR}/pkg{package}/lib/sub{i % 4}/file_{i}.js", 'noise')
+    for i in range(blacklisted_count):
+        directory = BLACKLISTED_DIRS[i % len(BLACKLISTED_DIRS)]
+        write(f"{directory}/out{i % 16}/artifact_{i}.js", 'blacklisted')
+
+    return {
+        'root': os.path.abspath(root),
+        'files': files,
+        'counts': counts,
+        'total_bytes': total_bytes,
+        'directories': len(created_dirs),
+        'blacklist': list(BLACKLISTED_DIRS),
+        'exclude_strings': NOISE_DIR,
+        'params': {
+            'depth': depth, 'fanout': fanout, 'size_distribution': size_distribution, 'mean_size': mean_size,
+            'max_size': max_size, 'noise_ratio': noise_ratio, 'blacklist_ratio': blacklist_ratio, 'seed': seed,
+        },
+    }
+
+
+def add_tree_arguments(parser):
+    """Generator options shared by the benchmark scripts."""
+    parser.add_argument("--files", type=int, default=10000, help="Total file count (1k to 1M is sensible)")
+    parser.add_argument("--depth", type=int, default=3, help="Directory depth of the source tree")
+    parser.add_argument("--fanout", type=int, default=6, help="Subdirectories per directory")
+    parser.add_argument("--size-distribution", choices=SIZE_DISTRIBUTIONS, default='lognormal')
+    parser.add_argument("--mean-size", type=int, default=4096, help="Mean file size in bytes")
+    parser.add_argument("--max-size", type=int, default=1024 * 1024, help="Largest file size in bytes")
+    parser.add_argument("--noise-ratio", type=float, default=0.3, help="Share of files in node_modules")
+    parser.add_argument("--blacklist-ratio", type=float, default=0.1, help="Share of files in blacklisted dirs")
+    parser.add_argument("--seed", type=int, default=1)
+
+
+def tree_kwargs(args):
+    return {
+        'files': args.files, 'depth': args.depth, 'fanout': args.fanout,
+        'size_distribution': args.size_distribution, 'mean_size': args.mean_size, 'max_size': args.max_size,
+        'noise_ratio': args.noise_ratio, 'blacklist_ratio': args.blacklist_ratio, 'seed': args.seed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("root", help="Folder to create the tree in")
+    add_tree_arguments(parser)
+    args = parser.parse_args()
+    manifest = generate_tree(args.root, **tree_kwargs(args))
+    print(json.dumps(manifest, indent=4))
+
+
+if __name__ == '__main__':
+    main()
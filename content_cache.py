@@ -0,0 +1,140 @@
+"""In-memory cache of rendered export blocks, so repeated exports only re-read changed files."""
+import hashlib
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+DEFAULT_CACHE_MAX_BYTES = 256 * 1024 * 1024
+DIGEST_CHUNK_BYTES = 1024 * 1024
+
+
+def content_digest(raw_bytes):
+    """Digest used to recognise unchanged content whose stat changed (touch, checkout, copy)."""
+    return hashlib.blake2b(raw_bytes, digest_size=16).digest()
+
+
+def file_digest(full_path):
+    """content_digest of a file's bytes, read in chunks so big files don't have to fit in memory. Raises OSError."""
+    hasher = hashlib.blake2b(digest_size=16)
+    with open(full_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(DIGEST_CHUNK_BYTES), b''):
+            hasher.update(chunk)
+    return hasher.digest()
+
+
+class ContentCache:
+    """Bounded LRU of rendered export blocks (any output format) keyed by the caller's file key.
+
+    An entry is valid while the file's (size, mtime_ns) is unchanged. When the caller also passes
+    the digest of the file's raw bytes, a digest match counts instead, which catches rewrites that
+    keep size and mtime and reuses blocks for files that were only touched. Entries are evicted
+    least recently used first once max_bytes (measured with sys.getsizeof) is exceeded.
+    Safe to share between the export reader threads.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_CACHE_MAX_BYTES, verify_hash=False):
+        self.max_bytes = max_bytes
+        self.verify_hash = verify_hash # Tells the exporter to read and hash files even when their stat matches
+        self.entries = OrderedDict() # file key -> (stat_key, digest, block, block_bytes)
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def get(self, key, stat_key, digest=None):
+        """The cached block for key, or None if missing or out of date."""
+        return self.lookup(key, stat_key, digest)[0]
+
+    def lookup(self, key, stat_key, digest=None):
+        """(block, digest stored with it) for key, or (None, None) if missing or out of date."""
+        with self.lock:
+            entry = self.entries.get(key)
+            valid = entry is not None and (entry[1] == digest if digest is not None else entry[0] == stat_key)
+            if not valid:
+                self.misses += 1
+                return None, None
+            if entry[0] != stat_key:
+                self.entries[key] = (stat_key,) + entry[1:] # Same content, newer stat
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[2], entry[1]
+
+    def put(self, key, stat_key, block, digest=None):
+        block_bytes = sys.getsizeof(block)
+        with self.lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.current_bytes -= old[3]
+            if block_bytes > self.max_bytes:
+                return # Would evict everything else and still not fit
+            self.entries[key] = (stat_key, digest, block, block_bytes)
+            self.current_bytes += block_bytes
+            while self.current_bytes > self.max_bytes:
+                _path, evicted = self.entries.popitem(last=False)
+                self.current_bytes -= evicted[3]
+                self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.current_bytes = 0
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'entries': len(self.entries),
+                'bytes': self.current_bytes,
+                'max_bytes': self.max_bytes,
+            }
+
+
+class DuplicateTracker:
+    """Finds files whose content was already exported, for one export run.
+
+    Prefetched files are checked by the content_digest the reader computed anyway. Streamed (large)
+    files are only hashed when an earlier streamed file has the same size, since only those can match;
+    the earlier one is then hashed on demand too. duplicates lists (path, original_path) pairs found.
+    """
+
+    def __init__(self):
+        self.first_paths = {} # digest -> first exported path with that content
+        self.streamed_by_size = {} # size -> [[path, full_path, digest or None], ...]
+        self.duplicates = []
+        self.saved_bytes = 0
+
+    def check(self, path, digest, size):
+        """The earlier path with this content, or None after recording path as the first one."""
+        original = self.first_paths.setdefault(digest, path)
+        if original == path:
+            return None
+        self.duplicates.append((path, original))
+        self.saved_bytes += size
+        return original
+
+    def check_streamed(self, path, full_path, size):
+        """(earlier path with the same content or None, digest or None) for a file too big to have been read yet.
+
+        Unlike check, the file is not recorded; call record_streamed once its block was written. Raises OSError.
+        """
+        candidates = self.streamed_by_size.get(size)
+        if not candidates:
+            return None, None
+        digest = file_digest(full_path)
+        for candidate in candidates:
+            if candidate[2] is None:
+                candidate[2] = file_digest(candidate[1])
+            if candidate[2] == digest:
+                self.duplicates.append((path, candidate[0]))
+                self.saved_bytes += size
+                return candidate[0], digest
+        return None, digest
+
+    def record_streamed(self, path, full_path, size, digest=None):
+        self.streamed_by_size.setdefault(size, []).append([path, full_path, digest])
@@ -0,0 +1,227 @@
+"""Delta exports: only the files added, modified or removed since the last export or since a git revision.
+
+Exports record an ExportSnapshot of what they wrote as JSON in the index cache dir: each file's size,
+mtime_ns and content_digest as the export read them (write_export_bundle's records), plus, when diffs
+were asked for, a zlib-compressed copy of the bytes it read so a later delta can be written as unified
+diffs. Comparing a selection with the snapshot stats every file and only reads the ones whose size or
+mtime changed, so a file that was merely touched still counts as unchanged. Against a git revision,
+`git diff --name-status` makes the same comparison with git's own stat cache.
+"""
+import json
+import os
+import tempfile
+import time
+import zlib
+
+from content_cache import file_digest
+from dir_index import INDEX_CACHE_DIR, MTIME_RACE_WINDOW_NS, cache_file_path, make_cache_dir
+from exporter_core import decode_export_bytes
+from git_index import read_revision_files, revision_changes, revision_paths
+
+SNAPSHOT_VERSION = 2
+LAST_EXPORT_LABEL = "last export"
+
+
+class ExportSnapshot:
+    """The files of one folder as the last export saw them. Use from one thread, except store_content.
+
+    files maps a relative path to (size, mtime_ns, digest), digest None for big files the export streamed
+    without hashing (any stat change then counts as modified). Contents are stored once per digest in a
+    directory next to the snapshot file and pruned when the snapshot no longer refers to them. Only files
+    the export prefetched pass through store_content, so bigger ones are written whole in diffs.
+    """
+
+    def __init__(self, folder, cache_dir=INDEX_CACHE_DIR):
+        self.folder = os.path.abspath(folder)
+        self.cache_dir = cache_dir
+        self.snapshot_path = cache_file_path(self.folder, cache_dir, ".snapshot")
+        self.content_dir = cache_file_path(self.folder, cache_dir, ".contents")
+        self.files = {}
+        self.taken_at_ns = 0
+        self.compared_at_ns = 0 # When the last compare() started, the start of a delta export
+        self.exists = False # True once loaded from or saved to disk
+
+    def load(self):
+        """Reads the snapshot file. Returns False, leaving the snapshot empty, if it is missing, stale or corrupt."""
+        try:
+            with open(self.snapshot_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if (not isinstance(data, dict) or data.get('version') != SNAPSHOT_VERSION
+                    or data.get('folder') != self.folder or not isinstance(data.get('files'), dict)):
+                raise ValueError("snapshot was written for another folder or version")
+            taken_at_ns = int(data['taken_at_ns'])
+            files = {relative_path: (int(size), int(mtime_ns), bytes.fromhex(digest) if digest is not None else None)
+                     for relative_path, (size, mtime_ns, digest) in data['files'].items()}
+        except FileNotFoundError:
+            return False
+        except Exception as e:
+            print(f"Discarding unreadable export snapshot {self.snapshot_path}: {e}")
+            return False
+        self.files = files
+        self.taken_at_ns = taken_at_ns
+        self.exists = True
+        return True
+
+    def save(self):
+        """Atomically writes the snapshot, then deletes stored contents it no longer refers to."""
+        make_cache_dir(self.cache_dir)
+        fd, temp_path = tempfile.mkstemp(prefix=".snapshot.", suffix=".tmp", dir=self.cache_dir)
+        try:
+            with open(fd, 'w', encoding='utf-8') as f:
+                files = {relative_path: (size, mtime_ns, digest.hex() if digest is not None else None)
+                         for relative_path, (size, mtime_ns, digest) in self.files.items()}
+                json.dump({'version': SNAPSHOT_VERSION, 'folder': self.folder, 'taken_at_ns': self.taken_at_ns,
+                           'files': files}, f, separators=(',', ':'))
+            os.replace(temp_path, self.snapshot_path)
+        except BaseException:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            raise
+        self.exists = True
+        referenced = {record[2].hex() for record in self.files.values() if record[2] is not None}
+        try:
+            stored = os.listdir(self.content_dir)
+        except OSError:
+            return
+        for name in stored:
+            if name not in referenced:
+                try:
+                    os.remove(os.path.join(self.content_dir, name))
+                except OSError:
+                    pass
+
+    def read_content(self, digest):
+        """The stored bytes with this digest, or None if they weren't kept (or the file wasn't hashed)."""
+        if digest is None:
+            return None
+        try:
+            with open(os.path.join(self.content_dir, digest.hex()), 'rb') as f:
+                return zlib.decompress(f.read())
+        except (OSError, zlib.error):
+            return None
+
+    def store_content(self, digest, raw_bytes):
+        """Keeps a file's bytes for diffs; the keep_content of write_export_bundle, safe from its reader threads."""
+        content_path = os.path.join(self.content_dir, digest.hex())
+        if os.path.exists(content_path):
+            return
+        make_cache_dir(self.content_dir)
+        fd, temp_path = tempfile.mkstemp(prefix=".content.", suffix=".tmp", dir=self.content_dir)
+        try:
+            with open(fd, 'wb') as f:
+                f.write(zlib.compress(raw_bytes))
+            os.replace(temp_path, content_path)
+        except BaseException:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            raise
+
+    def compare(self, relative_paths):
+        """How relative_paths differ from the snapshot.
+
+        Returns {'added', 'modified', 'removed': paths, 'records': {path: (size, mtime_ns, digest)}}. Only
+        files whose stat differs from their record (or that changed around the time the snapshot was
+        taken) are read. removed are snapshot files that no longer exist, selected or not; unreadable
+        files are left out of everything.
+        """
+        self.compared_at_ns = time.time_ns()
+        trusted_before_ns = self.taken_at_ns - MTIME_RACE_WINDOW_NS
+        records = {}
+        added = []
+        modified = []
+        for relative_path in relative_paths:
+            full_path = os.path.join(self.folder, relative_path)
+            try:
+                st = os.stat(full_path)
+            except OSError:
+                continue
+            record = self.files.get(relative_path)
+            if record is not None and record[:2] == (st.st_size, st.st_mtime_ns) and st.st_mtime_ns < trusted_before_ns:
+                records[relative_path] = record
+                continue
+            try:
+                digest = file_digest(full_path)
+            except OSError:
+                continue
+            records[relative_path] = (st.st_size, st.st_mtime_ns, digest)
+            if record is None:
+                added.append(relative_path)
+            elif record[2] != digest:
+                modified.append(relative_path)
+        removed = [relative_path for relative_path in self.files
+                   if relative_path not in records and not os.path.lexists(os.path.join(self.folder, relative_path))]
+        return {'added': added, 'modified': modified, 'removed': removed, 'records': records}
+
+    def record(self, records, started_at_ns, removed=(), replace=False):
+        """Takes the records write_export_bundle filled: all files of a full export (replace), or a delta's changes.
+
+        started_at_ns is time.time_ns() from before any file was read: before the export, or compared_at_ns
+        for a delta.
+        """
+        self.files = dict(records) if replace else {**self.files, **records}
+        for relative_path in removed:
+            self.files.pop(relative_path, None)
+        self.taken_at_ns = started_at_ns
+
+
+def _old_texts(old_bytes):
+    """Decoded old contents for diff blocks; binary ones are left out and written whole."""
+    old_texts = {}
+    for relative_path, raw_bytes in old_bytes.items():
+        try:
+            old_texts[relative_path] = decode_export_bytes(raw_bytes)
+        except ValueError:
+            pass
+    return old_texts
+
+
+def snapshot_delta(snapshot, relative_paths, as_diffs=False):
+    """The delta export of relative_paths since snapshot (load()ed), see revision_delta for the result.
+
+    Once the delta was exported, snapshot.record() takes its records with snapshot.compared_at_ns.
+    """
+    comparison = snapshot.compare(relative_paths)
+    changed = set(comparison['added']) | set(comparison['modified'])
+    diff = None
+    if as_diffs:
+        old_bytes = {}
+        for relative_path in comparison['modified']:
+            raw_bytes = snapshot.read_content(snapshot.files[relative_path][2])
+            if raw_bytes is not None:
+                old_bytes[relative_path] = raw_bytes
+        diff = (_old_texts(old_bytes), LAST_EXPORT_LABEL)
+    return {
+        'since': LAST_EXPORT_LABEL,
+        'paths': [relative_path for relative_path in relative_paths if relative_path in changed],
+        'added': comparison['added'],
+        'modified': comparison['modified'],
+        'removed': comparison['removed'],
+        'diff': diff,
+    }
+
+
+def revision_delta(folder, revision, relative_paths, as_diffs=False):
+    """The delta export of relative_paths since a git revision. Raises git_index.GitIndexError.
+
+    Returns {'since': label, 'paths': added and modified files in selection order, 'added', 'modified',
+    'removed': deleted files under folder, 'diff': the diff argument of write_export_bundle or None}.
+    """
+    changes = revision_changes(folder, revision)
+    at_revision = set(revision_paths(folder, revision))
+    added = [relative_path for relative_path in relative_paths if relative_path not in at_revision]
+    modified = [relative_path for relative_path in relative_paths
+                if relative_path in at_revision and changes.get(relative_path) in ('M', 'T')]
+    changed = set(added) | set(modified)
+    diff = (_old_texts(read_revision_files(folder, revision, modified)), revision) if as_diffs else None
+    return {
+        'since': revision,
+        'paths': [relative_path for relative_path in relative_paths if relative_path in changed],
+        'added': added,
+        'modified': modified,
+        'removed': [relative_path for relative_path, status in changes.items() if status == 'D'],
+        'diff': diff,
+    }
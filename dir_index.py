@@ -0,0 +1,349 @@
+import hashlib
+import json
+import os
+import tempfile
+import time
+from time import perf_counter
+
+from file_probe import KIND_TOO_LARGE, probe_file
+
+INDEX_VERSION = 3
+# Directory mtimes this close to the previous scan may hide a change made in the same tick; rescan those
+MTIME_RACE_WINDOW_NS = 2 * 1000 * 1000 * 1000
+
+
+def user_cache_dir():
+    """The per-user directory for cache files: %LOCALAPPDATA% on Windows, else $XDG_CACHE_HOME or ~/.cache."""
+    if os.name == 'nt':
+        base = os.environ.get('LOCALAPPDATA') or os.path.join(os.path.expanduser('~'), 'AppData', 'Local')
+    else:
+        base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'llm-code-exporter')
+
+
+INDEX_CACHE_DIR = user_cache_dir() # One file per analyzed folder, not in the working directory others may write to
+
+
+def make_cache_dir(cache_dir):
+    """Creates cache_dir readable by the current user only (where the platform has modes)."""
+    os.makedirs(cache_dir, mode=0o700, exist_ok=True)
+
+
+def _file_record(st, previous):
+    """Index record of a file with stat result st, keeping previous's classification if the file is unchanged."""
+    stat_key = (st.st_size, st.st_mtime_ns)
+    if previous is not None and previous[:2] == stat_key:
+        return previous
+    return stat_key + (None, None)
+
+
+def cache_file_path(folder, cache_dir, extension):
+    """Path of one analyzed folder's cache file in cache_dir, named after a hash of the folder."""
+    folder_key = hashlib.sha1(os.path.normcase(os.path.abspath(folder)).encode('utf-8')).hexdigest()[:16]
+    return os.path.join(cache_dir, folder_key + extension)
+
+
+class DirectoryIndex:
+    """On-disk cache of one folder's tree, used to re-analyze without re-listing unchanged directories.
+
+    Stored as JSON in the per-user cache dir, so loading an index never runs code from it.
+
+    dirs maps a '/'-separated relative directory ('' for the root) to
+    (dir_mtime_ns, subdir_names, {file_name: (size, mtime_ns, kind, encoding) or None}),
+    kind/encoding being file_probe's classification or None until classify() probed the file.
+    Only directories the last scan visited are kept, so excluded subtrees cost nothing. A directory's
+    mtime changes when entries are added, removed or renamed, not when a file's content changes, so an
+    unchanged directory is not listed again but each of its files is still stat'ed, and keeps its
+    classification only while its own size and mtime match.
+
+    An index filled by iter_listed_files (source 'git') only knows the listed files and no subdirectories,
+    so it is kept in its own file and never used for a walk.
+    """
+
+    def __init__(self, folder, cache_dir=INDEX_CACHE_DIR, source='walk'):
+        self.folder = os.path.abspath(folder)
+        self.cache_dir = cache_dir
+        self.source = source
+        self.index_path = cache_file_path(self.folder, cache_dir, ".idx" if source == 'walk' else f".{source}.idx")
+        self.dirs = {}
+        self.scanned_at_ns = 0 # When the scan that produced self.dirs started
+        self.complete = False # True once iter_files ran to the end without being cancelled
+        self.dirs_reused = 0
+        self.dirs_scanned = 0
+
+    def load(self):
+        """Reads the index file. Returns False, leaving the index empty, if it is missing, stale or corrupt."""
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if (not isinstance(data, dict) or data.get('version') != INDEX_VERSION
+                    or data.get('folder') != self.folder or data.get('source', 'walk') != self.source
+                    or not isinstance(data.get('dirs'), dict)):
+                raise ValueError("index was written for another folder or version")
+            scanned_at_ns = int(data['scanned_at_ns'])
+            # JSON has lists where the index uses tuples
+            dirs = {rel_dir: (dir_mtime_ns, tuple(subdirs),
+                              {name: tuple(record) if record is not None else None for name, record in files.items()})
+                    for rel_dir, (dir_mtime_ns, subdirs, files) in data['dirs'].items()}
+        except FileNotFoundError:
+            return False
+        except Exception as e:
+            print(f"Discarding unreadable directory index {self.index_path}: {e}")
+            return False
+        self.dirs = dirs
+        self.scanned_at_ns = scanned_at_ns
+        return True
+
+    def save(self):
+        """Atomically writes the index; only call after a complete scan."""
+        make_cache_dir(self.cache_dir)
+        fd, temp_path = tempfile.mkstemp(prefix=".index.", suffix=".tmp", dir=self.cache_dir)
+        try:
+            with open(fd, 'w', encoding='utf-8') as f:
+                json.dump({
+                    'version': INDEX_VERSION,
+                    'folder': self.folder,
+                    'source': self.source,
+                    'scanned_at_ns': self.scanned_at_ns,
+                    'dirs': self.dirs,
+                }, f, separators=(',', ':'))
+            os.replace(temp_path, self.index_path)
+        except BaseException:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            raise
+
+    def file_stat(self, relative_path):
+        """(size, mtime_ns) recorded for relative_path, or None if unknown."""
+        rel_dir, _sep, name = relative_path.rpartition('/')
+        entry = self.dirs.get(rel_dir)
+        record = entry[2].get(name) if entry else None
+        return record[:2] if record else None
+
+    def classify(self, relative_path, max_file_bytes):
+        """(kind, encoding) for a listed file, probing its first bytes only if the index has no result yet.
+
+        Files above max_file_bytes are KIND_TOO_LARGE without being opened. Returns (None, None) for
+        files that can't be stat'ed or read.
+        """
+        rel_dir, _sep, name = relative_path.rpartition('/')
+        entry = self.dirs.get(rel_dir)
+        record = entry[2].get(name) if entry else None
+        if record is None:
+            return None, None
+        size, mtime_ns, kind, encoding = record
+        if max_file_bytes is not None and size > max_file_bytes:
+            return KIND_TOO_LARGE, None
+        if kind is None:
+            try:
+                kind, encoding = probe_file(os.path.join(self.folder, relative_path), size, None)
+            except OSError:
+                return None, None
+            entry[2][name] = (size, mtime_ns, kind, encoding)
+        return kind, encoding
+
+    def _list_dir(self, rel_dir):
+        """Returns the (possibly cached) entry for rel_dir, or None if it can't be read."""
+        full_dir = os.path.join(self.folder, rel_dir) if rel_dir else self.folder
+        try:
+            dir_mtime_ns = os.stat(full_dir).st_mtime_ns
+        except OSError:
+            return None
+
+        reusable, cached_subdirs, previous_files = self._cached_entry(rel_dir, dir_mtime_ns)
+        if reusable:
+            self.dirs_reused += 1
+            return (dir_mtime_ns, cached_subdirs, self._restat(full_dir, previous_files, previous_files))
+
+        subdirs = []
+        files = {}
+        try:
+            with os.scandir(full_dir) as entries:
+                for entry in entries:
+                    try:
+                        is_dir = entry.is_dir()
+                    except OSError:
+                        is_dir = False
+                    if is_dir:
+                        if not entry.is_symlink(): # Like os.walk, don't descend into linked directories
+                            subdirs.append(entry.name)
+                        continue
+                    try:
+                        files[entry.name] = _file_record(entry.stat(), previous_files.get(entry.name))
+                    except OSError:
+                        files[entry.name] = None # Broken link and the like, still listed like os.walk does
+        except OSError:
+            return None # Unreadable directory, skipped like os.walk does
+        self.dirs_scanned += 1
+        return (dir_mtime_ns, tuple(subdirs), files)
+
+    def _cached_entry(self, rel_dir, dir_mtime_ns):
+        """(reusable, subdirs, files) of the cached entry for rel_dir, files holding only well-formed records.
+
+        reusable if the directory's listing is unchanged since the last scan and the entry is intact; the
+        file records still have to be checked with _restat.
+        """
+        cached = self.dirs.get(rel_dir)
+        if not (isinstance(cached, tuple) and len(cached) == 3 and isinstance(cached[1], tuple) and isinstance(cached[2], dict)):
+            return False, (), {} # Missing or malformed
+        cached_mtime_ns, subdirs, files = cached
+        valid_files = {name: record for name, record in files.items()
+                       if record is None or (isinstance(record, tuple) and len(record) == 4)}
+        reusable = (cached_mtime_ns == dir_mtime_ns and dir_mtime_ns < self.scanned_at_ns - MTIME_RACE_WINDOW_NS
+                    and len(valid_files) == len(files))
+        return reusable, subdirs, valid_files
+
+    def _restat(self, full_dir, names, previous_files):
+        """Records for names of an unchanged directory: stat'ed, keeping the classification of files whose own stat matches."""
+        files = {}
+        for name in names:
+            try:
+                files[name] = _file_record(os.stat(os.path.join(full_dir, name)), previous_files.get(name))
+            except OSError:
+                files[name] = None # Broken link, listed like the walk lists it
+        return files
+
+    def _stat_listed(self, rel_dir, names):
+        """Entry for rel_dir holding only names, not listed again if the directory is unchanged; None if it can't be read.
+
+        Changed directories are listed with os.scandir like a walk does (on Windows that stats every entry
+        for free), but only the entries in names are stat'ed and kept. Names that no longer exist (deleted
+        but still tracked) are left out, and so are links to directories.
+        """
+        full_dir = os.path.join(self.folder, rel_dir) if rel_dir else self.folder
+        try:
+            dir_mtime_ns = os.stat(full_dir).st_mtime_ns
+        except OSError:
+            return None
+        reusable, _subdirs, previous_files = self._cached_entry(rel_dir, dir_mtime_ns)
+        if reusable and all(name in previous_files for name in names):
+            self.dirs_reused += 1
+            return (dir_mtime_ns, (), self._restat(full_dir, names, previous_files))
+
+        wanted = set(names)
+        files = {}
+        try:
+            with os.scandir(full_dir) as entries:
+                for entry in entries:
+                    if entry.name not in wanted:
+                        continue
+                    try:
+                        if entry.is_dir():
+                            continue
+                        st = entry.stat()
+                    except OSError:
+                        files[entry.name] = None # Broken link, listed like the walk lists it
+                        continue
+                    files[entry.name] = _file_record(st, previous_files.get(entry.name))
+        except OSError:
+            return None
+        self.dirs_scanned += 1
+        return (dir_mtime_ns, (), files)
+
+    def iter_listed_files(self, relative_paths, matcher, cancel_event, trace=None):
+        """Like iter_files, but for a file list that came from elsewhere (git_index) instead of listing directories.
+
+        Yields the listed files not excluded by matcher, grouped by directory in order of first appearance;
+        files in excluded directories are skipped. Only the listed files are stat'ed, and not even those
+        for directories unchanged since the last scan. Same 'list' and 'filter' trace phases.
+        """
+        by_dir = {}
+        for relative_path in relative_paths:
+            rel_dir, _sep, name = relative_path.rpartition('/')
+            names = by_dir.get(rel_dir)
+            if names is None:
+                names = by_dir[rel_dir] = []
+            names.append(name)
+
+        excluded_dirs = {'': False}
+
+        def is_excluded(rel_dir):
+            excluded = excluded_dirs.get(rel_dir)
+            if excluded is None:
+                parent, _sep, name = rel_dir.rpartition('/')
+                excluded = excluded_dirs[rel_dir] = is_excluded(parent) or matcher.excludes_dir(rel_dir, name)
+            return excluded
+
+        fresh_dirs = {}
+        scan_started_ns = time.time_ns()
+        self.complete = False
+        self.dirs_reused = 0
+        self.dirs_scanned = 0
+        for rel_dir, names in by_dir.items():
+            if cancel_event.is_set():
+                return
+            if is_excluded(rel_dir):
+                continue
+            if trace is not None:
+                started = perf_counter()
+            entry = self._stat_listed(rel_dir, names)
+            if trace is not None:
+                listed = perf_counter()
+                trace.add('list', listed - started, item=rel_dir or '.')
+            if entry is None:
+                continue
+            fresh_dirs[rel_dir] = entry
+            files = entry[2]
+            prefix = rel_dir + '/' if rel_dir else ''
+            kept_files = []
+            for name in names:
+                relative_path = prefix + name
+                if name in files and not matcher.excludes_file(relative_path, name):
+                    kept_files.append(relative_path)
+            if trace is not None:
+                trace.add('filter', perf_counter() - listed, count=len(names), item=rel_dir or '.')
+            yield from kept_files
+
+        self.dirs = fresh_dirs
+        self.scanned_at_ns = scan_started_ns
+        self.complete = True
+
+    def iter_files(self, matcher, cancel_event, trace=None):
+        """Yields relative paths of files not excluded by matcher, in os.walk's top-down order.
+
+        Unchanged directories come from the index, changed or new ones are listed with os.scandir.
+        Excluded directories are neither listed nor descended into. With a perf_trace.Trace, listing
+        and filtering are timed per directory ('list' and 'filter' phases).
+        """
+        fresh_dirs = {}
+        scan_started_ns = time.time_ns()
+        self.complete = False
+        self.dirs_reused = 0
+        self.dirs_scanned = 0
+        stack = ['']
+        while stack:
+            if cancel_event.is_set():
+                return
+            rel_dir = stack.pop()
+            if trace is not None:
+                started = perf_counter()
+            entry = self._list_dir(rel_dir)
+            if trace is not None:
+                listed = perf_counter()
+                trace.add('list', listed - started, item=rel_dir or '.')
+            if entry is None:
+                continue
+            fresh_dirs[rel_dir] = entry
+            _dir_mtime_ns, subdirs, files = entry
+            prefix = rel_dir + '/' if rel_dir else ''
+
+            # Filtered before yielding so the filter time doesn't include the consumer's
+            kept_files = []
+            for name in files:
+                relative_path = prefix + name
+                if not matcher.excludes_file(relative_path, name):
+                    kept_files.append(relative_path)
+            # Reversed so the stack pops subdirectories in listing order
+            for name in reversed(subdirs):
+                relative_path = prefix + name
+                if not matcher.excludes_dir(relative_path, name):
+                    stack.append(relative_path)
+            if trace is not None:
+                trace.add('filter', perf_counter() - listed, count=len(files) + len(subdirs), item=rel_dir or '.')
+            yield from kept_files
+
+        self.dirs = fresh_dirs
+        self.scanned_at_ns = scan_started_ns
+        self.complete = True
@@ -0,0 +1,266 @@
+"""Lazily listed directory tree with directory-level selection, for browsing big folders without a full scan.
+
+A directory is listed with os.scandir the first time it is asked for (expanded in the view) and only
+listed directories are kept, so memory follows what was opened. The selection is a set of marks: a
+ticked or unticked path applies to itself and everything below it until a deeper mark says otherwise.
+Ticking a directory replaces the marks below it with one, so whole subtrees are (de)selected without
+being listed; they are only walked when the selected files are finally asked for. Marks are kept
+minimal (each differs from what its parent implies), which makes a directory partially selected
+exactly when there is a mark below it.
+
+File counts and sizes per directory are rolled up by DirectoryRollups on a background thread.
+"""
+import os
+import queue
+import threading
+
+CHECKED = 'checked'
+UNCHECKED = 'unchecked'
+PARTIAL = 'partial'
+
+
+def _parent(relative_path):
+    return relative_path.rpartition('/')[0]
+
+
+def list_directory(folder, rel_dir, matcher):
+    """(subdirectory names, [(file name, size or None)]) of one directory, sorted by name, minus what matcher excludes.
+
+    Linked directories are listed as files, like the walk does. Raises OSError if it can't be read.
+    """
+    full_dir = os.path.join(folder, rel_dir) if rel_dir else folder
+    prefix = rel_dir + '/' if rel_dir else ''
+    subdirs = []
+    files = []
+    with os.scandir(full_dir) as entries:
+        for entry in entries:
+            relative_path = prefix + entry.name
+            try:
+                is_dir = entry.is_dir() and not entry.is_symlink()
+            except OSError:
+                is_dir = False
+            if is_dir:
+                if not matcher.excludes_dir(relative_path, entry.name):
+                    subdirs.append(entry.name)
+                continue
+            if matcher.excludes_file(relative_path, entry.name):
+                continue
+            try:
+                size = entry.stat().st_size
+            except OSError:
+                size = None # Broken link and the like, still listed
+            files.append((entry.name, size))
+    subdirs.sort(key=str.lower)
+    files.sort(key=lambda item: item[0].lower())
+    return subdirs, files
+
+
+def directory_totals(folder, rel_dir, matcher, cancel_event=None, known=None):
+    """(file count, total bytes) of rel_dir and of every directory below it, in one walk that lists without keeping.
+
+    Returns ({relative dir: (count, size)}, {relative dir: [subdirectory paths]}) for the directories walked,
+    or None if cancelled. Directories in known (totals of an earlier walk) are taken from it instead of
+    being walked again. Unreadable directories count as empty.
+    """
+    known = known or {}
+    totals = {}
+    subdirs_of = {}
+    stack = [(rel_dir, False)]
+    while stack:
+        if cancel_event is not None and cancel_event.is_set():
+            return None
+        current, children_done = stack.pop()
+        if children_done: # Post-order: its own files are in totals already, add the subdirectories'
+            count, size = totals[current]
+            for child in subdirs_of[current]:
+                child_count, child_size = totals[child] if child in totals else known[child]
+                count += child_count
+                size += child_size
+            totals[current] = (count, size)
+            continue
+        try:
+            subdirs, files = list_directory(folder, current, matcher)
+        except OSError:
+            subdirs, files = [], []
+        prefix = current + '/' if current else ''
+        totals[current] = (len(files), sum(file_size or 0 for _name, file_size in files))
+        subdirs_of[current] = [prefix + name for name in subdirs]
+        stack.append((current, True))
+        stack.extend((child, False) for child in subdirs_of[current] if child not in known)
+    return totals, subdirs_of
+
+
+class LazyDirTree:
+    """The listed part of folder's tree plus its selection marks. Use from one thread."""
+
+    def __init__(self, folder, matcher):
+        self.folder = os.path.abspath(folder)
+        self.matcher = matcher
+        self.listings = {} # Relative directory ('' for the root) -> list_directory result, listed ones only
+        self.marks = {} # Relative path -> True (ticked) or False (unticked), for it and everything below
+        self.marks_below = {} # Relative directory -> number of marks strictly below it
+
+    def relisted(self, matcher):
+        """A tree of the same folder with nothing listed yet, e.g. for changed exclusions, keeping the selection."""
+        tree = LazyDirTree(self.folder, matcher)
+        tree.marks = self.marks
+        tree.marks_below = self.marks_below
+        return tree
+
+    def copy(self):
+        """A tree with the same listings and selection, e.g. to walk the selection on another thread."""
+        tree = LazyDirTree(self.folder, self.matcher)
+        tree.listings = dict(self.listings) # Listings are never changed once made
+        tree.marks = dict(self.marks)
+        tree.marks_below = dict(self.marks_below)
+        return tree
+
+    # --- Listing ---
+
+    def is_listed(self, rel_dir):
+        return rel_dir in self.listings
+
+    def children(self, rel_dir):
+        """(subdirectory names, [(file name, size)]) of rel_dir, listed on first use; empty if unreadable."""
+        listing = self.listings.get(rel_dir)
+        if listing is None:
+            try:
+                listing = list_directory(self.folder, rel_dir, self.matcher)
+            except OSError as e:
+                print(f"Could not list {os.path.join(self.folder, rel_dir)}: {e}")
+                listing = ([], [])
+            self.listings[rel_dir] = listing
+        return listing
+
+    # --- Selection ---
+
+    def is_selected(self, relative_path):
+        """Whether the file (or directory) is ticked: its own mark, else its nearest marked parent's."""
+        path = relative_path
+        while True:
+            mark = self.marks.get(path)
+            if mark is not None:
+                return mark
+            if not path:
+                return False
+            path = _parent(path)
+
+    def state(self, relative_path, is_dir):
+        """CHECKED, UNCHECKED or PARTIAL (directories with differently marked paths below)."""
+        if is_dir and self.marks_below.get(relative_path):
+            return PARTIAL
+        return CHECKED if self.is_selected(relative_path) else UNCHECKED
+
+    def _count_mark(self, relative_path, delta):
+        path = relative_path
+        while path:
+            path = _parent(path)
+            self.marks_below[path] = self.marks_below.get(path, 0) + delta
+
+    def _drop_mark(self, relative_path):
+        del self.marks[relative_path]
+        self._count_mark(relative_path, -1)
+
+    def set_selected(self, relative_path, selected):
+        """Ticks or unticks a file, or a directory with everything below it, without listing anything."""
+        if self.marks_below.get(relative_path):
+            prefix = relative_path + '/' if relative_path else ''
+            for marked in [path for path in self.marks if path.startswith(prefix) and path != relative_path]:
+                self._drop_mark(marked)
+        if relative_path in self.marks:
+            self._drop_mark(relative_path)
+        inherited = self.is_selected(_parent(relative_path)) if relative_path else False
+        if selected != inherited:
+            self.marks[relative_path] = selected
+            self._count_mark(relative_path, 1)
+
+    def select_paths(self, relative_paths):
+        """Replaces the selection with exactly these files, e.g. the file list's selection."""
+        self.clear()
+        for relative_path in relative_paths:
+            if relative_path not in self.marks:
+                self.marks[relative_path] = True
+                self._count_mark(relative_path, 1)
+
+    def clear(self):
+        self.marks = {}
+        self.marks_below = {}
+
+    def has_selection(self):
+        return any(self.marks.values())
+
+    def selected_paths(self, cancel_event=None):
+        """Relative paths of the ticked files in tree order (files, then subdirectories), walking only ticked subtrees.
+
+        Directories listed in the view are reused; others are listed and dropped again.
+        """
+        result = []
+        stack = [('', self.marks.get('', False))]
+        while stack:
+            if cancel_event is not None and cancel_event.is_set():
+                break
+            rel_dir, selected = stack.pop()
+            if not selected and not self.marks_below.get(rel_dir):
+                continue # Nothing ticked below, not even listed
+            listing = self.listings.get(rel_dir)
+            if listing is None:
+                try:
+                    listing = list_directory(self.folder, rel_dir, self.matcher)
+                except OSError as e:
+                    print(f"Could not list {os.path.join(self.folder, rel_dir)}: {e}")
+                    continue
+            subdirs, files = listing
+            prefix = rel_dir + '/' if rel_dir else ''
+            marks = self.marks
+            result.extend(prefix + name for name, _size in files if marks.get(prefix + name, selected))
+            # Reversed so the stack pops subdirectories in listing order
+            stack.extend((prefix + name, marks.get(prefix + name, selected)) for name in reversed(subdirs))
+        return result
+
+
+class DirectoryRollups:
+    """Totals up directories on a background thread and reports them with on_totals({relative dir: (count, size)}).
+
+    Requesting a directory reports its totals and those of its subdirectories (the rows shown when it
+    is expanded). The walk of a directory totals up everything below it and keeps the result, so
+    requests for directories inside it are answered without walking again. Requests are handled in order.
+    """
+
+    def __init__(self, folder, matcher, on_totals):
+        self.folder = os.path.abspath(folder)
+        self.matcher = matcher
+        self.on_totals = on_totals
+        self.requests = queue.Queue()
+        self.totals = {} # Relative directory -> (count, size) of every directory walked, touched on the worker thread only
+        self.subdirs = {} # Relative directory -> its subdirectory paths, for the same directories
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="dir-rollups", daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def request(self, relative_dirs):
+        """Queues directories to report with their subdirectories; safe to call from any thread."""
+        self.requests.put(list(relative_dirs))
+
+    def stop(self):
+        """Asks the worker to finish; a walk in progress stops at its next directory."""
+        self.stop_event.set()
+        self.requests.put(None)
+
+    def _run(self):
+        while not self.stop_event.is_set():
+            relative_dirs = self.requests.get()
+            if relative_dirs is None:
+                return
+            for rel_dir in relative_dirs:
+                if rel_dir not in self.totals:
+                    result = directory_totals(self.folder, rel_dir, self.matcher, self.stop_event, self.totals)
+                    if result is None:
+                        return
+                    self.totals.update(result[0])
+                    self.subdirs.update(result[1])
+                reported = {child: self.totals[child] for child in self.subdirs[rel_dir]}
+                reported[rel_dir] = self.totals[rel_dir]
+                self.on_totals(reported)
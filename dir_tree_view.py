@@ -0,0 +1,165 @@
+import tkinter as tk
+from tkinter import ttk
+
+from dir_tree import CHECKED, PARTIAL, UNCHECKED
+
+CHECKBOX_SIZE = 13 # Pixels, drawn once per state
+_PLACEHOLDER = '//placeholder' # Child iid suffix that makes an unlisted directory expandable; '//' is never in a path
+
+
+def _format_size(size):
+    if size is None:
+        return ""
+    if size < 1024:
+        return f"{size} B"
+    if size < 1024 * 1024:
+        return f"{size / 1024:.0f} KB"
+    if size < 1024 * 1024 * 1024:
+        return f"{size / (1024 * 1024):.1f} MB"
+    return f"{size / (1024 * 1024 * 1024):.1f} GB"
+
+
+def _checkbox_image(master, state):
+    """A CHECKBOX_SIZE square box, ticked for CHECKED and with a filled center for PARTIAL."""
+    image = tk.PhotoImage(master=master, width=CHECKBOX_SIZE, height=CHECKBOX_SIZE)
+    last = CHECKBOX_SIZE - 1
+    image.put("white", to=(0, 0, CHECKBOX_SIZE, CHECKBOX_SIZE))
+    image.put("gray35", to=(0, 0, CHECKBOX_SIZE, 1))
+    image.put("gray35", to=(0, last, CHECKBOX_SIZE, CHECKBOX_SIZE))
+    image.put("gray35", to=(0, 0, 1, CHECKBOX_SIZE))
+    image.put("gray35", to=(last, 0, CHECKBOX_SIZE, CHECKBOX_SIZE))
+    if state == PARTIAL:
+        image.put("gray35", to=(3, 3, CHECKBOX_SIZE - 3, CHECKBOX_SIZE - 3))
+    elif state == CHECKED:
+        for x, y in ((3, 6), (4, 7), (5, 8), (6, 7), (7, 6), (8, 5), (9, 4)): # Two pixels thick
+            image.put("black", to=(x, y, x + 1, y + 2))
+    return image
+
+
+class DirectoryTreeView(tk.Frame):
+    """Collapsible tree of a dir_tree.LazyDirTree with a tri-state checkbox per row.
+
+    Only the top level is inserted at first; a directory's rows are inserted (and the directory listed)
+    the first time it is opened, so the widget holds what was expanded and nothing else. Directory rows
+    show the file count and size from set_totals once the background rollup delivers them. Clicking a
+    checkbox (or Space) ticks the file or the whole directory; only rows already in the widget are
+    redrawn.
+    """
+
+    def __init__(self, master, on_toggle=None, on_open=None, **kwargs):
+        super().__init__(master, **kwargs)
+        self.tree = None
+        self.on_toggle = on_toggle # Called with the relative path after its checkbox is clicked
+        self.on_open = on_open # Called with the relative directory the first time it is opened
+        self.dir_items = set() # Inserted rows that are directories
+        self.totals = {} # Relative directory -> (file count, size) from the rollups, kept for rows inserted later
+        self.images = {state: _checkbox_image(self, state) for state in (CHECKED, UNCHECKED, PARTIAL)}
+
+        self.treeview = ttk.Treeview(self, columns=("size",), selectmode="browse")
+        self.treeview.heading("#0", text="Name", anchor="w")
+        self.treeview.heading("size", text="Files / Size", anchor="e")
+        self.treeview.column("size", width=160, stretch=False, anchor="e")
+        scrollbar = ttk.Scrollbar(self, orient="vertical", command=self.treeview.yview)
+        self.treeview.configure(yscrollcommand=scrollbar.set)
+        scrollbar.pack(side="right", fill="y")
+        self.treeview.pack(side="left", fill="both", expand=True)
+        self.treeview.bind("<<TreeviewOpen>>", self._on_open)
+        self.treeview.bind("<Button-1>", self._on_click)
+        self.treeview.bind("<space>", self._on_space)
+
+    # --- Public API ---
+
+    def set_tree(self, tree):
+        """Shows tree (or nothing for None) from its top level."""
+        self.tree = tree
+        self.dir_items = set()
+        self.totals = {}
+        self.treeview.delete(*self.treeview.get_children())
+        if tree is not None:
+            self._insert_children('')
+
+    def set_totals(self, totals):
+        """Shows rolled-up {relative dir: (file count, size)} on directory rows, now or once they are inserted."""
+        self.totals.update(totals)
+        for rel_dir, dir_totals in totals.items():
+            if rel_dir in self.dir_items:
+                self.treeview.set(rel_dir, "size", self._totals_text(dir_totals))
+
+    def refresh(self):
+        """Redraws every inserted row's checkbox, e.g. after the selection changed in bulk."""
+        self._refresh_below('')
+
+    # --- Rows ---
+
+    def _totals_text(self, dir_totals):
+        if dir_totals is None:
+            return "..."
+        count, size = dir_totals
+        return f"{count} files, {_format_size(size)}"
+
+    def _insert_children(self, rel_dir):
+        subdirs, files = self.tree.children(rel_dir)
+        prefix = rel_dir + '/' if rel_dir else ''
+        treeview = self.treeview
+        for name in subdirs:
+            relative_path = prefix + name
+            treeview.insert(rel_dir, "end", iid=relative_path, text=" " + name,
+                            image=self.images[self.tree.state(relative_path, True)],
+                            values=(self._totals_text(self.totals.get(relative_path)),))
+            treeview.insert(relative_path, "end", iid=relative_path + _PLACEHOLDER, text="")
+            self.dir_items.add(relative_path)
+        for name, size in files:
+            relative_path = prefix + name
+            treeview.insert(rel_dir, "end", iid=relative_path, text=" " + name,
+                            image=self.images[self.tree.state(relative_path, False)], values=(_format_size(size),))
+
+    def _on_open(self, _event):
+        rel_dir = self.treeview.focus()
+        placeholder = rel_dir + _PLACEHOLDER
+        if self.tree is None or not self.treeview.exists(placeholder):
+            return
+        self.treeview.delete(placeholder)
+        self._insert_children(rel_dir)
+        if self.on_open:
+            self.on_open(rel_dir)
+
+    # --- Checkboxes ---
+
+    def _on_click(self, event):
+        if not self.treeview.identify_element(event.x, event.y).endswith("image"): # "image" or "Treeitem.image" by theme
+            return None
+        relative_path = self.treeview.identify_row(event.y)
+        if relative_path:
+            self._toggle(relative_path)
+        return "break" # Ticking doesn't move the focus or open the directory
+
+    def _on_space(self, _event):
+        relative_path = self.treeview.focus()
+        if relative_path and not relative_path.endswith(_PLACEHOLDER):
+            self._toggle(relative_path)
+        return "break"
+
+    def _toggle(self, relative_path):
+        is_dir = relative_path in self.dir_items
+        self.tree.set_selected(relative_path, self.tree.state(relative_path, is_dir) != CHECKED)
+        self._refresh_below(relative_path)
+        parent = self.treeview.parent(relative_path)
+        while parent:
+            self._refresh_row(parent)
+            parent = self.treeview.parent(parent)
+        if self.on_toggle:
+            self.on_toggle(relative_path)
+
+    def _refresh_row(self, relative_path):
+        state = self.tree.state(relative_path, relative_path in self.dir_items)
+        self.treeview.item(relative_path, image=self.images[state])
+
+    def _refresh_below(self, relative_path):
+        """Redraws relative_path's row ('' for none, the root) and every inserted row below it."""
+        stack = [relative_path]
+        while stack:
+            item = stack.pop()
+            if item:
+                self._refresh_row(item)
+            if item == '' or item in self.dir_items:
+                stack.extend(child for child in self.treeview.get_children(item) if not child.endswith(_PLACEHOLDER))
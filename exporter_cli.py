@@ -0,0 +1,470 @@
+"""Headless commands, e.g. for CI or generating many bundles in a loop.
+
+    python main.py export --state project.llmexport --out bundle.txt [--json]
+    python main.py analyze --state project.llmexport --write-state project.llmexport
+
+Exit codes: 0 success, 1 failure (nothing written), 2 bad usage, 3 bundle written but
+some selected files could not be read (only with --allow-partial). With --json a single
+JSON object describing the result is printed to stdout.
+"""
+import argparse
+import json
+import os
+import queue
+import sys
+import time
+
+from content_cache import ContentCache, DuplicateTracker
+from delta_export import ExportSnapshot, revision_delta, snapshot_delta
+from exporter_core import (
+    EXPORT_READ_WORKERS, FILE_SOURCES, build_matcher, build_state_data, load_blacklist, read_state_file, scan_folder,
+    state_file_lists, write_export_bundle, write_state_file,
+)
+from git_index import GitIndexError
+from import_graph import ImportGraph
+from output_formats import (
+    OUTPUT_FORMATS, PLAIN_FORMAT, available_compressions, check_compression, get_output_format, index_path_for,
+)
+from perf_trace import Trace, append_trace
+from shard_export import ShardLimit, parse_shard_limit, remove_sharded_layout, write_sharded_export
+from state_format import diff_file_lists
+from file_probe import DEFAULT_MAX_FILE_BYTES, KIND_BINARY, KIND_TOO_LARGE
+from minifiers import Minifier, format_savings
+from token_budget import PriorityRules, TokenEstimator, load_tokenizer, select_within_budget
+from watcher import WATCH_DEBOUNCE_S, FileWatcher
+
+EXIT_OK = 0
+EXIT_ERROR = 1
+EXIT_USAGE = 2
+EXIT_PARTIAL = 3
+MINIFY_REPORT_TOP = 10 # Files with the biggest savings listed in the human-readable output
+
+
+class CliError(Exception):
+    """A failure reported as EXIT_ERROR with a message."""
+
+
+def _max_file_bytes(args):
+    if args.max_file_mb <= 0:
+        return None # No limit
+    return int(args.max_file_mb * 1024 * 1024)
+
+
+def _load_state(state_filepath):
+    try:
+        return read_state_file(state_filepath)
+    except Exception as e:
+        raise CliError(f"Failed to read or parse state file {state_filepath}: {e}")
+
+
+def _resolve_folder(args, state_data):
+    folder = args.folder or state_data.get("paths", {}).get("folder_path", "")
+    if not folder or not os.path.isdir(folder):
+        raise CliError(f"Codebase folder is invalid or does not exist: {folder!r}")
+    return folder
+
+
+def _new_trace(args, operation):
+    """A Trace when --trace or --timings asked for one, else None so nothing is timed."""
+    return Trace(operation) if args.trace or args.timings else None
+
+
+def _report_trace(args, trace, result, **info):
+    """Adds the timings to the JSON result, prints the summary with --timings and appends to --trace."""
+    if trace is None:
+        return
+    trace.finish(**info)
+    result["timings"] = trace.to_record()
+    if args.timings and not args.json:
+        print(trace.summary(), file=sys.stderr)
+    if args.trace:
+        try:
+            append_trace(args.trace, trace)
+        except OSError as e:
+            print(f"Warning: could not write trace file {args.trace}: {e}", file=sys.stderr)
+
+
+def _emit(args, result, human_lines, error_lines=()):
+    if args.json:
+        print(json.dumps(result))
+        return
+    for line in error_lines:
+        print(line, file=sys.stderr)
+    for line in human_lines:
+        print(line)
+
+
+def cmd_export(args):
+    state_data = _load_state(args.state) if args.state else {}
+    folder = _resolve_folder(args, state_data)
+    output_path = args.out or state_data.get("paths", {}).get("output_path", "")
+    if not output_path:
+        raise CliError("No output file given (--out) and the state file has none.")
+
+    analyzed_files, selected_files = state_file_lists(state_data)
+    selected_files |= set(args.file or [])
+    # Same order the GUI exports in: the analyzed list, then anything selected but not in it
+    selected_paths = [p for p in analyzed_files if p in selected_files]
+    selected_paths += sorted(selected_files.difference(analyzed_files))
+    if not selected_paths:
+        raise CliError("No files were selected for export.")
+    if args.watch and (args.delta or args.since):
+        raise CliError("--watch re-exports everything; it can't be combined with --delta or --since.")
+    if args.with_deps:
+        selected_paths += _dependencies(args, folder, state_data, analyzed_files, selected_paths)
+
+    minifier = None
+    if args.minify:
+        try:
+            minifier = Minifier(load_tokenizer(args.tokenizer)) # Kept across watch rounds for the cached files' counts
+        except Exception as e:
+            raise CliError(f"Could not load the tokenizer: {e}")
+
+    exit_code = _export_once(args, folder, selected_paths, output_path, minifier=minifier)
+    if not args.watch:
+        return exit_code
+
+    # Watch mode: every settled burst of changes re-runs the same export until interrupted
+    changes = queue.Queue()
+    output_abspath = os.path.abspath(output_path)
+    watch_paths = [p for p in selected_paths if os.path.abspath(os.path.join(folder, p)) != output_abspath]
+    watcher = FileWatcher(folder, watch_paths, changes.put, debounce_s=args.debounce).start()
+    if not args.json:
+        print(f"Watching {len(watch_paths)} file(s) via {watcher.backend_name}, Ctrl+C to stop.", file=sys.stderr)
+    cache = ContentCache() # Only the changed files are re-read on each round
+    try:
+        while True:
+            changes.get()
+            try:
+                exit_code = _export_once(args, folder, selected_paths, output_path, cache, minifier)
+            except CliError as e:
+                exit_code = EXIT_ERROR
+                print(json.dumps({"status": "error", "error": str(e)}) if args.json else f"Error: {e}",
+                      file=sys.stdout if args.json else sys.stderr)
+    except KeyboardInterrupt:
+        return exit_code
+    finally:
+        watcher.stop()
+
+
+def _dependencies(args, folder, state_data, analyzed_files, selected_paths):
+    """Files the selected ones import (see import_graph), among the analyzed files or, without a list, the scanned folder."""
+    listed_paths = set(analyzed_files)
+    if not listed_paths:
+        exclusions = state_data.get("exclusions", {})
+        try:
+            blacklist = load_blacklist()
+        except Exception as e:
+            print(f"Warning: could not read blacklist file: {e}", file=sys.stderr)
+            blacklist = []
+        matcher = build_matcher(blacklist, exclusions.get("exclude_strings", ""), exclusions.get("exclude_extensions", ""))
+        listed_paths = set(scan_folder(folder, matcher)[0])
+    listed_paths.update(selected_paths)
+    graph = ImportGraph(folder)
+    graph.load()
+    added, _skipped = graph.closure(selected_paths, listed_paths, max_depth=args.deps_depth)
+    try:
+        graph.save(listed_paths)
+    except OSError as e:
+        print(f"Warning: could not save import cache: {e}", file=sys.stderr)
+    return added
+
+
+def _export_once(args, folder, selected_paths, output_path, cache=None, minifier=None):
+    """One export of selected_paths, with the budget applied if asked for. Prints the result, returns the exit code."""
+    budget_result = None
+    if args.token_budget is not None:
+        try:
+            priority_rules = PriorityRules(",".join(args.priority or []))
+            estimator = TokenEstimator(load_tokenizer(args.tokenizer), max_file_bytes=_max_file_bytes(args))
+        except Exception as e:
+            raise CliError(f"Invalid token budget options: {e}")
+        chosen_paths, used_tokens, skipped_paths = select_within_budget(
+            folder, selected_paths, args.token_budget, estimator, priority_rules)
+        if not chosen_paths:
+            raise CliError(f"None of the {len(selected_paths)} selected files fit in {args.token_budget} tokens.")
+        budget_result = {"budget": args.token_budget, "estimated_tokens": used_tokens, "skipped_files": skipped_paths}
+        selected_paths = chosen_paths
+
+    try:
+        output_format = get_output_format(args.format)
+        compression = check_compression(args.compress)
+    except ValueError as e:
+        raise CliError(str(e))
+    shard_limit = None
+    if args.shard_limit:
+        if output_format is not PLAIN_FORMAT or compression is not None or args.index:
+            raise CliError("--shard-limit only writes the plain format, uncompressed, with its own manifest.")
+        try:
+            shard_limit = ShardLimit(*parse_shard_limit(args.shard_limit), tokenizer=load_tokenizer(args.tokenizer))
+        except Exception as e:
+            raise CliError(f"Invalid shard limit options: {e}")
+
+    delta = None
+    snapshot = None
+    export_paths = selected_paths
+    if args.delta or args.since:
+        if shard_limit is not None:
+            raise CliError("--delta and --since write a single file, they can't be combined with --shard-limit.")
+        if args.since:
+            try:
+                delta = revision_delta(folder, args.since, selected_paths, args.diff)
+            except GitIndexError as e:
+                raise CliError(f"Could not compare with git revision {args.since}: {e}")
+        else:
+            snapshot = ExportSnapshot(folder)
+            if not snapshot.load():
+                raise CliError("There is no earlier export of this folder to compare with; run a full export first.")
+            delta = snapshot_delta(snapshot, selected_paths, args.diff)
+        if not delta["paths"] and not delta["removed"]:
+            result = {"status": "ok", "output_path": None, "selected_count": len(selected_paths), "exported_count": 0,
+                      "errors": [], "delta": {"since": delta["since"], "added": [], "modified": [], "removed": []}}
+            _emit(args, result, [f"None of the selected files changed since {delta['since']}; nothing written."])
+            return EXIT_OK
+        export_paths = delta["paths"]
+    elif not args.watch: # Record what this export wrote for a later --delta; watch rounds don't
+        snapshot = ExportSnapshot(folder) # Replaced as a whole, nothing to load
+    started_at_ns = snapshot.compared_at_ns if delta is not None and snapshot is not None else time.time_ns()
+    records = {} if snapshot is not None else None
+    keep_content = snapshot.store_content if snapshot is not None and args.diff else None
+
+    trace = _new_trace(args, "export")
+    dedup = DuplicateTracker() if args.dedup else None
+    has_removals = delta is not None and bool(delta["removed"])
+    should_commit = lambda count, errors: (count > 0 or has_removals) and (args.allow_partial or not errors)
+    try:
+        if shard_limit is None:
+            exported_count, export_errors, committed = write_export_bundle(
+                folder, export_paths, output_path, should_commit=should_commit,
+                workers=args.workers, cache=cache, max_file_bytes=_max_file_bytes(args), trace=trace,
+                output_format=output_format, compression=compression, write_index=args.index, dedup=dedup,
+                minifier=minifier, diff=delta["diff"] if delta is not None else None,
+                removed_paths=delta["removed"] if delta is not None else (), records=records, keep_content=keep_content)
+            written_to = output_path
+            if committed:
+                remove_sharded_layout(output_path)
+        else:
+            exported_count, export_errors, committed, written_to = write_sharded_export(
+                folder, export_paths, output_path, shard_limit, should_commit=should_commit,
+                workers=args.workers, cache=cache, max_file_bytes=_max_file_bytes(args), trace=trace, dedup=dedup,
+                minifier=minifier, records=records, keep_content=keep_content)
+    except Exception as e:
+        raise CliError(f"Could not write to output file: {output_path}. Error: {e}")
+
+    if committed and snapshot is not None:
+        if delta is None:
+            snapshot.record(records, started_at_ns, replace=True)
+        else:
+            snapshot.record(records, started_at_ns, delta["removed"])
+        try:
+            snapshot.save()
+        except OSError as e:
+            print(f"Warning: could not save the export snapshot: {e}", file=sys.stderr)
+
+    if not committed:
+        status, exit_code = "failed", EXIT_ERROR
+        summary = (f"Export aborted: {len(export_errors)} of {len(export_paths)} file(s) could not be read"
+                   + ("" if exported_count == 0 else ", pass --allow-partial to export the rest") + ".")
+    elif export_errors:
+        status, exit_code = "partial", EXIT_PARTIAL
+        summary = f"Exported {exported_count} file(s) to {written_to} ({len(export_errors)} failed to read)."
+    else:
+        status, exit_code = "ok", EXIT_OK
+        summary = f"Exported {exported_count} file(s) to {written_to}."
+
+    result = {
+        "status": status,
+        "output_path": os.path.abspath(written_to) if committed else None, # The manifest when sharded
+        "selected_count": len(selected_paths),
+        "exported_count": exported_count if committed else 0,
+        "errors": export_errors,
+    }
+    if shard_limit is not None:
+        result["sharded"] = True
+    elif args.index:
+        result["index_path"] = os.path.abspath(index_path_for(output_path)) if committed else None
+    human_lines = [summary]
+    if delta is not None:
+        result["delta"] = {key: delta[key] for key in ("since", "added", "modified", "removed")}
+        human_lines.append(f"Changes since {delta['since']}: {len(delta['added'])} added, "
+                           f"{len(delta['modified'])} modified, {len(delta['removed'])} removed"
+                           + (", modified files as unified diffs." if args.diff else "."))
+    if dedup is not None:
+        result["duplicates"] = [{"path": path, "duplicate_of": original} for path, original in dedup.duplicates]
+        if dedup.duplicates:
+            human_lines.append(f"{len(dedup.duplicates)} duplicate(s) written as references to the first copy "
+                               f"(~{dedup.saved_bytes / 1024:.0f} KB saved).")
+    if minifier is not None:
+        result["minify"] = minifier.report()
+        if result["minify"]["files"]:
+            human_lines.append(format_savings(result["minify"]["total"]) + ".")
+            by_savings = sorted(result["minify"]["files"], key=lambda f: f["after_tokens"] - f["before_tokens"])
+            for entry in by_savings[:MINIFY_REPORT_TOP]:
+                human_lines.append(f"  {entry['path']}: {entry['before_bytes']} -> {entry['after_bytes']} bytes, "
+                                   f"~{entry['before_tokens']} -> ~{entry['after_tokens']} tokens")
+    if budget_result is not None:
+        result["token_budget"] = budget_result
+        human_lines.append(f"Token budget {args.token_budget}: ~{budget_result['estimated_tokens']} used, "
+                           f"{len(budget_result['skipped_files'])} file(s) left out.")
+    _report_trace(args, trace, result, files=result["exported_count"], errors=len(export_errors))
+    _emit(args, result, human_lines, export_errors)
+    return exit_code
+
+
+def cmd_analyze(args):
+    state_data = _load_state(args.state) if args.state else {}
+    folder = _resolve_folder(args, state_data)
+    exclusions = state_data.get("exclusions", {})
+    exclude_strings = args.exclude_strings if args.exclude_strings is not None else exclusions.get("exclude_strings", "")
+    exclude_extensions = args.exclude_extensions if args.exclude_extensions is not None else exclusions.get("exclude_extensions", "")
+
+    try:
+        blacklist = load_blacklist()
+    except Exception as e:
+        print(f"Warning: could not read blacklist file: {e}", file=sys.stderr)
+        blacklist = []
+    max_file_bytes = _max_file_bytes(args)
+    trace = _new_trace(args, "analyze")
+    relative_paths, index = scan_folder(folder, build_matcher(blacklist, exclude_strings, exclude_extensions),
+                                        use_index=not args.no_index, classify=True,
+                                        max_file_bytes=max_file_bytes, trace=trace,
+                                        file_source=args.source, include_untracked=args.untracked)
+    flagged_files = {}
+    for relative_path in relative_paths:
+        kind, _encoding = index.classify(relative_path, max_file_bytes) # Already probed by scan_folder
+        if kind in (KIND_BINARY, KIND_TOO_LARGE):
+            flagged_files[relative_path] = kind
+    if args.hide_flagged and flagged_files:
+        relative_paths = [p for p in relative_paths if p not in flagged_files]
+
+    previous_files, previous_selection = state_file_lists(state_data)
+    found = set(relative_paths)
+    selected_files = [p for p in relative_paths if p in previous_selection]
+
+    if args.write_state:
+        new_state = build_state_data(
+            folder, state_data.get("paths", {}).get("output_path", ""), exclude_strings, exclude_extensions,
+            state_data.get("ui", {}).get("last_filetype_filter", "*"), relative_paths, selected_files)
+        try:
+            write_state_file(args.write_state, new_state, compress=args.compress_state)
+        except Exception as e:
+            raise CliError(f"Failed to save state file: {e}")
+
+    result = {
+        "status": "ok",
+        "folder": folder,
+        "file_count": len(relative_paths),
+        "files": relative_paths,
+        "selected_files": selected_files,
+        "missing_selected_files": sorted(previous_selection - found),
+        "flagged_files": flagged_files,
+        "hidden_flagged": bool(args.hide_flagged),
+    }
+    if previous_files:
+        # What changed since the state file's list was saved
+        diff = diff_file_lists(previous_files, previous_selection, relative_paths)
+        result["added_files"] = diff['added']
+        result["removed_files"] = diff['removed']
+    _report_trace(args, trace, result, files=len(relative_paths))
+    _emit(args, result, relative_paths,
+          [] if args.hide_flagged else [f"Flagged {kind}: {p}" for p, kind in flagged_files.items()])
+    return EXIT_OK
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="main.py", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = commands.add_parser("export", help="Write a bundle of the files selected in a state file")
+    export_parser.add_argument("--state", help=".llmexport file saved from the GUI (Save State)")
+    export_parser.add_argument("--out", help="Output file, defaults to the one stored in the state file")
+    export_parser.add_argument("--folder", help="Codebase folder, defaults to the one stored in the state file")
+    export_parser.add_argument("--file", action="append", metavar="PATH",
+                               help="Additional relative path to export, may be repeated")
+    export_parser.add_argument("--workers", type=int, default=EXPORT_READ_WORKERS, help="Reader threads")
+    export_parser.add_argument("--allow-partial", action="store_true",
+                               help="Write the bundle even if some selected files can't be read (exit code 3)")
+    export_parser.add_argument("--with-deps", action="store_true",
+                               help="Also export the listed files the selected Python / JS / TS files import, transitively")
+    export_parser.add_argument("--deps-depth", type=int, metavar="N",
+                               help="With --with-deps, follow at most N import hops (1: direct imports only)")
+    export_parser.add_argument("--token-budget", type=int, metavar="TOKENS",
+                               help="Only export the best-fitting part of the selection for this many tokens")
+    export_parser.add_argument("--priority", action="append", metavar="GLOB=N",
+                               help="Packing priority for matching files (default 1, higher first), may be repeated")
+    export_parser.add_argument("--tokenizer", default="",
+                               help="'tiktoken:<encoding>' or 'module:function' for exact counts, default is size/4")
+    export_parser.add_argument("--max-file-mb", type=float, default=DEFAULT_MAX_FILE_BYTES / (1024 * 1024),
+                               help="Refuse files bigger than this many MB (0 for no limit)")
+    export_parser.add_argument("--format", choices=list(OUTPUT_FORMATS), default=PLAIN_FORMAT.name,
+                               help="Block framing: plain '-- BEGIN FILE' markers, xml, markdown or jsonl")
+    export_parser.add_argument("--compress", choices=available_compressions(), default="none",
+                               help="Compress the bundle (zstd needs the zstandard package)")
+    export_parser.add_argument("--index", action="store_true",
+                               help="Also write <out>.index.json with every file's offset, for random access")
+    export_parser.add_argument("--minify", action="store_true",
+                               help="Strip comments, blank lines and trailing whitespace from Python, JS/TS, CSS and INI files "
+                                    "(per-file savings in the --json output)")
+    export_parser.add_argument("--dedup", action="store_true",
+                               help="Write files identical to an earlier one as a short reference to it")
+    export_parser.add_argument("--shard-limit", metavar="LIMIT",
+                               help="Split the bundle into shards of at most e.g. '20MB' or '100k tokens' "
+                                    "(counted with --tokenizer if given), plus a .manifest.json listing each file's shard and offset")
+    export_parser.add_argument("--delta", action="store_true",
+                               help="Only export the selected files added or modified since the last export of the folder, "
+                                    "plus the files removed since")
+    export_parser.add_argument("--since", metavar="REV",
+                               help="Like --delta, but compared with a git revision of the folder's repository")
+    export_parser.add_argument("--diff", action="store_true",
+                               help="With --delta or --since, write modified files as unified diffs; on a full export, "
+                                    "keep the files' contents so a later --delta --diff can diff against them")
+    export_parser.add_argument("--watch", action="store_true",
+                               help="Keep running and re-export whenever a selected file changes")
+    export_parser.add_argument("--debounce", type=float, default=WATCH_DEBOUNCE_S, metavar="SECONDS",
+                               help="With --watch, wait until no file changed for this long before re-exporting")
+    export_parser.add_argument("--timings", action="store_true", help="Print per-phase timings to stderr")
+    export_parser.add_argument("--trace", metavar="PATH", help="Append per-phase timings to this JSON-lines file")
+    export_parser.add_argument("--json", action="store_true",
+                               help="Print the result as one JSON object (one per export with --watch)")
+    export_parser.set_defaults(handler=cmd_export)
+
+    analyze_parser = commands.add_parser("analyze", help="List the files the GUI's Analyze would show")
+    analyze_parser.add_argument("--state", help=".llmexport file to take the folder, exclusions and selection from")
+    analyze_parser.add_argument("--folder", help="Codebase folder, overrides the state file")
+    analyze_parser.add_argument("--exclude-strings", help="Comma separated, overrides the state file")
+    analyze_parser.add_argument("--exclude-extensions", help="Comma separated, overrides the state file")
+    analyze_parser.add_argument("--write-state", metavar="PATH",
+                                help="Save a state file with the fresh file list, keeping selections that still exist")
+    analyze_parser.add_argument("--compress-state", action="store_true", help="gzip-compress the --write-state file")
+    analyze_parser.add_argument("--no-index", action="store_true", help="Ignore the on-disk directory index")
+    analyze_parser.add_argument("--source", choices=FILE_SOURCES, default="walk",
+                                help="Walk the folder, or take the files from .git/index (walks outside git repositories)")
+    analyze_parser.add_argument("--untracked", action="store_true",
+                                help="With --source git, also list untracked files not ignored by .gitignore")
+    analyze_parser.add_argument("--max-file-mb", type=float, default=DEFAULT_MAX_FILE_BYTES / (1024 * 1024),
+                                help="Flag files bigger than this many MB as too large (0 for no limit)")
+    analyze_parser.add_argument("--hide-flagged", action="store_true",
+                                help="Leave binary and too large files out of the list")
+    analyze_parser.add_argument("--timings", action="store_true", help="Print per-phase timings to stderr")
+    analyze_parser.add_argument("--trace", metavar="PATH", help="Append per-phase timings to this JSON-lines file")
+    analyze_parser.add_argument("--json", action="store_true", help="Print the result as one JSON object")
+    analyze_parser.set_defaults(handler=cmd_analyze)
+    return parser
+
+
+def run_cli(argv):
+    """Entry point for main.py when arguments are given. Returns the process exit code."""
+    parser = build_parser()
+    try:
+        args = parser.parse_args(argv)
+    except SystemExit as e:
+        return e.code if isinstance(e.code, int) else EXIT_USAGE
+    try:
+        return args.handler(args)
+    except CliError as e:
+        if args.json:
+            print(json.dumps({"status": "error", "error": str(e)}))
+        else:
+            print(f"Error: {e}", file=sys.stderr)
+        return EXIT_ERROR
@@ -0,0 +1,547 @@
+"""Scanning, filtering, export and state-file logic shared by the GUI and the CLI.
+
+Nothing in here imports tkinter; errors are raised or returned for the caller to report.
+"""
+import os
+import difflib
+import io
+import itertools
+import json
+import tempfile
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+
+from content_cache import content_digest
+from dir_index import DirectoryIndex
+from file_probe import DEFAULT_MAX_FILE_BYTES, KIND_BINARY, PROBE_BYTES, sniff_bytes
+from git_index import GitIndexError, list_git_files
+from output_formats import PLAIN_FORMAT, BundleWriter, build_index, index_path_for
+from path_matcher import ExclusionMatcher
+from state_format import (
+    decode_path_tree, decode_selection, dump_state, encode_path_tree, encode_selection, load_state_json,
+)
+
+BLACKLIST_FILE = "blacklisted_paths.txt"
+STATE_VERSION = 2
+READABLE_STATE_VERSIONS = (1, 2)
+FILE_SOURCES = ('walk', 'git') # How a scan finds files: walking the folder, or git's file list (walk outside repositories)
+
+EXPORT_CHUNK_SIZE = 1024 * 1024 # Characters copied per read when streaming a file into the bundle
+EXPORT_READ_WORKERS = min(8, (os.cpu_count() or 1) * 2) # Default reader threads, override with [Export] read_workers
+EXPORT_READ_BATCH = 16 # Files per pool task
+EXPORT_PREFETCH_PER_WORKER = 2 # Batches allowed in flight or buffered per worker
+EXPORT_PREFETCH_MAX_BYTES = 4 * 1024 * 1024 # Bigger files skip the prefetch and are streamed by the writer
+
+
+# --- Exclusions ---
+
+def load_blacklist(blacklist_file=BLACKLIST_FILE):
+    """Reads the blacklist, one root-relative path or glob per line, '#' for comments. Raises OSError if unreadable."""
+    blacklist = []
+    if os.path.exists(blacklist_file):
+        with open(blacklist_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                cleaned_line = line.strip()
+                if cleaned_line and not cleaned_line.startswith('#'):
+                    blacklist.append(cleaned_line.replace('\\', '/')) # Normalize blacklist paths
+    return blacklist
+
+
+def split_exclude_strings(exclude_strings_raw):
+    return [s.strip() for s in exclude_strings_raw.split(',') if s.strip()]
+
+
+def split_exclude_extensions(exclude_extensions_raw):
+    return [e.strip().lstrip('.').lower() for e in exclude_extensions_raw.split(',') if e.strip()]
+
+
+def build_matcher(blacklist, exclude_strings_raw, exclude_extensions_raw):
+    """ExclusionMatcher for the comma separated strings as typed in the UI or stored in a state file."""
+    return ExclusionMatcher(blacklist, split_exclude_strings(exclude_strings_raw),
+                            split_exclude_extensions(exclude_extensions_raw))
+
+
+def file_type_of(relative_path):
+    """Normalized extension used by the filetype filter, "no_extension" for files without one."""
+    normalized_extension = os.path.splitext(relative_path)[1].lstrip('.').lower()
+    return normalized_extension if normalized_extension else "no_extension"
+
+
+def sorted_file_types(file_types):
+    """Sorted filetype filter choices with "*" first."""
+    sorted_types = sorted(t for t in file_types if t != "*")
+    sorted_types.insert(0, "*")
+    return sorted_types
+
+
+# --- Scanning ---
+
+def git_file_list(folder, include_untracked=False, trace=None):
+    """The files git lists under folder (see git_index.list_git_files), or None to walk it instead, e.g. outside a repository."""
+    started = perf_counter()
+    try:
+        relative_paths = list_git_files(folder, include_untracked)
+    except GitIndexError as e:
+        print(f"Walking {folder} instead of using git's file list: {e}")
+        return None
+    if trace is not None:
+        trace.add('git', perf_counter() - started, count=len(relative_paths))
+    return relative_paths
+
+
+def open_index(folder, listed_files=None):
+    """DirectoryIndex for a walk, or for a scan of listed_files (from git_file_list) when given."""
+    return DirectoryIndex(folder, source='walk' if listed_files is None else 'git')
+
+
+def walk_codebase(folder, matcher, cancel_event, index=None, trace=None, listed_files=None):
+    """Yields the normalized relative path of every file under folder not excluded by matcher. Safe to run off the Tk thread.
+
+    Listing goes through a DirectoryIndex; pass one that was load()ed to skip directories unchanged since it was saved.
+    With listed_files (from git_file_list) only those files are considered and no directory is listed.
+    """
+    if index is None:
+        index = open_index(folder, listed_files) # In-memory only, every directory gets listed
+    if listed_files is None:
+        yield from index.iter_files(matcher, cancel_event, trace)
+    else:
+        yield from index.iter_listed_files(listed_files, matcher, cancel_event, trace)
+
+
+def scan_folder(folder, matcher, cancel_event=None, use_index=True, classify=False, max_file_bytes=DEFAULT_MAX_FILE_BYTES,
+                trace=None, file_source='walk', include_untracked=False):
+    """Lists folder in one go. Returns (relative_paths, index); the on-disk index is reused and refreshed if use_index.
+
+    With classify, every listed file is also classified (see DirectoryIndex.classify) before the index is
+    saved, so index.classify() answers from memory afterwards and the next scan only probes changed files.
+    file_source 'git' takes the files from git's index instead (untracked ones too if include_untracked),
+    walking as usual if folder is not in a repository.
+    """
+    listed_files = git_file_list(folder, include_untracked, trace) if file_source == 'git' else None
+    index = open_index(folder, listed_files)
+    if use_index:
+        index.load()
+    relative_paths = list(walk_codebase(folder, matcher, cancel_event or threading.Event(), index, trace, listed_files))
+    if classify:
+        for relative_path in relative_paths:
+            if trace is not None:
+                started = perf_counter()
+            index.classify(relative_path, max_file_bytes)
+            if trace is not None:
+                trace.add('probe', perf_counter() - started, item=relative_path)
+    if use_index and index.complete:
+        try:
+            index.save()
+        except OSError as e:
+            print(f"Could not save directory index: {e}")
+    return relative_paths, index
+
+
+# --- Export ---
+
+def match_output_permissions(temp_path, output_path):
+    """mkstemp creates 0600 files; give the bundle the mode a plain open(output_path, 'w') would have."""
+    try:
+        mode = os.stat(output_path).st_mode & 0o7777
+    except OSError:
+        umask = os.umask(0)
+        os.umask(umask)
+        mode = 0o666 & ~umask
+    os.chmod(temp_path, mode)
+
+
+def render_file_block(relative_path, file_content, output_format=PLAIN_FORMAT):
+    """The bundle text for one file."""
+    return output_format.render_block(relative_path, file_content)
+
+
+def render_diff_block(relative_path, old_text, new_text, base_label, output_format=PLAIN_FORMAT):
+    """The delta export block for one modified file: a unified diff from old_text to new_text (both decoded texts)."""
+    normalized_rel_path = relative_path.replace('\\', '/')
+    diff_lines = difflib.unified_diff(old_text.splitlines(keepends=True), new_text.splitlines(keepends=True),
+                                      f"a/{normalized_rel_path}", f"b/{normalized_rel_path}")
+    diff_text = "".join(line if line.endswith('\n') else line + "\n\\ No newline at end of file\n" for line in diff_lines)
+    return output_format.diff_block(normalized_rel_path, diff_text.rstrip('\n'), base_label)
+
+
+def decode_file_bytes(raw_bytes, encoding=None):
+    """Same text open(path, 'r', encoding=encoding or 'utf-8', errors='ignore').read() returns, for bytes already in memory."""
+    return raw_bytes.decode(encoding or 'utf-8', errors='ignore').replace('\r\n', '\n').replace('\r', '\n')
+
+
+def decode_export_bytes(raw_bytes):
+    """A file's text as the export decodes it, from all its bytes. Raises ValueError for binary content."""
+    return decode_file_bytes(raw_bytes, _export_encoding(raw_bytes[:PROBE_BYTES]))
+
+
+def _check_export_size(size, max_file_bytes):
+    if max_file_bytes is not None and size > max_file_bytes:
+        raise ValueError(f"File is {size} bytes, over the {max_file_bytes} byte limit; not exported")
+
+
+def _export_encoding(head):
+    """Encoding to decode a file with, from its first PROBE_BYTES. Raises ValueError for binary content."""
+    kind, encoding = sniff_bytes(head)
+    if kind == KIND_BINARY:
+        raise ValueError("File looks binary; not exported")
+    if encoding and encoding.startswith(('utf-16', 'utf-32')):
+        return encoding[:6] # The endian-neutral codec reads and drops the BOM
+    return encoding
+
+
+def _prefetch_export_file(folder, relative_path, cache=None, max_file_bytes=DEFAULT_MAX_FILE_BYTES,
+                          output_format=PLAIN_FORMAT, want_digest=False, minifier=None, diff=None, keep_content=None):
+    """Read stage, runs on a pool thread. Returns (block, error, digest, stat_key); block is None for files too big
+    to prefetch. stat_key is the (size, mtime_ns) the file had before it was read, None if it couldn't be stat'ed.
+
+    Files over max_file_bytes fail without being opened, and a file whose first PROBE_BYTES look binary
+    fails without the rest being read. With a cache, unchanged files are served from their cached rendered
+    block without being opened. digest is the content_digest of the file's bytes when want_digest is set
+    (taken from the cache entry when there is one), else None. With a minifiers.Minifier the content is
+    minified before it is framed. diff is (old texts by relative path, base label) for a delta export:
+    files with an old text get a diff block, unminified and never cached. keep_content(digest, raw_bytes) is
+    called with the bytes of every prefetched file; it makes want_digest implied and the cache is not used
+    to skip reading.
+    """
+    old_text = diff[0].get(relative_path) if diff is not None else None
+    if old_text is not None:
+        cache = None # The block depends on the old text too
+    full_file_path = os.path.join(folder, relative_path)
+    # The block also depends on the relative path (header), the format and whether it was minified
+    cache_key = (full_file_path, relative_path, output_format.name, minifier is not None)
+    stat_key = None
+    try:
+        try:
+            st = os.stat(full_file_path)
+        except OSError:
+            raise FileNotFoundError(f"File not found (might have been moved/deleted): {relative_path}")
+        stat_key = (st.st_size, st.st_mtime_ns)
+        _check_export_size(st.st_size, max_file_bytes)
+        if st.st_size > EXPORT_PREFETCH_MAX_BYTES:
+            return None, None, None, stat_key # Streamed by the writer instead so memory stays capped
+
+        if cache is not None and not cache.verify_hash and keep_content is None:
+            block, digest = cache.lookup(cache_key, stat_key)
+            if block is not None and (digest is not None or not want_digest):
+                if minifier is not None:
+                    minifier.reuse(relative_path, stat_key)
+                return block, None, digest, stat_key
+
+        with open(full_file_path, 'rb') as f:
+            head = f.read(PROBE_BYTES)
+            encoding = _export_encoding(head)
+            raw_bytes = head + f.read()
+        digest = (content_digest(raw_bytes) if want_digest or keep_content is not None or (cache is not None and cache.verify_hash)
+                  else None)
+        if keep_content is not None:
+            keep_content(digest, raw_bytes)
+
+        block = cache.get(cache_key, stat_key, digest) if cache is not None and cache.verify_hash else None
+        if block is None and old_text is not None:
+            block = render_diff_block(relative_path, old_text, decode_file_bytes(raw_bytes, encoding), diff[1], output_format)
+        elif block is None:
+            file_content = decode_file_bytes(raw_bytes, encoding)
+            if minifier is not None:
+                file_content = minifier.minify(relative_path, file_type_of(relative_path), file_content, stat_key)
+            block = render_file_block(relative_path, file_content, output_format)
+            if cache is not None:
+                cache.put(cache_key, stat_key, block, digest)
+        elif minifier is not None:
+            minifier.reuse(relative_path, stat_key)
+        return block, None, digest, stat_key
+    except Exception as e:
+        return None, e, None, stat_key
+
+
+def _prefetch_export_traced(folder, relative_path, cache, max_file_bytes, trace, output_format, want_digest, minifier,
+                            diff, keep_content):
+    """_prefetch_export_file, timed into trace's 'read' phase if there is one."""
+    if trace is None:
+        return _prefetch_export_file(folder, relative_path, cache, max_file_bytes, output_format, want_digest, minifier,
+                                     diff, keep_content)
+    started = perf_counter()
+    result = _prefetch_export_file(folder, relative_path, cache, max_file_bytes, output_format, want_digest, minifier,
+                                   diff, keep_content)
+    if result[0] is not None:
+        trace.add('read', perf_counter() - started, nbytes=len(result[0]), item=relative_path)
+    return result
+
+
+def _prefetch_export_batch(folder, relative_paths, *options):
+    return [(relative_path, *_prefetch_export_traced(folder, relative_path, *options)) for relative_path in relative_paths]
+
+
+def iter_export_reads(folder, relative_paths, workers=EXPORT_READ_WORKERS, cache=None,
+                      max_file_bytes=DEFAULT_MAX_FILE_BYTES, trace=None, output_format=PLAIN_FORMAT, want_digest=False,
+                      minifier=None, diff=None, keep_content=None):
+    """Yields (relative_path, block, error, digest, stat_key) in input order while up to workers threads read ahead.
+
+    block is the file's bundle text rendered in output_format, or None (with no error) for files the writer
+    should stream itself. digest is only computed with want_digest, see _prefetch_export_file, which also
+    describes stat_key, minifier, diff and keep_content.
+    Paths are handed to the pool in batches of EXPORT_READ_BATCH to keep
+    per-task overhead low. At most workers * EXPORT_PREFETCH_PER_WORKER batches are in flight or
+    buffered, each file at most EXPORT_PREFETCH_MAX_BYTES, which bounds the memory held by the
+    prefetch stage.
+    """
+    options = (cache, max_file_bytes, trace, output_format, want_digest, minifier, diff, keep_content)
+    if workers <= 1:
+        for relative_path in relative_paths:
+            yield (relative_path, *_prefetch_export_traced(folder, relative_path, *options))
+        return
+
+    pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="export-read")
+    try:
+        remaining = iter(relative_paths)
+        batches = iter(lambda: list(itertools.islice(remaining, EXPORT_READ_BATCH)), [])
+        pending = deque(pool.submit(_prefetch_export_batch, folder, batch, *options)
+                        for batch in itertools.islice(batches, workers * EXPORT_PREFETCH_PER_WORKER))
+        while pending:
+            future = pending.popleft()
+            next_batch = next(batches, None)
+            if next_batch is not None:
+                pending.append(pool.submit(_prefetch_export_batch, folder, next_batch, *options))
+            yield from future.result()
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def open_export_text(full_file_path):
+    """Opens a file for chunked reading as the export decodes it. Raises OSError, or ValueError for binary content."""
+    raw_source = open(full_file_path, 'rb')
+    try:
+        encoding = _export_encoding(raw_source.read(PROBE_BYTES))
+        raw_source.seek(0)
+        # Universal newlines like open(..., 'r') so streamed and prefetched blocks match
+        return io.TextIOWrapper(raw_source, encoding=encoding or 'utf-8', errors='ignore')
+    except BaseException:
+        raw_source.close()
+        raise
+
+
+def _stream_file_block(writer, full_file_path, normalized_rel_path, output_format, minifier=None):
+    """Copies one large file into the bundle in chunks. Returns the read error, if any, after rolling the block back."""
+    try:
+        source = open_export_text(full_file_path)
+    except Exception as e:
+        return e
+
+    mark = writer.mark()
+    read_error = None
+    with source:
+        try:
+            scan = None
+            if output_format.rescans_streamed:
+                # The framing depends on the content (e.g. Markdown fence length), so read it once up front
+                for chunk in iter(lambda: source.read(EXPORT_CHUNK_SIZE), ''):
+                    scan = output_format.scan_chunk(chunk, scan)
+                source.seek(0)
+            writer.write(output_format.block_start(normalized_rel_path, scan))
+            file_type = file_type_of(normalized_rel_path)
+            if minifier is not None and minifier.supports(file_type):
+                # The fence scan above saw the unminified text; minifying never makes a backtick run longer
+                chunks = minifier.minify_stream(normalized_rel_path, file_type, source)
+            else:
+                chunks = iter(lambda: source.read(EXPORT_CHUNK_SIZE), '')
+            for chunk in chunks:
+                writer.write(output_format.escape(chunk))
+        except (OSError, ValueError) as e:
+            read_error = e
+
+    if read_error is not None:
+        # Drop the partial block so a failed file contributes nothing, as before
+        writer.rollback(mark)
+        return read_error
+
+    writer.write(output_format.block_end(normalized_rel_path, scan))
+    return None
+
+
+def _write_index(index_path, index):
+    """Writes the offset index next to the bundle via a temp file and rename."""
+    fd, temp_path = tempfile.mkstemp(prefix=f".{os.path.basename(index_path)}.", suffix=".tmp",
+                                     dir=os.path.dirname(index_path))
+    try:
+        with open(fd, 'w', encoding='utf-8') as f:
+            json.dump(index, f, indent=1)
+        match_output_permissions(temp_path, index_path)
+        os.replace(temp_path, index_path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+
+
+def write_export_bundle(folder, relative_paths, output_path, should_commit=None, workers=EXPORT_READ_WORKERS,
+                        cache=None, max_file_bytes=DEFAULT_MAX_FILE_BYTES, trace=None, output_format=None,
+                        compression=None, write_index=False, dedup=None, minifier=None, diff=None, removed_paths=(),
+                        records=None, keep_content=None):
+    """Streams each file's block into a temp file next to output_path, then atomically renames it over output_path.
+
+    Files are read ahead by a thread pool (see iter_export_reads) and written strictly in the order given;
+    files above EXPORT_PREFETCH_MAX_BYTES are copied in chunks so memory stays flat regardless of bundle size.
+    With a ContentCache, blocks of files unchanged since an earlier export are reused instead of re-read.
+    Files over max_file_bytes (None for no limit) or with binary content count as read errors and are never read
+    in full. With a perf_trace.Trace, reads, streamed files and block writes are timed into it.
+    output_format is an output_formats format (plain if None) and compression 'gzip', 'xz', 'zstd' or None.
+    With write_index, a JSON index of every block's offset is written to index_path_for(output_path); otherwise
+    a stale index from an earlier export is removed. With a content_cache.DuplicateTracker as dedup, a file whose
+    bytes match an earlier file's is written as output_format's short reference block naming that file. With a
+    minifiers.Minifier, supported file types are minified and minifier.report() describes the savings afterwards.
+    For a delta export (see delta_export), diff is (old texts by relative path, base label): those files are
+    written as unified diffs against their old text, except files too big to prefetch, which are written whole.
+    removed_paths are written as output_format's removed blocks after the files. With a dict as records, each file
+    written is added as relative_path: (size, mtime_ns, content_digest) from its read, the digest None for streamed
+    files nothing hashed; keep_content goes to the readers, see _prefetch_export_file. A file that fails to read is
+    left out of the bundle and reported in export_errors. should_commit(exported_count, export_errors) is asked
+    before the rename; if it returns False the temp file is discarded and output_path is left untouched.
+    Returns (exported_count, export_errors, committed). Write errors propagate.
+    """
+    output_format = output_format or PLAIN_FORMAT
+    output_path = os.path.abspath(output_path)
+    fd, temp_path = tempfile.mkstemp(prefix=f".{os.path.basename(output_path)}.", suffix=".tmp",
+                                     dir=os.path.dirname(output_path))
+    exported_count = 0
+    export_errors = []
+    index_entries = []
+    committed = False
+    if minifier is not None:
+        minifier.begin(len(relative_paths))
+    try:
+        with open(fd, 'wb') as outfile:
+            writer = BundleWriter(outfile, compression)
+            writer.write(output_format.document_start())
+            for relative_path, block, read_error, digest, stat_key in iter_export_reads(
+                    folder, relative_paths, workers, cache, max_file_bytes, trace, output_format,
+                    dedup is not None or records is not None, minifier, diff, keep_content):
+                if trace is not None:
+                    started = perf_counter()
+                position = writer.position()
+                normalized_rel_path = relative_path.replace('\\', '/')
+                full_file_path = os.path.join(folder, relative_path)
+                original = None
+                if read_error is None and dedup is not None:
+                    try:
+                        if block is None:
+                            stream_size = os.path.getsize(full_file_path)
+                            original, digest = dedup.check_streamed(normalized_rel_path, full_file_path, stream_size)
+                        else:
+                            original = dedup.check(normalized_rel_path, digest, len(block))
+                    except OSError as e:
+                        read_error = e
+
+                if read_error is None and original is not None:
+                    writer.write(output_format.reference_block(normalized_rel_path, original))
+                    if trace is not None:
+                        trace.add('dedup', perf_counter() - started, item=relative_path)
+                elif read_error is None and block is None:
+                    read_error = _stream_file_block(writer, full_file_path, normalized_rel_path, output_format, minifier)
+                    if read_error is None and dedup is not None:
+                        dedup.record_streamed(normalized_rel_path, full_file_path, stream_size, digest)
+                    if trace is not None:
+                        trace.add('stream', perf_counter() - started, item=relative_path)
+                elif read_error is None:
+                    writer.write(block)
+                    if trace is not None:
+                        trace.add('write', perf_counter() - started, nbytes=len(block))
+
+                if read_error is not None:
+                    export_errors.append(f"Could not read file: {relative_path}. Error: {read_error}")
+                else:
+                    exported_count += 1
+                    index_entries.append({'path': normalized_rel_path, **position,
+                                          'length': writer.offset - position['offset']})
+                    if original is not None:
+                        index_entries[-1]['duplicate_of'] = original
+                    if records is not None:
+                        records[relative_path] = stat_key + (digest,)
+            for relative_path in removed_paths:
+                writer.write(output_format.removed_block(relative_path.replace('\\', '/')))
+            writer.write(output_format.document_end())
+            writer.close()
+
+        if should_commit is None or should_commit(exported_count, export_errors):
+            match_output_permissions(temp_path, output_path)
+            os.replace(temp_path, output_path)
+            committed = True
+            index_path = index_path_for(output_path)
+            if write_index:
+                _write_index(index_path, build_index(output_path, output_format, compression, index_entries))
+            elif os.path.exists(index_path):
+                os.remove(index_path) # Its offsets describe the previous bundle
+    finally:
+        if minifier is not None:
+            minifier.end()
+        if not committed:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+    return exported_count, export_errors, committed
+
+
+# --- State files (.llmexport) ---
+
+def build_state_data(folder_path, output_path, exclude_strings, exclude_extensions, last_filetype_filter,
+                     analyzed_files, selected_files):
+    """The dict written to a .llmexport file; the file lists are stored as described in state_format."""
+    file_tree, ordered_paths = encode_path_tree(analyzed_files)
+    selected_files = set(selected_files)
+    return {
+        "version": STATE_VERSION,
+        "paths": {
+            "folder_path": folder_path,
+            "output_path": output_path
+        },
+        "exclusions": {
+            "exclude_strings": exclude_strings,
+            "exclude_extensions": exclude_extensions
+        },
+        "ui": {
+            "last_filetype_filter": last_filetype_filter
+        },
+        "analysis": {
+            # The files found during the *last successful analysis* for this folder
+            "file_count": len(ordered_paths),
+            "file_tree": file_tree,
+            # The *currently* selected files
+            "selected_runs": encode_selection(ordered_paths, selected_files),
+            "extra_selected_files": sorted(selected_files.difference(ordered_paths))
+        }
+    }
+
+
+def write_state_file(state_filepath, state_data, compress=False):
+    dump_state(state_data, state_filepath, compress)
+
+
+def read_state_file(state_filepath):
+    """Parses a .llmexport file, gzip-compressed or not. Raises OSError/ValueError if it can't be read or isn't JSON."""
+    state_data = load_state_json(state_filepath)
+    if not isinstance(state_data, dict):
+        raise ValueError("State file does not contain a JSON object.")
+    return state_data
+
+
+def state_file_lists(state_data):
+    """Returns (analyzed_files, selected_files) from loaded state data, dropping malformed path entries."""
+    analysis_data = state_data.get("analysis", {})
+    if "file_tree" in analysis_data: # Version 2
+        try:
+            analyzed_files = decode_path_tree(analysis_data["file_tree"])
+            selected_files = decode_selection(analyzed_files, analysis_data.get("selected_runs", []))
+        except (ValueError, TypeError) as e:
+            print(f"Warning: Ignoring the file lists of the loaded state: {e}")
+            return [], set()
+        selected_files.update(p for p in analysis_data.get("extra_selected_files", []) if isinstance(p, str))
+        return analyzed_files, selected_files
+    analyzed_files = []
+    for relative_path in analysis_data.get("analyzed_files", []):
+        # Basic validation: ensure path is a string (might fail if JSON is malformed)
+        if not isinstance(relative_path, str):
+            print(f"Warning: Skipping invalid path entry in loaded state: {relative_path}")
+            continue
+        analyzed_files.append(relative_path)
+    selected_files = set(p for p in analysis_data.get("selected_files", []) if isinstance(p, str))
+    return analyzed_files, selected_files
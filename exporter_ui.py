@@ -0,0 +1,1564 @@
+import tkinter as tk
+from tkinter import filedialog, messagebox
+import os
+import configparser
+import queue
+import sqlite3
+import threading
+import time
+from time import perf_counter
+
+from content_cache import DEFAULT_CACHE_MAX_BYTES, ContentCache, DuplicateTracker
+from delta_export import ExportSnapshot, revision_delta, snapshot_delta
+from dir_tree import DirectoryRollups, LazyDirTree
+from dir_tree_view import DirectoryTreeView
+from exporter_core import (
+    BLACKLIST_FILE, EXPORT_READ_WORKERS, READABLE_STATE_VERSIONS, build_matcher, build_state_data, file_type_of,
+    git_file_list, load_blacklist, open_index, read_state_file, scan_folder, sorted_file_types, state_file_lists,
+    walk_codebase,
+    write_export_bundle, write_state_file,
+)
+from file_list_view import VirtualFileList
+from file_probe import DEFAULT_MAX_FILE_BYTES, KIND_BINARY, KIND_TOO_LARGE
+from git_index import GitIndexError
+from import_graph import ImportGraph
+from minifiers import Minifier, format_savings
+from path_search import SEARCH_MODES
+from perf_trace import Trace, append_trace
+from selection_model import FileStore
+from output_formats import OUTPUT_FORMATS, PLAIN_FORMAT, available_compressions, check_compression, get_output_format
+from shard_export import ShardLimit, parse_shard_limit, remove_sharded_layout, write_sharded_export
+from state_format import diff_file_lists
+from token_budget import (
+    BYTES_PER_TOKEN, PriorityRules, TokenEstimator, format_token_count, load_tokenizer, select_within_budget,
+)
+from watcher import WATCH_DEBOUNCE_S, FileWatcher
+from workspace_store import WorkspaceStore
+
+SCAN_BATCH_SIZE = 500 # Files per batch pushed from the scan worker to the UI
+SCAN_POLL_MS = 50 # How often the UI drains the scan queue
+SCAN_BATCHES_PER_POLL = 10 # Cap on batches handled per poll so the UI stays responsive
+WATCH_POLL_MS = 250 # How often the UI checks for change bursts reported by the watcher
+SEARCH_DELAY_MS = 40 # Keystrokes within this long are filtered once
+STATE_DIFF_LISTED = 10 # Added / removed files named in the Load State summary, per kind
+SELECTION_SAVE_DELAY_MS = 1000 # Selection changes are written to the workspace store once they pause this long
+ROLLUP_POLL_MS = 200 # How often tree view picks up directory totals from the rollup thread
+WATCH_PATHS_DELAY_MS = 300 # Tree view ticks within this long update the watched files once
+
+
+class CodeExporterUI:
+    def __init__(self, master):
+        self.master = master
+        master.title("Codebase Exporter for LLM")
+
+        self.config = configparser.ConfigParser()
+        self.config_file = "code_exporter_config.ini"
+        # --- Variables ---
+        # Load general settings first, potentially including last paths and selections
+        self.last_session_folder = ""
+        self.last_session_selected_files = set()
+        self.workspace = self._open_workspace() # Per-project exclusions and selections, None if unavailable
+        self.load_settings() # This now loads last folder/selections into instance vars
+
+        # UI Variables linked to widgets
+        self.folder_path = tk.StringVar(value=self.last_session_folder) # Start with last used folder
+        self.output_path = tk.StringVar(value=self.config.get('Paths', 'output_path', fallback=''))
+        self.exclude_strings_var = tk.StringVar(value=self.config.get('Exclusions', 'exclude_strings', fallback=''))
+        self.exclude_extensions_var = tk.StringVar(value=self.config.get('Exclusions', 'exclude_extensions', fallback=''))
+        self._restore_project_settings(self.last_session_folder)
+        self.file_type_dropdown_var = tk.StringVar(master, value=self.config.get('UI', 'last_filetype_filter', fallback='*'))
+        self.token_budget_var = tk.StringVar(value=self.config.get('Tokens', 'budget', fallback=''))
+        self.priorities_var = tk.StringVar(value=self.config.get('Tokens', 'priorities', fallback=''))
+        self.hide_flagged_var = tk.BooleanVar(value=self.config.getboolean('Analysis', 'hide_flagged', fallback=False))
+        self.git_files_var = tk.BooleanVar(value=self.config.get('Analysis', 'file_source', fallback='walk') == 'git')
+        self.git_untracked = self.config.getboolean('Analysis', 'git_untracked', fallback=False) # Also list untracked, not ignored files
+        self.watch_var = tk.BooleanVar(value=False)
+        self.shard_limit_var = tk.StringVar(value=self.config.get('Export', 'shard_limit', fallback=''))
+        self.output_format_var = tk.StringVar(value=self.config.get('Export', 'format', fallback=PLAIN_FORMAT.name))
+        self.compression_var = tk.StringVar(value=self.config.get('Export', 'compression', fallback='none'))
+        self.write_index_var = tk.BooleanVar(value=self.config.getboolean('Export', 'write_index', fallback=False))
+        self.dedup_var = tk.BooleanVar(value=self.config.getboolean('Export', 'dedup', fallback=False))
+        self.minify_var = tk.BooleanVar(value=self.config.getboolean('Export', 'minify', fallback=False))
+        self.delta_since_var = tk.StringVar(value=self.config.get('Export', 'delta_since', fallback='')) # Git revision, empty for the last export
+        self.delta_diffs_var = tk.BooleanVar(value=self.config.getboolean('Export', 'delta_diffs', fallback=False))
+        self.search_var = tk.StringVar(value="")
+        self.search_mode_var = tk.StringVar(value=self.config.get('UI', 'search_mode', fallback=SEARCH_MODES[0]))
+        self.search_count_var = tk.StringVar(value="")
+        self.tree_view_var = tk.BooleanVar(value=self.config.getboolean('UI', 'tree_view', fallback=False))
+
+        # Data stores
+        self.file_store = FileStore() # Paths, selection, token estimates and file_probe kinds - Current runtime state, rendered by file_list_view
+        self.analyzed_files_cache = [] # Stores just the relative paths from the last analysis for Save State
+        self.search_matches = None # file_store positions matching the search box, None while it is empty
+        self.search_after_id = None
+        self.selection_folder = None # Folder whose files are in file_store, for saving its selection
+        self.saved_selection = set() # Selection of selection_folder as last written to the workspace store
+        self.selection_save_id = None
+        self.dependency_store = None # file_store a Select Dependencies run is working for, None while idle
+        self.dir_tree = None # LazyDirTree shown in tree view; its marks are the selection while tree view is on
+        self.rollups = None # DirectoryRollups totalling up dir_tree's directories
+        self.rollup_queue = queue.Queue()
+        self.is_analyzing = False # Flag to prevent race conditions or duplicate analysis
+        self.scan_generation = 0 # Incremented per scan so results from a cancelled/stale worker are dropped
+        self.scan_cancel_event = threading.Event()
+        self.scan_queue = queue.Queue()
+        self.scan_file_types = set(["*"])
+        self.scan_selections_to_preserve = set()
+        self.scan_hidden_count = 0
+        self.watcher = None # FileWatcher while watch mode is on
+        self.watch_queue = queue.Queue() # Change bursts from the watcher thread
+        self.watch_paths_id = None # Pending after() that re-walks tree view's selection for the watcher
+        self.watch_paths_lock = threading.Lock() # Guards the generation check before a walk's set_paths
+        self.watch_paths_generation = 0 # Incremented per walk (and when watching stops) so stale walks are dropped
+        self.watch_paths_cancel_event = threading.Event()
+        self.status_var = tk.StringVar(value="")
+        self.timing_var = tk.StringVar(value="") # Phase timings of the last scan or export
+        self.scan_trace = None
+        self.selection_summary_var = tk.StringVar(value="")
+        # Size-based estimates for the list; the configured tokenizer (if any) is only used for budget exports
+        self.token_estimator = TokenEstimator(bytes_per_token=self.config.getfloat('Tokens', 'bytes_per_token', fallback=BYTES_PER_TOKEN))
+        self.budget_estimator = None # Built on first budget export from [Tokens] tokenizer
+        # Files above this are flagged during analysis and refused by the export
+        self.max_file_bytes = int(self.config.getfloat('Analysis', 'max_file_mb', fallback=DEFAULT_MAX_FILE_BYTES / (1024 * 1024)) * 1024 * 1024)
+        self.token_estimator.max_file_bytes = self.max_file_bytes
+        # Rendered blocks of exported files, so re-exports only re-read what changed
+        self.content_cache = ContentCache(
+            max_bytes=self.config.getint('Export', 'cache_max_mb', fallback=DEFAULT_CACHE_MAX_BYTES // (1024 * 1024)) * 1024 * 1024,
+            verify_hash=self.config.getboolean('Export', 'cache_verify_hash', fallback=False))
+        # Savings are counted with the size heuristic; kept across exports so cached blocks are still reported
+        self.minifier = Minifier(bytes_per_token=self.token_estimator.bytes_per_token)
+
+
+        # --- UI Layout ---
+
+        # Row 0: Codebase Folder
+        tk.Label(master, text="Codebase Folder:").grid(row=0, column=0, sticky="w", padx=5, pady=2)
+        tk.Entry(master, textvariable=self.folder_path, width=50, state='readonly').grid(row=0, column=1, columnspan=2, padx=5, pady=2, sticky="ew")
+        tk.Button(master, text="Browse Folder", command=self.browse_folder).grid(row=0, column=3, padx=5, pady=2)
+        tk.Button(master, text="Analyze", command=self.analyze_folder).grid(row=0, column=4, padx=5, pady=2)
+
+        # Row 1: Exclude Strings
+        tk.Label(master, text="Exclude Strings or Globs (, separated):").grid(row=1, column=0, sticky="w", padx=5, pady=2)
+        tk.Entry(master, textvariable=self.exclude_strings_var, width=50).grid(row=1, column=1, columnspan=4, padx=5, pady=2, sticky="ew")
+
+        # Row 2: Exclude Extensions
+        tk.Label(master, text="Exclude Extensions (, separated):").grid(row=2, column=0, sticky="w", padx=5, pady=2)
+        tk.Entry(master, textvariable=self.exclude_extensions_var, width=50).grid(row=2, column=1, columnspan=4, padx=5, pady=2, sticky="ew")
+
+        # File List (Row 3) - search bar over the virtualized list, only the visible rows have widgets
+        list_frame = tk.Frame(master)
+        list_frame.grid(row=3, column=0, columnspan=5, sticky="nsew", padx=5, pady=5)
+        search_bar = tk.Frame(list_frame)
+        search_bar.pack(side="top", fill="x")
+        tk.Checkbutton(search_bar, text="Tree view", variable=self.tree_view_var, command=self.toggle_tree_view).pack(side="left")
+        self.search_controls = tk.Frame(search_bar) # Hidden in tree view, which isn't searchable
+        tk.Label(self.search_controls, text="Search:").pack(side="left")
+        tk.Entry(self.search_controls, textvariable=self.search_var).pack(side="left", fill="x", expand=True, padx=5)
+        tk.OptionMenu(self.search_controls, self.search_mode_var, *SEARCH_MODES).pack(side="left")
+        tk.Label(self.search_controls, textvariable=self.search_count_var, fg='gray40').pack(side="left", padx=5)
+        tk.Button(self.search_controls, text="Select Matches", command=lambda: self.select_matches(True)).pack(side="left", padx=2)
+        tk.Button(self.search_controls, text="Deselect Matches", command=lambda: self.select_matches(False)).pack(side="left", padx=2)
+        self.file_list_view = VirtualFileList(list_frame, on_toggle=self._on_file_toggled, on_select_folder=self.select_folder)
+        # Tree view: directories listed when expanded, tri-state checkboxes select whole subtrees
+        self.dir_tree_view = DirectoryTreeView(list_frame, on_toggle=self._on_tree_toggled, on_open=self._on_tree_opened)
+        self._show_file_view()
+
+        # Row 4: Quick Select and Clear All
+        tk.Label(master, text="Quick Select Filetype:").grid(row=4, column=0, sticky="w", padx=5, pady=2)
+        self.filetype_dropdown = tk.OptionMenu(master, self.file_type_dropdown_var, "*") # Populated later
+        self.filetype_dropdown.grid(row=4, column=1, sticky="ew", padx=5, pady=2)
+        tk.Button(master, text="Quick Select", command=self.quick_select).grid(row=4, column=2, padx=5, pady=2)
+        clear_buttons = tk.Frame(master)
+        clear_buttons.grid(row=4, column=3, padx=5, pady=2)
+        tk.Button(clear_buttons, text="Clear All", command=self.clear_all).pack(side="left")
+        tk.Button(clear_buttons, text="Invert", command=self.invert_selection).pack(side="left", padx=(4, 0))
+        tk.Button(clear_buttons, text="Select Dependencies", command=self.select_dependencies).pack(side="left", padx=(4, 0))
+        tk.Label(master, textvariable=self.selection_summary_var, anchor="e").grid(row=4, column=4, sticky="e", padx=5, pady=2)
+
+        # Row 5: Output Path and Export
+        tk.Label(master, text="Output File:").grid(row=5, column=0, sticky="w", padx=5, pady=2)
+        tk.Entry(master, textvariable=self.output_path, width=50, state='readonly').grid(row=5, column=1, columnspan=2, padx=5, pady=2, sticky="ew")
+        tk.Button(master, text="Browse Output", command=self.browse_output_path).grid(row=5, column=3, padx=5, pady=2)
+        tk.Button(master, text="Export", command=self.export_files).grid(row=5, column=4, padx=5, pady=2)
+
+        # Row 6: Save/Load State
+        tk.Checkbutton(master, text="Git files only", variable=self.git_files_var).grid(row=6, column=0, padx=5, pady=5, sticky="w")
+        tk.Button(master, text="Save State", command=self.save_state).grid(row=6, column=1, padx=5, pady=5, sticky="e")
+        tk.Button(master, text="Load State", command=self.load_state).grid(row=6, column=2, padx=5, pady=5, sticky="w")
+        tk.Checkbutton(master, text="Hide binary / too large", variable=self.hide_flagged_var).grid(row=6, column=3, padx=5, pady=5, sticky="w")
+        tk.Checkbutton(master, text="Watch & Re-export", variable=self.watch_var, command=self.toggle_watch).grid(row=6, column=4, padx=5, pady=5, sticky="w")
+
+        # Row 7: Status / progress and Cancel
+        tk.Label(master, textvariable=self.status_var, anchor="w").grid(row=7, column=0, columnspan=4, sticky="ew", padx=5, pady=2)
+        self.cancel_button = tk.Button(master, text="Cancel", command=self.cancel_analysis, state='disabled')
+        self.cancel_button.grid(row=7, column=4, padx=5, pady=2)
+
+        # Row 8: Token budget export
+        tk.Label(master, text="Token Budget / Priorities:").grid(row=8, column=0, sticky="w", padx=5, pady=2)
+        tk.Entry(master, textvariable=self.token_budget_var, width=12).grid(row=8, column=1, sticky="w", padx=5, pady=2)
+        tk.Entry(master, textvariable=self.priorities_var, width=30).grid(row=8, column=2, columnspan=2, sticky="ew", padx=5, pady=2)
+        tk.Button(master, text="Export Within Budget", command=self.export_within_budget).grid(row=8, column=4, padx=5, pady=2)
+
+        # Row 9: Sharded output, e.g. '20MB' or '100k tokens'; empty writes one file
+        tk.Label(master, text="Split Into Shards Of:").grid(row=9, column=0, sticky="w", padx=5, pady=2)
+        tk.Entry(master, textvariable=self.shard_limit_var, width=12).grid(row=9, column=1, sticky="w", padx=5, pady=2)
+        tk.Label(master, text="e.g. 20MB or 100k tokens, empty for a single file", fg='gray40').grid(row=9, column=2, columnspan=2, sticky="w", padx=5, pady=2)
+        tk.Checkbutton(master, text="Minify (strip comments)", variable=self.minify_var).grid(row=9, column=4, padx=5, pady=2, sticky="w")
+
+        # Row 10: Output format, compression and offset index
+        tk.Label(master, text="Format / Compression:").grid(row=10, column=0, sticky="w", padx=5, pady=2)
+        tk.OptionMenu(master, self.output_format_var, *OUTPUT_FORMATS).grid(row=10, column=1, sticky="w", padx=5, pady=2)
+        tk.OptionMenu(master, self.compression_var, *available_compressions()).grid(row=10, column=2, sticky="w", padx=5, pady=2)
+        tk.Checkbutton(master, text="Write offset index", variable=self.write_index_var).grid(row=10, column=3, padx=5, pady=2, sticky="w")
+        tk.Checkbutton(master, text="Deduplicate identical files", variable=self.dedup_var).grid(row=10, column=4, padx=5, pady=2, sticky="w")
+
+        # Row 11: Delta export of what changed since the last export or a git revision
+        tk.Label(master, text="Changes Since (git revision):").grid(row=11, column=0, sticky="w", padx=5, pady=2)
+        tk.Entry(master, textvariable=self.delta_since_var, width=12).grid(row=11, column=1, sticky="w", padx=5, pady=2)
+        tk.Label(master, text="empty for the last export", fg='gray40').grid(row=11, column=2, sticky="w", padx=5, pady=2)
+        tk.Checkbutton(master, text="As unified diffs", variable=self.delta_diffs_var).grid(row=11, column=3, padx=5, pady=2, sticky="w")
+        tk.Button(master, text="Export Changes", command=self.export_changes).grid(row=11, column=4, padx=5, pady=2)
+
+        # Row 12: Timings of the last operation, [Trace] enabled
+        tk.Label(master, textvariable=self.timing_var, anchor="w", fg='gray40').grid(row=12, column=0, columnspan=5, sticky="ew", padx=5, pady=2)
+
+        # Configure grid layout
+        master.grid_columnconfigure(1, weight=1)
+        master.grid_rowconfigure(3, weight=1)
+
+        master.protocol("WM_DELETE_WINDOW", self.on_closing)
+
+        # Changing what is being scanned mid-walk makes the running scan stale
+        for var in (self.folder_path, self.exclude_strings_var, self.exclude_extensions_var, self.hide_flagged_var,
+                    self.git_files_var):
+            var.trace_add('write', self._on_scan_inputs_changed)
+        self.folder_path.trace_add('write', lambda *_args: self.stop_watch())
+        for var in (self.search_var, self.search_mode_var):
+            var.trace_add('write', self._on_search_changed)
+
+        # --- Initial setup ---
+        # If a folder was loaded from settings, run initial analysis
+        if self.folder_path.get() and os.path.isdir(self.folder_path.get()):
+             # Schedule the analysis slightly after the main loop starts
+             self.master.after(100, self.analyze_folder)
+        else:
+             # Ensure dropdown is initialized even if no analysis runs
+             self.update_filetype_dropdown([])
+
+
+    def load_settings(self):
+        """Loads general app settings from INI, including last folder and selections."""
+        if os.path.exists(self.config_file):
+            self.config.read(self.config_file)
+        else:
+            # Ensure default sections exist
+            if 'Paths' not in self.config: self.config['Paths'] = {}
+            if 'UI' not in self.config: self.config['UI'] = {'last_filetype_filter': '*'}
+            if 'Exclusions' not in self.config: self.config['Exclusions'] = {}
+
+        # Load last used paths and settings into instance variables for potential use
+        self.last_session_folder = self.config.get('Paths', 'last_analyzed_folder', fallback='')
+        # Don't set self.folder_path here, do it in __init__ after loading
+
+        # Older versions kept one folder's selection here as a comma-joined list; move it to the workspace store once
+        selected_files_str = self.config.get('FileSelection', 'selected_files', fallback='')
+        ini_selection = [f.strip() for f in selected_files_str.split(',') if f.strip()]
+        if self.workspace is None:
+            # No store to move it into: the INI keeps the selection, see save_settings
+            self.last_session_selected_files = set(ini_selection)
+            return
+        if self.config.has_option('FileSelection', 'selected_files'):
+            if self.last_session_folder and self.workspace.project(self.last_session_folder) is None:
+                try:
+                    self.workspace.replace_selection(self.last_session_folder, ini_selection)
+                except sqlite3.Error as e:
+                    print(f"Could not import the saved selection into the workspace store: {e}")
+                    self.last_session_selected_files = set(ini_selection)
+                    return # Keep the section to try again next time
+            self.config.remove_section('FileSelection')
+        if self.last_session_folder:
+            self.last_session_selected_files = self._workspace_selection(self.last_session_folder)
+
+
+    def save_settings(self):
+        """Saves the *current* state (paths, selections for current folder) to INI on closing."""
+        if 'Paths' not in self.config: self.config['Paths'] = {}
+        if 'UI' not in self.config: self.config['UI'] = {}
+        if 'Exclusions' not in self.config: self.config['Exclusions'] = {}
+
+        current_folder = self.folder_path.get()
+        self.config['Paths']['folder_path'] = current_folder # Save last folder viewed
+        self.config['Paths']['last_analyzed_folder'] = current_folder # Explicitly save for reload logic
+        self.config['Paths']['output_path'] = self.output_path.get()
+
+        self.config['UI']['last_filetype_filter'] = self.file_type_dropdown_var.get()
+        self.config['UI']['search_mode'] = self.search_mode_var.get()
+        self.config['UI']['tree_view'] = str(self.tree_view_var.get())
+
+        self.config['Exclusions']['exclude_strings'] = self.exclude_strings_var.get()
+        self.config['Exclusions']['exclude_extensions'] = self.exclude_extensions_var.get()
+
+        if 'Tokens' not in self.config: self.config['Tokens'] = {}
+        self.config['Tokens']['budget'] = self.token_budget_var.get()
+        self.config['Tokens']['priorities'] = self.priorities_var.get()
+        if 'Export' not in self.config: self.config['Export'] = {}
+        self.config['Export']['shard_limit'] = self.shard_limit_var.get()
+        self.config['Export']['format'] = self.output_format_var.get()
+        self.config['Export']['compression'] = self.compression_var.get()
+        self.config['Export']['write_index'] = str(self.write_index_var.get())
+        self.config['Export']['dedup'] = str(self.dedup_var.get())
+        self.config['Export']['minify'] = str(self.minify_var.get())
+        self.config['Export']['delta_since'] = self.delta_since_var.get()
+        self.config['Export']['delta_diffs'] = str(self.delta_diffs_var.get())
+        if 'Analysis' not in self.config: self.config['Analysis'] = {}
+        self.config['Analysis']['hide_flagged'] = str(self.hide_flagged_var.get())
+        self.config['Analysis']['file_source'] = 'git' if self.git_files_var.get() else 'walk'
+        self.config['Analysis']['git_untracked'] = str(self.git_untracked)
+
+        # Selections live in the workspace store, per folder
+        self._save_selection()
+        self._save_project_settings()
+        if self.workspace is None and self.last_session_folder is None:
+            # No store: the INI keeps the analyzed folder's selection like older versions (once it replaced the loaded one)
+            if 'FileSelection' not in self.config: self.config['FileSelection'] = {}
+            self.config['FileSelection']['selected_files'] = ",".join(self._selected_paths())
+
+        with open(self.config_file, 'w') as configfile:
+            self.config.write(configfile)
+
+    def on_closing(self):
+        self.scan_cancel_event.set() # Let a running scan worker exit
+        self.stop_watch()
+        self._stop_rollups()
+        self.save_settings() # Save current state to INI
+        if self.workspace is not None:
+            self.workspace.close()
+        self.master.destroy()
+
+    def browse_folder(self):
+        folder_selected = filedialog.askdirectory(initialdir=self.folder_path.get() or ".")
+        if folder_selected and folder_selected != self.folder_path.get():
+            # Remember the project being left, then bring back what was last used in the new one
+            self._save_selection()
+            self._save_project_settings()
+            self.folder_path.set(folder_selected)
+            self._restore_project_settings(folder_selected)
+            self.last_session_folder = folder_selected
+            self.last_session_selected_files = self._workspace_selection(folder_selected) if self.workspace else set()
+            # Clear previous analysis results *and runtime data* when folder changes
+            self.clear_file_list_ui()
+            self.file_store = FileStore()
+            self.analyzed_files_cache = []
+            self.update_filetype_dropdown([])
+            # Trigger analysis for the new folder
+            self.analyze_folder() # Analyze automatically after browsing
+
+    # --- Workspace store ---
+
+    def _open_workspace(self):
+        try:
+            return WorkspaceStore()
+        except sqlite3.Error as e:
+            print(f"Could not open the workspace store, selections won't be remembered: {e}")
+            return None
+
+    def _restore_project_settings(self, folder):
+        """Sets the exclusions last used with folder, if it was opened before."""
+        if self.workspace is None or not folder:
+            return
+        project = self.workspace.project(folder)
+        if project is not None:
+            self.exclude_strings_var.set(project['exclude_strings'])
+            self.exclude_extensions_var.set(project['exclude_extensions'])
+
+    def _save_project_settings(self):
+        folder = self.folder_path.get()
+        if self.workspace is None or not folder:
+            return
+        try:
+            self.workspace.save_project(folder, self.exclude_strings_var.get(), self.exclude_extensions_var.get())
+        except sqlite3.Error as e:
+            print(f"Could not save the project settings: {e}")
+
+    def _track_selection_of(self, folder):
+        """file_store now holds folder's files; later selection changes are saved against its stored selection."""
+        self.selection_folder = folder if folder and self.workspace is not None else None
+        self.saved_selection = self._workspace_selection(folder) if self.selection_folder else set()
+
+    def _workspace_selection(self, folder):
+        """folder's selection in the workspace store, or nothing if the store can't be read."""
+        try:
+            return self.workspace.selected_paths(folder)
+        except sqlite3.Error as e:
+            print(f"Could not read the saved selection: {e}")
+            return set()
+
+    def _save_selection(self):
+        """Writes what changed in the selection of the listed files; paths not listed (yet) keep their stored state."""
+        if self.selection_save_id is not None:
+            self.master.after_cancel(self.selection_save_id)
+            self.selection_save_id = None
+        if self.tree_view_var.get() and self.dir_tree is not None:
+            self._save_tree_selection()
+            return
+        if self.selection_folder is None:
+            return
+        saved = self.saved_selection
+        added = []
+        removed = []
+        for relative_path, selected in zip(self.file_store.paths, self.file_store.selected):
+            if selected:
+                if relative_path not in saved:
+                    added.append(relative_path)
+            elif relative_path in saved:
+                removed.append(relative_path)
+        if not added and not removed:
+            return
+        try:
+            self.workspace.update_selection(self.selection_folder, added, removed)
+        except sqlite3.Error as e:
+            print(f"Could not save the selection: {e}")
+            return
+        saved.update(added)
+        saved.difference_update(removed)
+
+    def load_blacklist(self):
+        try:
+            return load_blacklist()
+        except Exception as e:
+            messagebox.showwarning("Blacklist Warning", f"Could not read blacklist file {BLACKLIST_FILE}:\n{e}")
+            return []
+
+    def analyze_folder(self):
+        if self.is_analyzing: # Prevent re-entry
+             print("Analysis already in progress.")
+             return
+
+        folder = self.folder_path.get()
+        if not folder or not os.path.isdir(folder): # Check validity
+            messagebox.showerror("Error", "Please select a valid codebase folder.")
+            return
+        if self.tree_view_var.get():
+            self.open_tree() # Lists the top level only, the rest as it is expanded
+            return
+
+        # --- Preserve Selections Logic ---
+        # Determine which selections to try and preserve
+        selections_to_preserve = set()
+        # If the folder being analyzed is the same as the one loaded initially from settings, use those selections
+        if folder == self.last_session_folder:
+             selections_to_preserve = self.last_session_selected_files
+             # Clear the session memory once used for initial load to prioritize runtime selections
+             self.last_session_folder = None
+             self.last_session_selected_files = set()
+        else:
+             # Otherwise (re-analyzing the same folder without closing), preserve current runtime selections
+             selections_to_preserve = set(self.file_store.selected_paths())
+        # --- End Preserve Selections Logic ---
+
+
+        # Get exclusion criteria
+        blacklist = self.load_blacklist() # Read on the Tk thread, it may show a warning dialog
+        matcher = build_matcher(blacklist, self.exclude_strings_var.get(), self.exclude_extensions_var.get()) # Compiled once per scan
+
+        # Prepare for new analysis
+        self._save_selection() # Before the list is emptied
+        self._track_selection_of(folder)
+        self.file_store = FileStore() # Filled batch by batch as the worker reports
+        self._populate_file_list_ui(self.file_store)
+        self.analyzed_files_cache = [] # Reset cache
+        self.scan_file_types = set(["*"])
+        self.scan_selections_to_preserve = selections_to_preserve
+        self.scan_hidden_count = 0
+        self.scan_trace = self._new_trace('analyze')
+
+        # Each scan gets its own queue and cancel event; bumping the generation orphans any older worker
+        self.scan_generation += 1
+        self.scan_cancel_event = threading.Event()
+        self.scan_queue = queue.Queue()
+        self.is_analyzing = True
+        self.cancel_button.config(state='normal')
+        self.status_var.set("Scanning... 0 files")
+
+        worker = threading.Thread(
+            target=self._scan_worker,
+            args=(self.scan_queue, self.scan_cancel_event, folder, matcher, self.hide_flagged_var.get(), self.scan_trace,
+                  self.git_files_var.get()),
+            daemon=True)
+        worker.start()
+        self.master.after(SCAN_POLL_MS, self._poll_scan_queue, self.scan_generation)
+
+    def _scan_worker(self, results, cancel_event, folder, matcher, hide_flagged, trace, git_files):
+        """Runs on a background thread. Only talks to the UI through the results queue."""
+        batch = []
+        hidden_count = 0
+        try:
+            # git's file list when asked for and available, otherwise (None) the folder is walked
+            listed_files = git_file_list(folder, self.git_untracked, trace) if git_files else None
+            index = open_index(folder, listed_files)
+            index.load() # Missing, stale or corrupt index files just mean a full listing
+            for relative_path in walk_codebase(folder, matcher, cancel_event, index, trace, listed_files):
+                # Only files new or changed since the index was saved get their first bytes read
+                if trace is not None:
+                    started = perf_counter()
+                kind, _encoding = index.classify(relative_path, self.max_file_bytes)
+                if trace is not None:
+                    trace.add('probe', perf_counter() - started, item=relative_path)
+                if hide_flagged and kind in (KIND_BINARY, KIND_TOO_LARGE):
+                    hidden_count += 1
+                    continue
+                batch.append((relative_path, index.file_stat(relative_path), kind))
+                if len(batch) >= SCAN_BATCH_SIZE:
+                    results.put(('batch', batch, hidden_count))
+                    batch = []
+            if batch or hidden_count:
+                results.put(('batch', batch, hidden_count))
+            if index.complete:
+                try:
+                    index.save()
+                except OSError as e:
+                    print(f"Could not save directory index: {e}")
+            results.put(('done', index, hidden_count))
+        except Exception as e: # Not just OSError: anything left uncaught would leave the UI analyzing forever
+            results.put(('error', e, hidden_count))
+
+    def _poll_scan_queue(self, generation):
+        """Drains scan results on the Tk thread and reschedules itself until the scan finishes."""
+        if generation != self.scan_generation or not self.is_analyzing:
+            return # Stale scan, its results are thrown away
+
+        started = perf_counter()
+        new_records = []
+        finished = None
+        try:
+            for _ in range(SCAN_BATCHES_PER_POLL):
+                kind, payload, self.scan_hidden_count = self.scan_queue.get_nowait()
+                if kind == 'batch':
+                    for relative_path, stat, file_kind in payload:
+                        # Apply preserved selection state
+                        selected = relative_path in self.scan_selections_to_preserve
+                        new_records.append(self._file_record(relative_path, selected, stat, file_kind))
+                        self.analyzed_files_cache.append(relative_path)
+                        self.scan_file_types.add(file_type_of(relative_path))
+                else:
+                    finished = (kind, payload)
+                    break
+        except queue.Empty:
+            pass
+
+        if new_records:
+            self.file_store.extend(new_records)
+            if self.search_matches is None:
+                self.file_list_view.refresh()
+            else:
+                self._apply_search(keep_position=True)
+            self._update_selection_summary()
+            if self.scan_trace is not None:
+                self.scan_trace.add('ui', perf_counter() - started, count=len(new_records))
+
+        if finished is None:
+            self.status_var.set(f"Scanning... {len(self.file_store)} files")
+            self.master.after(SCAN_POLL_MS, self._poll_scan_queue, generation)
+            return
+
+        kind, payload = finished
+        if kind == 'error':
+            self._finish_analysis(f"Analysis failed after {len(self.file_store)} files.")
+            messagebox.showerror("Folder Error", f"Error walking the directory: {payload}\nCheck permissions or folder path.")
+        elif self.scan_cancel_event.is_set():
+            self._finish_analysis(f"Analysis cancelled, {len(self.file_store)} files listed.")
+        else:
+            flagged_count = self.file_store.flagged_count()
+            if self.scan_hidden_count:
+                flagged_text = f", {self.scan_hidden_count} binary/too large hidden"
+            elif flagged_count:
+                flagged_text = f", {flagged_count} binary/too large"
+            else:
+                flagged_text = ""
+            self._finish_analysis(f"Analysis complete, {len(self.file_store)} files found{flagged_text} "
+                                  f"({payload.dirs_reused} folders unchanged, {payload.dirs_scanned} listed).")
+
+    def _finish_analysis(self, status_text):
+        """Updates the filetype dropdown for whatever was scanned and leaves analysis mode."""
+        self.is_analyzing = False # Analysis finished
+        self.cancel_button.config(state='disabled')
+        self.status_var.set(status_text)
+        if self.scan_trace is not None:
+            self._report_trace(self.scan_trace, files=len(self.file_store), status=status_text)
+            self.scan_trace = None
+
+        sorted_types = sorted_file_types(self.scan_file_types)
+        self.update_filetype_dropdown(sorted_types)
+
+        # Restore last used filter from general config (not from saved state)
+        last_filter = self.config.get('UI', 'last_filetype_filter', fallback='*')
+        if last_filter in sorted_types:
+             self.file_type_dropdown_var.set(last_filter)
+        elif sorted_types:
+             self.file_type_dropdown_var.set(sorted_types[0])
+        else:
+             self.file_type_dropdown_var.set('*')
+
+    def cancel_analysis(self):
+        """Stops the running scan; files already listed are kept."""
+        if not self.is_analyzing:
+            return
+        self.scan_cancel_event.set()
+        self.scan_generation += 1 # Ignore anything the worker still has queued
+        self._finish_analysis(f"Analysis cancelled, {len(self.file_store)} files listed.")
+
+    def _on_scan_inputs_changed(self, *_args):
+        """Trace callback: a scan started with other folder/exclusion settings is stale."""
+        if self.is_analyzing:
+            self.cancel_analysis()
+            self.status_var.set("Analysis discarded because the folder or exclusions changed. Press Analyze to rescan.")
+
+
+    def _file_record(self, relative_path, selected, stat, kind=None):
+        """One FileStore record; stat is (size, mtime_ns) or None if unknown, kind a file_probe kind or None."""
+        if stat is None or kind in (KIND_BINARY, KIND_TOO_LARGE):
+            tokens = None # Won't be exported, so it adds nothing to the bundle
+        else:
+            tokens = self.token_estimator.heuristic(relative_path, stat[0])
+        return relative_path, selected, tokens, kind
+
+    def _on_file_toggled(self, position):
+        self._update_selection_summary()
+
+    def _update_selection_summary(self):
+        """Live count and token total of the selection, shown next to Clear All."""
+        count = self.file_store.selected_count()
+        tokens = self.file_store.selected_tokens() if count else 0
+        self.selection_summary_var.set(f"{count} selected, {format_token_count(tokens)} tokens" if count else "")
+        if self.selection_folder is not None:
+            if self.selection_save_id is not None:
+                self.master.after_cancel(self.selection_save_id)
+            self.selection_save_id = self.master.after(SELECTION_SAVE_DELAY_MS, self._save_selection)
+        if self.watcher is not None:
+            self.watcher.set_paths(self._watch_paths(self.watcher.folder))
+
+    def _populate_file_list_ui(self, file_store):
+        """Points the virtualized list at file_store (or its search matches); rows are only built for what is on screen."""
+        self.file_store = file_store
+        self._apply_search()
+        self._update_selection_summary()
+        if self.tree_view_var.get() and len(file_store):
+            self.open_tree(file_store.selected_paths()) # E.g. a loaded state's selection
+
+
+    def clear_file_list_ui(self):
+        self.search_matches = None if self.search_matches is None else []
+        self.file_list_view.set_store(FileStore()) # Also scrolls back to top
+
+    # --- Search box ---
+
+    def _on_search_changed(self, *_args):
+        """Trace callback: filters once typing pauses for SEARCH_DELAY_MS."""
+        if self.search_after_id is not None:
+            self.master.after_cancel(self.search_after_id)
+        self.search_after_id = self.master.after(SEARCH_DELAY_MS, self._apply_search)
+
+    def _apply_search(self, keep_position=False):
+        """Shows the files matching the search box, or all of them while it is empty."""
+        self.search_after_id = None
+        query = self.search_var.get()
+        if not query.strip():
+            self.search_matches = None
+            self.search_count_var.set("")
+            self.file_list_view.set_store(self.file_store, keep_position=keep_position)
+            return
+        try:
+            positions = self.file_store.index.search(self.search_mode_var.get(), query)
+        except ValueError as e: # Half-typed glob, e.g. '[z-'
+            self.search_count_var.set(str(e))
+            return
+        self.search_matches = positions
+        self.search_count_var.set(f"{len(positions)} of {len(self.file_store)}")
+        self.file_list_view.set_store(self.file_store, positions, keep_position=keep_position)
+
+    def select_matches(self, selected):
+        """Ticks or unticks every file matching the search box, including those scrolled out of view."""
+        if not self.search_matches:
+            return
+        self.file_store.set_positions(self.search_matches, selected) # Skips flagged files, like Quick Select
+        self.file_list_view.refresh()
+        self._update_selection_summary()
+
+
+    def update_filetype_dropdown(self, filetypes):
+        # Get the actual menu widget
+        menu = self.filetype_dropdown.nametowidget(self.filetype_dropdown.cget('menu'))
+        menu.delete(0, "end")
+
+        if not filetypes:
+             filetypes = ["*"]
+        elif "*" not in filetypes:
+             filetypes.insert(0,"*")
+
+        current_selection = self.file_type_dropdown_var.get()
+
+        for filetype in filetypes:
+            menu.add_command(label=filetype, command=tk._setit(self.file_type_dropdown_var, filetype))
+
+        # If current selection is no longer valid, default to '*' or the first type
+        if current_selection not in filetypes:
+            if "*" in filetypes:
+                self.file_type_dropdown_var.set("*")
+            elif filetypes:
+                self.file_type_dropdown_var.set(filetypes[0])
+            else: # Should not happen if "*" is always added
+                 self.file_type_dropdown_var.set("*")
+        else:
+             # Ensure the variable is explicitly set even if it didn't change,
+             # sometimes needed to refresh the display
+             self.file_type_dropdown_var.set(current_selection)
+
+
+    def quick_select(self):
+        if self._tree_only_in_list("Quick Select"):
+            return
+        selected_filetype = self.file_type_dropdown_var.get().lower()
+        if not len(self.file_store):
+            return
+
+        # Only selects, never deselects others; flagged files are only selected by hand, the export would refuse them anyway
+        self.file_store.select_type(selected_filetype)
+        self.file_list_view.refresh()
+        self._update_selection_summary()
+
+
+    def clear_all(self):
+        if self.tree_view_var.get() and self.dir_tree is not None:
+            self.dir_tree.clear()
+            self.dir_tree_view.refresh()
+            self._on_tree_toggled('')
+            return
+        self.file_store.clear()
+        self.file_list_view.refresh()
+        self._update_selection_summary()
+
+    def invert_selection(self):
+        if self._tree_only_in_list("Invert"):
+            return
+        self.file_store.invert()
+        self.file_list_view.refresh()
+        self._update_selection_summary()
+
+    def select_folder(self, position, selected):
+        """Context menu: ticks or unticks every file in the clicked file's folder and below."""
+        folder = os.path.dirname(self.file_store.path(position))
+        positions = self.file_store.positions_under(folder) if folder else range(len(self.file_store))
+        self.file_store.set_positions(positions, selected)
+        self.file_list_view.refresh()
+        self._update_selection_summary()
+
+    def select_dependencies(self):
+        """Adds the listed files the selected Python / JS / TS files import, directly or not, found in the background.
+
+        [Dependencies] max_depth limits the import hops followed (0: no limit); a Token Budget keeps the
+        whole selection within it, files that don't fit are left out.
+        """
+        if self._tree_only_in_list("Select Dependencies"):
+            return
+        folder = self.folder_path.get()
+        store = self.file_store
+        seeds = store.selected_paths()
+        if not folder or not seeds:
+            messagebox.showinfo("Info", "Select the files whose imports should be added first.")
+            return
+        if self.dependency_store is not None:
+            return # Still resolving the previous request
+        budget = None
+        budget_text = self.token_budget_var.get().strip().replace('_', '').replace(',', '')
+        if budget_text:
+            try:
+                budget = int(budget_text)
+                if budget <= 0:
+                    raise ValueError
+            except ValueError:
+                messagebox.showerror("Error", "Please enter a positive whole number as token budget, or leave it empty.")
+                return
+            budget -= store.selected_tokens()
+        max_depth = self.config.getint('Dependencies', 'max_depth', fallback=0) or None
+        positions = {relative_path: position for position, relative_path in enumerate(store.paths)}
+
+        def tokens_of(relative_path):
+            return store.tokens_at(positions[relative_path])
+
+        self.dependency_store = store
+        self.status_var.set(f"Resolving the imports of {len(seeds)} selected file(s)...")
+        results = queue.Queue()
+        worker = threading.Thread(
+            target=self._dependency_worker,
+            args=(results, folder, seeds, set(positions), max_depth, budget, tokens_of),
+            daemon=True)
+        worker.start()
+        self.master.after(SCAN_POLL_MS, self._poll_dependencies, results, store, positions)
+
+    def _dependency_worker(self, results, folder, seeds, listed_paths, max_depth, budget, tokens_of):
+        """Runs on a background thread. Only talks to the UI through the results queue."""
+        try:
+            graph = ImportGraph(folder)
+            graph.load() # Only files changed since the last run are parsed again
+            added, skipped = graph.closure(seeds, listed_paths, max_depth, budget, tokens_of)
+            try:
+                graph.save(listed_paths)
+            except OSError as e:
+                print(f"Could not save import cache: {e}")
+            results.put(('done', (added, skipped, graph.files_parsed, graph.files_reused)))
+        except Exception as e:
+            results.put(('error', e))
+
+    def _poll_dependencies(self, results, store, positions):
+        try:
+            kind, payload = results.get_nowait()
+        except queue.Empty:
+            self.master.after(SCAN_POLL_MS, self._poll_dependencies, results, store, positions)
+            return
+        self.dependency_store = None
+        if kind == 'error':
+            messagebox.showerror("Error", f"Failed to resolve imports: {payload}")
+            return
+        if store is not self.file_store:
+            return # The list was replaced meanwhile, e.g. by a new analysis
+        added, skipped, files_parsed, files_reused = payload
+        store.set_positions([positions[relative_path] for relative_path in added], True)
+        self.file_list_view.refresh()
+        self._update_selection_summary()
+        status_text = f"Added {len(added)} dependenc{'y' if len(added) == 1 else 'ies'} ({files_parsed} file(s) parsed, {files_reused} cached)"
+        if skipped:
+            status_text += f", {len(skipped)} left out by the token budget"
+        self.status_var.set(status_text + ".")
+
+    def browse_output_path(self):
+        initial_name = os.path.basename(self.output_path.get() or "exported_code.txt")
+        initial_dir = os.path.dirname(self.output_path.get() or self.folder_path.get() or ".")
+
+        file_selected = filedialog.asksaveasfilename(
+            defaultextension=".txt",
+            filetypes=[("Text files", "*.txt"), ("All files", "*.*")],
+            initialdir=initial_dir,
+            initialfile=initial_name)
+        if file_selected:
+            self.output_path.set(file_selected)
+
+    def _export_target(self):
+        """(folder, output_file_path) if both are usable, after telling the user what's wrong otherwise."""
+        output_file_path = self.output_path.get()
+        if not output_file_path:
+            messagebox.showerror("Error", "Please select an output file path.")
+            return None
+
+        folder = self.folder_path.get()
+
+        if not folder or not os.path.isdir(folder):
+            messagebox.showerror("Error", "Selected codebase folder is invalid or does not exist.")
+            return None
+        return folder, output_file_path
+
+    def export_files(self):
+        target = self._export_target()
+        if target is None:
+            return
+
+        # Iterate through the current runtime list data
+        selected_paths = self._selected_paths()
+        if not selected_paths:
+            messagebox.showinfo("Info", "No files were selected for export.")
+            return
+        self._write_bundle(*target, selected_paths)
+
+    def export_within_budget(self):
+        """Exports the best-fitting part of the selection for the token budget, higher priorities first."""
+        target = self._export_target()
+        if target is None:
+            return
+        folder, _output_file_path = target
+
+        try:
+            budget = int(self.token_budget_var.get().strip().replace('_', '').replace(',', ''))
+            if budget <= 0:
+                raise ValueError
+        except ValueError:
+            messagebox.showerror("Error", "Please enter a positive whole number as token budget.")
+            return
+        try:
+            priority_rules = PriorityRules(self.priorities_var.get())
+        except ValueError as e:
+            messagebox.showerror("Error", f"Invalid priorities: {e}")
+            return
+        if self.budget_estimator is None:
+            try:
+                tokenizer = load_tokenizer(self.config.get('Tokens', 'tokenizer', fallback=''))
+            except Exception as e:
+                messagebox.showerror("Tokenizer Error", f"Could not load the tokenizer set in [Tokens] tokenizer: {e}")
+                return
+            self.budget_estimator = (TokenEstimator(tokenizer, self.token_estimator.bytes_per_token, self.max_file_bytes)
+                                     if tokenizer else self.token_estimator)
+
+        selected_paths = self._selected_paths()
+        if not selected_paths:
+            messagebox.showinfo("Info", "No files were selected for export.")
+            return
+
+        chosen_paths, used_tokens, skipped_paths = select_within_budget(
+            folder, selected_paths, budget, self.budget_estimator, priority_rules)
+        if not chosen_paths:
+            messagebox.showinfo("Info", f"None of the selected files fit in {budget} tokens.")
+            return
+        if skipped_paths:
+            skipped_summary = "\n".join(skipped_paths[:5]) + ("\n..." if len(skipped_paths) > 5 else "")
+            if not messagebox.askyesno("Export Within Budget",
+                                       f"{len(chosen_paths)} of {len(selected_paths)} selected file(s) fit, "
+                                       f"{format_token_count(used_tokens)} of {budget} tokens.\n\n"
+                                       f"Left out:\n{skipped_summary}\n\nExport them?"):
+                return
+        self._write_bundle(*target, chosen_paths)
+
+    def export_changes(self):
+        """Exports only the selected files added or modified since the last export or the git revision, plus removals."""
+        target = self._export_target()
+        if target is None:
+            return
+        folder, _output_file_path = target
+
+        selected_paths = self._selected_paths()
+        if not selected_paths:
+            messagebox.showinfo("Info", "No files were selected for export.")
+            return
+        revision = self.delta_since_var.get().strip()
+        as_diffs = self.delta_diffs_var.get()
+        snapshot = None
+        if revision:
+            try:
+                delta = revision_delta(folder, revision, selected_paths, as_diffs)
+            except GitIndexError as e:
+                messagebox.showerror("Error", f"Could not compare with git revision {revision}: {e}")
+                return
+        else:
+            snapshot = ExportSnapshot(folder)
+            if not snapshot.load():
+                messagebox.showinfo("Info", "There is no earlier export of this folder to compare with. Export it once first.")
+                return
+            delta = snapshot_delta(snapshot, selected_paths, as_diffs)
+        if not delta['paths'] and not delta['removed']:
+            messagebox.showinfo("Info", f"None of the selected files changed since {delta['since']}.")
+            return
+        self._write_bundle(*target, delta['paths'], delta, snapshot)
+
+    def _write_bundle(self, folder, output_file_path, selected_paths, delta=None, snapshot=None):
+        """Exports selected_paths. delta is a delta_export result for a changes-only export, whose snapshot
+        (None for a git revision) is then updated; a full export replaces the folder's snapshot. Either records
+        what the export read, keeping contents for diffs only if "As unified diffs" is ticked."""
+        def confirm_partial_export(exported_count, export_errors):
+            """Asked once every file was read, before the bundle replaces the output file."""
+            if export_errors:
+                 error_summary = "\n".join(export_errors[:5]) + ("\n..." if len(export_errors) > 5 else "")
+                 messagebox.showwarning("Export Warning", f"{len(export_errors)} file(s) could not be read:\n\n{error_summary}")
+                 if exported_count == 0 and (delta is None or not delta['removed']):
+                      messagebox.showerror("Export Failed", "None of the selected files could be read. Aborting export.")
+                      return False
+                 if not messagebox.askyesno("Continue Export?", f"Errors occurred. Export the {exported_count} successfully read file(s)?"):
+                      return False
+            return True
+
+        try:
+            export_options = self._export_options()
+        except ValueError as e:
+            messagebox.showerror("Error", str(e))
+            return
+        if delta is not None and export_options[0] is not None:
+            messagebox.showerror("Error", "Changes are exported to a single file; clear Split Into Shards Of.")
+            return
+        if delta is None:
+            snapshot = ExportSnapshot(folder) # Replaced as a whole, nothing to load
+            started_at_ns = time.time_ns()
+        elif snapshot is not None:
+            started_at_ns = snapshot.compared_at_ns
+        records = {} if snapshot is not None else None
+        keep_content = snapshot.store_content if snapshot is not None and self.delta_diffs_var.get() else None
+        stats_before = self.content_cache.stats()
+        trace = self._new_trace('export')
+        dedup = DuplicateTracker() if self.dedup_var.get() else None
+        try:
+            exported_count, export_errors, committed, written_to = self._run_export(
+                folder, selected_paths, output_file_path, export_options, confirm_partial_export, trace, dedup,
+                delta, records, keep_content)
+        except Exception as e:
+            messagebox.showerror("Error Writing File", f"Could not write to output file: {output_file_path}. Error: {e}")
+            return
+        finally:
+            stats = self.content_cache.stats()
+            self.status_var.set(f"Export read {stats['misses'] - stats_before['misses']} file(s), "
+                                f"{stats['hits'] - stats_before['hits']} served from cache "
+                                f"({stats['entries']} cached, {stats['bytes'] / (1024 * 1024):.1f} MB).")
+
+        if trace is not None:
+            self._report_trace(trace, files=exported_count, errors=len(export_errors), committed=committed)
+
+        if committed and snapshot is not None:
+            if delta is None:
+                snapshot.record(records, started_at_ns, replace=True)
+            else:
+                snapshot.record(records, started_at_ns, delta['removed'])
+            try:
+                snapshot.save()
+            except OSError as e:
+                print(f"Could not save the export snapshot {snapshot.snapshot_path}: {e}")
+
+        if committed:
+            if delta is None:
+                success_message = f"Successfully exported {exported_count} file(s) to:\n{written_to}"
+            else:
+                success_message = (f"Exported {exported_count} file(s) changed since {delta['since']} "
+                                   f"({len(delta['added'])} added, {len(delta['modified'])} modified, "
+                                   f"{len(delta['removed'])} removed) to:\n{written_to}")
+            minify_report = self.minifier.report() if self.minify_var.get() else None
+            if minify_report and minify_report['files']:
+                success_message += f"\n{format_savings(minify_report['total'])}."
+            if dedup is not None and dedup.duplicates:
+                success_message += (f"\n{len(dedup.duplicates)} duplicate(s) written as references "
+                                    f"(~{dedup.saved_bytes / 1024:.0f} KB saved).")
+            if export_errors:
+                 success_message += f"\n({len(export_errors)} selected file(s) failed to read)."
+            messagebox.showinfo("Success", success_message)
+
+
+    def _export_options(self):
+        """(shard_limit or None, output format, compression or None) from the export widgets. Raises ValueError."""
+        output_format = get_output_format(self.output_format_var.get())
+        compression = check_compression(self.compression_var.get())
+        parsed = parse_shard_limit(self.shard_limit_var.get())
+        if parsed is None:
+            return None, output_format, compression
+        if output_format is not PLAIN_FORMAT or compression is not None:
+            raise ValueError("Sharded export only writes the plain format, uncompressed.")
+        # Token limits count with the budget's tokenizer once it was loaded, else by the byte heuristic
+        tokenizer = self.budget_estimator.tokenizer if self.budget_estimator is not None else None
+        shard_limit = ShardLimit(*parsed, tokenizer=tokenizer, bytes_per_token=self.token_estimator.bytes_per_token)
+        return shard_limit, output_format, compression
+
+    def _run_export(self, folder, selected_paths, output_file_path, export_options, should_commit, trace, dedup=None,
+                    delta=None, records=None, keep_content=None):
+        """Writes one bundle, or shards plus manifest if a shard limit is set. Returns (count, errors, committed, written_to).
+
+        Once it committed, the other layout's files from an earlier export to the same path are removed.
+        With a delta_export result as delta, the bundle gets its diffs and removed files (never sharded). records
+        and keep_content are write_export_bundle's.
+        """
+        shard_limit, output_format, compression = export_options
+        workers = self.config.getint('Export', 'read_workers', fallback=EXPORT_READ_WORKERS)
+        minifier = self.minifier if self.minify_var.get() else None
+        if shard_limit is None:
+            exported_count, export_errors, committed = write_export_bundle(
+                folder, selected_paths, output_file_path, should_commit=should_commit, workers=workers,
+                cache=self.content_cache, max_file_bytes=self.max_file_bytes, trace=trace, output_format=output_format,
+                compression=compression, write_index=self.write_index_var.get(), dedup=dedup, minifier=minifier,
+                diff=delta['diff'] if delta is not None else None, removed_paths=delta['removed'] if delta is not None else (),
+                records=records, keep_content=keep_content)
+            if committed:
+                remove_sharded_layout(output_file_path)
+            return exported_count, export_errors, committed, output_file_path
+        return write_sharded_export(
+            folder, selected_paths, output_file_path, shard_limit, should_commit=should_commit, workers=workers,
+            cache=self.content_cache, max_file_bytes=self.max_file_bytes, trace=trace, dedup=dedup, minifier=minifier,
+            records=records, keep_content=keep_content)
+
+
+    # --- Tree view ---
+
+    def _show_file_view(self):
+        """Packs the tree or the flat list with its search controls, whichever tree_view_var asks for."""
+        if self.tree_view_var.get():
+            self.search_controls.pack_forget()
+            self.file_list_view.pack_forget()
+            self.dir_tree_view.pack(side="top", fill="both", expand=True)
+        else:
+            self.dir_tree_view.pack_forget()
+            self.search_controls.pack(side="left", fill="x", expand=True)
+            self.file_list_view.pack(side="top", fill="both", expand=True)
+
+    def toggle_tree_view(self):
+        """Switches between the tree and the list; the one switched to takes over the other's selection."""
+        self._show_file_view()
+        folder = self.folder_path.get()
+        if self.tree_view_var.get():
+            self.cancel_analysis() # The tree lists directories itself, as they are expanded
+            if folder and os.path.isdir(folder):
+                self.open_tree(self.file_store.selected_paths() if len(self.file_store) else None)
+            return
+
+        tree = self.dir_tree
+        self._stop_rollups()
+        self.dir_tree = None
+        self.dir_tree_view.set_tree(None)
+        self.selection_summary_var.set("")
+        if tree is None:
+            return
+        if len(self.file_store):
+            store = self.file_store
+            store.clear()
+            store.set_positions([position for position, relative_path in enumerate(store.paths)
+                                 if tree.is_selected(relative_path)], True)
+            self.file_list_view.refresh()
+            self._update_selection_summary()
+        elif folder and os.path.isdir(folder):
+            # Not analyzed yet: the scan ticks the tree's files as it lists them, like a restored session's
+            self.last_session_folder = folder
+            self.last_session_selected_files = set(tree.selected_paths())
+            self.analyze_folder()
+
+    def open_tree(self, selected_paths=None):
+        """Shows the folder's top level in tree view and starts totalling up its directories in the background.
+
+        selected_paths are ticked if given; otherwise the current tree's selection is kept when it is of the
+        same folder (re-listing with changed exclusions), else the selection stored for the folder is used.
+        """
+        folder = self.folder_path.get()
+        if not folder or not os.path.isdir(folder):
+            return
+        matcher = build_matcher(self.load_blacklist(), self.exclude_strings_var.get(), self.exclude_extensions_var.get())
+        previous = self.dir_tree
+        if selected_paths is None and previous is not None and previous.folder == os.path.abspath(folder):
+            tree = previous.relisted(matcher)
+        else:
+            tree = LazyDirTree(folder, matcher)
+            tree.select_paths(selected_paths if selected_paths is not None else self._stored_selection(folder))
+        self._stop_rollups()
+        self.dir_tree = tree
+        self.dir_tree_view.set_tree(tree)
+        self.selection_summary_var.set("")
+        self.status_var.set("Counting files in the background...")
+        self.rollup_queue = queue.Queue()
+        self.rollups = DirectoryRollups(folder, matcher, self.rollup_queue.put).start()
+        self.rollups.request([''])
+        self.master.after(ROLLUP_POLL_MS, self._poll_rollups, self.rollups)
+
+    def _stored_selection(self, folder):
+        """The restored session's selection if folder is the one it was for (used up), else the workspace store's."""
+        if folder == self.last_session_folder:
+            selected = self.last_session_selected_files
+            self.last_session_folder = None
+            self.last_session_selected_files = set()
+            return selected
+        return self._workspace_selection(folder) if self.workspace is not None else set()
+
+    def _save_tree_selection(self):
+        """Writes tree view's selection to the workspace store. Stored paths the tree still ticks but didn't
+        find (excluded, missing) keep their state, like unlisted files in the list."""
+        tree = self.dir_tree
+        if self.workspace is None:
+            return
+        selected = set(tree.selected_paths())
+        try:
+            stored = self.workspace.selected_paths(tree.folder)
+            self.workspace.update_selection(
+                tree.folder, selected - stored,
+                [relative_path for relative_path in stored if relative_path not in selected and not tree.is_selected(relative_path)])
+        except sqlite3.Error as e:
+            print(f"Could not save the selection: {e}")
+            return
+        if self.selection_folder is not None and os.path.abspath(self.selection_folder) == tree.folder:
+            self.saved_selection = self._workspace_selection(tree.folder)
+
+    def _stop_rollups(self):
+        if self.rollups is not None:
+            self.rollups.stop()
+            self.rollups = None
+
+    def _poll_rollups(self, rollups):
+        """Shows directory totals as the rollup thread reports them, until tree view closes or re-lists."""
+        if rollups is not self.rollups:
+            return
+        totals = {}
+        try:
+            while True:
+                totals.update(self.rollup_queue.get_nowait())
+        except queue.Empty:
+            pass
+        if totals:
+            self.dir_tree_view.set_totals(totals)
+            if '' in totals:
+                count, size = totals['']
+                self.status_var.set(f"{count} files ({size / (1024 * 1024):.1f} MB) in {self.dir_tree.folder}.")
+        self.master.after(ROLLUP_POLL_MS, self._poll_rollups, rollups)
+
+    def _on_tree_opened(self, rel_dir):
+        if self.rollups is not None:
+            self.rollups.request([rel_dir])
+
+    def _on_tree_toggled(self, _relative_path):
+        if self.watcher is None:
+            return
+        # Ticking a directory can select a whole subtree, so the walk waits for the clicks to pause and runs on a thread
+        if self.watch_paths_id is not None:
+            self.master.after_cancel(self.watch_paths_id)
+        self.watch_paths_id = self.master.after(WATCH_PATHS_DELAY_MS, self._start_watch_paths_walk)
+
+    def _start_watch_paths_walk(self):
+        self.watch_paths_id = None
+        if self.watcher is None or self.dir_tree is None:
+            return
+        self.watch_paths_cancel_event.set() # A walk still running is superseded
+        self.watch_paths_cancel_event = threading.Event()
+        with self.watch_paths_lock:
+            self.watch_paths_generation += 1
+            generation = self.watch_paths_generation
+        threading.Thread(target=self._watch_paths_worker, name="watch-paths", daemon=True,
+                         args=(self.watcher, self.dir_tree.copy(), os.path.abspath(self.output_path.get()),
+                               generation, self.watch_paths_cancel_event)).start()
+
+    def _watch_paths_worker(self, watcher, tree, output_file_path, generation, cancel_event):
+        """Runs on a background thread: walks a copy of tree view's selection and hands it to the watcher."""
+        try:
+            watch_paths = [relative_path for relative_path in tree.selected_paths(cancel_event)
+                           if os.path.join(tree.folder, relative_path) != output_file_path]
+        except Exception as e:
+            print(f"Could not list the selected files to watch: {e}")
+            return
+        with self.watch_paths_lock:
+            if generation == self.watch_paths_generation and not cancel_event.is_set():
+                watcher.set_paths(watch_paths) # Thread-safe
+
+    def _tree_only_in_list(self, action):
+        """True (after saying so) if tree view is on and action only works on the flat list."""
+        if not self.tree_view_var.get():
+            return False
+        self.status_var.set(f"{action} works on the file list; switch off Tree view to use it.")
+        return True
+
+    def _selected_paths(self):
+        """The files to export: tree view's ticked files (ticked folders are walked) or the list's selection."""
+        if self.tree_view_var.get() and self.dir_tree is not None:
+            return self.dir_tree.selected_paths()
+        return self.file_store.selected_paths()
+
+
+    # --- Timings ---
+
+    def _new_trace(self, operation):
+        """A Trace for the operation, or None when [Trace] enabled is off so nothing gets timed."""
+        if not self.config.getboolean('Trace', 'enabled', fallback=True):
+            return None
+        return Trace(operation)
+
+    def _report_trace(self, trace, **info):
+        """Shows the trace's summary under the status line and appends it to [Trace] trace_file if set."""
+        trace.finish(**info)
+        self.timing_var.set(trace.summary())
+        trace_file = self.config.get('Trace', 'trace_file', fallback='')
+        if trace_file:
+            try:
+                append_trace(trace_file, trace)
+            except OSError as e:
+                print(f"Could not write trace file {trace_file}: {e}")
+
+
+    # --- Watch Mode ---
+
+    def _watch_paths(self, folder):
+        """Selected files to watch, minus the output file so writing the bundle doesn't trigger another export."""
+        output_file_path = os.path.abspath(self.output_path.get())
+        return [relative_path for relative_path in self._selected_paths()
+                if os.path.join(folder, relative_path) != output_file_path]
+
+    def toggle_watch(self):
+        if not self.watch_var.get():
+            self.stop_watch()
+            self.status_var.set("Watch mode off.")
+            return
+        target = self._export_target()
+        if target is None:
+            self.watch_var.set(False)
+            return
+        folder = os.path.abspath(target[0])
+        watch_paths = self._watch_paths(folder)
+        if not watch_paths:
+            messagebox.showinfo("Info", "No files were selected for export.")
+            self.watch_var.set(False)
+            return
+        self.watch_queue = queue.Queue()
+        self.watcher = FileWatcher(folder, watch_paths, self.watch_queue.put, debounce_s=self.config.getfloat(
+            'Export', 'watch_debounce_s', fallback=WATCH_DEBOUNCE_S)).start()
+        self._watch_export(None) # Bring the bundle up to date before waiting for changes
+        self.master.after(WATCH_POLL_MS, self._poll_watch_queue, self.watcher)
+
+    def stop_watch(self):
+        if self.watcher is None:
+            return
+        if self.watch_paths_id is not None:
+            self.master.after_cancel(self.watch_paths_id)
+            self.watch_paths_id = None
+        self.watch_paths_cancel_event.set()
+        with self.watch_paths_lock:
+            self.watch_paths_generation += 1 # A walk in progress must not touch the stopped watcher
+        self.watcher.stop()
+        self.watcher = None
+        self.watch_var.set(False)
+
+    def _poll_watch_queue(self, watcher):
+        if watcher is not self.watcher:
+            return # Watch mode was turned off or restarted
+        changed = set()
+        try:
+            while True:
+                changed |= self.watch_queue.get_nowait()
+        except queue.Empty:
+            pass
+        if changed:
+            self._watch_export(changed)
+        self.master.after(WATCH_POLL_MS, self._poll_watch_queue, watcher)
+
+    def _watch_export(self, changed):
+        """Re-exports the current selection without dialogs; the outcome goes to the status bar."""
+        output_file_path = self.output_path.get()
+        selected_paths = self._selected_paths()
+        if not output_file_path or not selected_paths:
+            self.status_var.set("Watching, but nothing is selected or no output file is set.")
+            return
+        trace = self._new_trace('watch_export')
+        try:
+            exported_count, export_errors, committed, _written_to = self._run_export(
+                self.watcher.folder, selected_paths, output_file_path, self._export_options(),
+                lambda count, errors: count > 0, trace, DuplicateTracker() if self.dedup_var.get() else None)
+        except Exception as e:
+            print(f"Watch export failed: {e}")
+            self.status_var.set(f"Watch export to {output_file_path} failed: {e}")
+            return
+        for error in export_errors:
+            print(error)
+        if trace is not None:
+            self._report_trace(trace, files=exported_count, errors=len(export_errors), committed=committed)
+        reason = f"{len(changed)} changed file(s)" if changed else "watch start"
+        if committed:
+            status_text = f"{time.strftime('%H:%M:%S')} re-exported {exported_count} file(s) after {reason}"
+        else:
+            status_text = f"{time.strftime('%H:%M:%S')} none of the selected files could be read, bundle left as is"
+        if export_errors:
+            status_text += f", {len(export_errors)} failed to read"
+        self.status_var.set(f"{status_text}. Watching {len(selected_paths)} file(s) via {self.watcher.backend_name}.")
+
+
+    # --- Save/Load State Methods ---
+
+    def save_state(self):
+        """Saves the current UI state (paths, exclusions, selections) to a JSON file."""
+        current_folder = self.folder_path.get()
+        if not current_folder or not self.analyzed_files_cache: # Check cache which persists even if list is empty
+            messagebox.showwarning("Save State", "Please select and successfully analyze a folder before saving state.")
+            return
+
+        folder_name = os.path.basename(current_folder.rstrip('/\\')) or "project"
+        initial_filename = f"{folder_name}.llmexport"
+        # Suggest saving inside the project folder or its parent
+        initial_dir = current_folder if os.path.isdir(current_folder) else os.path.dirname(current_folder)
+
+        state_filepath = filedialog.asksaveasfilename(
+            title="Save Exporter State",
+            initialdir=initial_dir,
+            initialfile=initial_filename,
+            defaultextension=".llmexport",
+            filetypes=[("LLM Exporter State", "*.llmexport"), ("All Files", "*.*")]
+        )
+
+        if not state_filepath: return
+
+        # Gather state data from current runtime
+        selected_files = self._selected_paths()
+
+        state_data = build_state_data(
+            current_folder, self.output_path.get(),
+            self.exclude_strings_var.get(), self.exclude_extensions_var.get(),
+            self.file_type_dropdown_var.get(),
+            self.analyzed_files_cache, selected_files)
+
+        try:
+            write_state_file(state_filepath, state_data, compress=self.config.getboolean('State', 'compress', fallback=False))
+            messagebox.showinfo("Save State", f"State successfully saved to:\n{state_filepath}")
+        except Exception as e:
+            messagebox.showerror("Save State Error", f"Failed to save state file: {e}")
+
+    def load_state(self):
+        """Loads UI state from a JSON file, overwriting current settings and selections."""
+        state_filepath = filedialog.askopenfilename(
+            title="Load Exporter State",
+            defaultextension=".llmexport",
+            filetypes=[("LLM Exporter State", "*.llmexport"), ("All Files", "*.*")]
+        )
+
+        if not state_filepath: return
+
+        try:
+            state_data = read_state_file(state_filepath)
+        except Exception as e:
+             # Error reading or parsing the file itself
+             messagebox.showerror("Load State Error", f"Failed to read or parse state file: {e}")
+             return # Exit early if file can't even be read
+
+        # --- Apply Loaded State ---
+        self._save_selection() # The current project's, before the state replaces it
+        try:
+            # --- Start Applying State ---
+            if state_data.get("version") not in READABLE_STATE_VERSIONS:
+                 messagebox.showwarning("Load State", "State file is from an incompatible version.")
+
+            # Load Paths
+            loaded_folder = state_data.get("paths", {}).get("folder_path", "")
+            # Check immediately if the crucial folder path is valid
+            if not loaded_folder or not os.path.isdir(loaded_folder):
+                 messagebox.showwarning("Load State Warning", f"The folder path specified in the state file is invalid or no longer exists:\n{loaded_folder}\n\nOther settings will be loaded, but you'll need to select a valid folder.")
+                 # Don't return, allow loading other settings, but set path to the invalid one
+                 # so user sees what was loaded. Alternatively, clear it: self.folder_path.set("")
+
+            # Set paths regardless of folder validity for now
+            self.folder_path.set(loaded_folder)
+            self.output_path.set(state_data.get("paths", {}).get("output_path", ""))
+
+            # Load Exclusions
+            self.exclude_strings_var.set(state_data.get("exclusions", {}).get("exclude_strings", ""))
+            self.exclude_extensions_var.set(state_data.get("exclusions", {}).get("exclude_extensions", ""))
+
+            # Load UI settings
+            loaded_filter = state_data.get("ui", {}).get("last_filetype_filter", "*")
+
+            # Load Analysis Data and Rebuild UI List
+            loaded_analyzed_files, loaded_selected_files = state_file_lists(state_data)
+
+            self.analyzed_files_cache = loaded_analyzed_files
+            new_records = []
+            file_types = set(["*"])
+
+            if not loaded_analyzed_files:
+                 print("Loaded state contains no analyzed file list.")
+
+            for relative_path in loaded_analyzed_files:
+                # No stat yet; the comparison with the folder below fills in sizes and token estimates
+                new_records.append(self._file_record(relative_path, relative_path in loaded_selected_files, None))
+                file_types.add(file_type_of(relative_path))
+
+            # Update the main data list and UI; the loaded selection becomes the folder's remembered one
+            self._track_selection_of(loaded_folder)
+            self._populate_file_list_ui(FileStore(new_records))
+
+            # Update and set dropdown
+            sorted_types = sorted_file_types(file_types)
+            self.update_filetype_dropdown(sorted_types)
+
+            if loaded_filter in sorted_types:
+                self.file_type_dropdown_var.set(loaded_filter)
+            elif sorted_types:
+                self.file_type_dropdown_var.set(sorted_types[0])
+            else:
+                self.file_type_dropdown_var.set("*")
+
+            # Clear session memory after successful load
+            self.last_session_folder = None
+            self.last_session_selected_files = set()
+
+            if loaded_folder and os.path.isdir(loaded_folder):
+                self._start_state_diff(loaded_folder, loaded_analyzed_files, loaded_selected_files)
+            else:
+                messagebox.showinfo("Load State", "State successfully loaded.")
+            # --- End Applying State ---
+
+        except Exception as e:
+             # --- Error handling specifically for *applying* the state ---
+             messagebox.showerror("Load State Error", f"An error occurred while applying the loaded state data: {e}\n\nAttempting to reset UI to default state.")
+
+             # --- Reset UI to Default State ---
+             self.folder_path.set("")
+             self.output_path.set("")
+             self.exclude_strings_var.set("")
+             self.exclude_extensions_var.set("")
+
+             self.clear_file_list_ui() # Clear visual list
+             self.file_store = FileStore() # Clear internal data list
+             self._track_selection_of(None)
+             self.analyzed_files_cache = [] # Clear analyzed file cache
+
+             # Reset dropdown
+             self.update_filetype_dropdown([]) # Update options to just "*"
+             self.file_type_dropdown_var.set("*") # Set value to "*"
+
+             # Reset session memory too
+             self.last_session_folder = None
+             self.last_session_selected_files = set()
+
+             print("UI reset due to error applying loaded state.")
+             # --- End Reset ---
+
+    def _start_state_diff(self, folder, saved_files, saved_selected):
+        """Lists folder in the background, reusing the directory index, and compares it with a loaded state.
+
+        Runs as an analysis (Cancel stops it, changing the folder discards it) but without the batch-by-batch
+        list updates; the loaded list stays on screen until the comparison replaces it.
+        """
+        blacklist = self.load_blacklist()
+        matcher = build_matcher(blacklist, self.exclude_strings_var.get(), self.exclude_extensions_var.get())
+        self.scan_generation += 1
+        self.scan_cancel_event = threading.Event()
+        self.is_analyzing = True
+        self.cancel_button.config(state='normal')
+        self.status_var.set("State loaded, comparing it with the folder...")
+        results = queue.Queue()
+        worker = threading.Thread(
+            target=self._state_diff_worker,
+            args=(results, self.scan_cancel_event, folder, matcher, self.hide_flagged_var.get(), self.git_files_var.get()),
+            daemon=True)
+        worker.start()
+        self.master.after(SCAN_POLL_MS, self._poll_state_diff, self.scan_generation, results, saved_files, saved_selected)
+
+    def _state_diff_worker(self, results, cancel_event, folder, matcher, hide_flagged, git_files):
+        """Runs on a background thread. Only talks to the UI through the results queue."""
+        try:
+            relative_paths, index = scan_folder(folder, matcher, cancel_event, classify=True, max_file_bytes=self.max_file_bytes,
+                                                file_source='git' if git_files else 'walk', include_untracked=self.git_untracked)
+            listed = []
+            for relative_path in relative_paths:
+                kind, _encoding = index.classify(relative_path, self.max_file_bytes) # Answered from memory now
+                if hide_flagged and kind in (KIND_BINARY, KIND_TOO_LARGE):
+                    continue
+                listed.append((relative_path, index.file_stat(relative_path), kind))
+            results.put(('done', listed))
+        except Exception as e: # Anything uncaught would leave the UI analyzing forever
+            results.put(('error', e))
+
+    def _poll_state_diff(self, generation, results, saved_files, saved_selected):
+        if generation != self.scan_generation or not self.is_analyzing:
+            return # Cancelled, or the folder changed
+        try:
+            kind, payload = results.get_nowait()
+        except queue.Empty:
+            self.master.after(SCAN_POLL_MS, self._poll_state_diff, generation, results, saved_files, saved_selected)
+            return
+        self.is_analyzing = False
+        self.cancel_button.config(state='disabled')
+        if kind == 'error':
+            self.status_var.set("State loaded, but the folder could not be listed to compare it.")
+            messagebox.showwarning("Load State", f"State loaded, but listing the folder failed: {payload}")
+            return
+
+        current_files = [relative_path for relative_path, _stat, _kind in payload]
+        diff = diff_file_lists(saved_files, saved_selected, current_files)
+        self.analyzed_files_cache = current_files
+        self._populate_file_list_ui(FileStore(
+            self._file_record(relative_path, relative_path in saved_selected, stat, file_kind)
+            for relative_path, stat, file_kind in payload))
+        self.update_filetype_dropdown(sorted_file_types(self.file_store.file_types() | {"*"}))
+
+        if not diff['added'] and not diff['removed']:
+            summary = f"State loaded; the folder still matches it ({len(current_files)} files, {diff['selected_present']} selected)."
+            self.status_var.set(summary)
+            messagebox.showinfo("Load State", summary)
+            return
+        summary = (f"State loaded: {len(diff['added'])} files added and {len(diff['removed'])} removed since it was saved, "
+                   f"{diff['selected_present']} selected files still present")
+        if diff['removed_selected']:
+            summary += f", {len(diff['removed_selected'])} selected files gone"
+        self.status_var.set(summary + ".")
+        details = [summary + "."]
+        for title, paths in (("Added", diff['added']), ("Removed", diff['removed']), ("Selected but gone", diff['removed_selected'])):
+            if paths:
+                more = f"\n  ... and {len(paths) - STATE_DIFF_LISTED} more" if len(paths) > STATE_DIFF_LISTED else ""
+                details.append(f"{title}:\n  " + "\n  ".join(paths[:STATE_DIFF_LISTED]) + more)
+        messagebox.showinfo("Load State", "\n\n".join(details))
@@ -0,0 +1,186 @@
+import tkinter as tk
+
+from file_probe import KIND_BINARY, KIND_TOO_LARGE
+from selection_model import FileStore
+from token_budget import format_token_count
+
+WHEEL_SCROLL_ROWS = 3 # Rows moved per mouse wheel notch
+FLAGGED_KINDS = {KIND_BINARY: "binary", KIND_TOO_LARGE: "too large"} # Shown instead of the token estimate
+
+
+class VirtualFileList(tk.Frame):
+    """Scrollable checkbox list that only creates widgets for the rows on screen.
+
+    Shows the files of a selection_model.FileStore owned by the caller, all of them or only those at
+    a list of positions (search matches). Each row has the file's checkbox and path plus its token
+    estimate, replaced by a red flag for files whose kind is in FLAGGED_KINDS. A small
+    pool of row widgets is re-bound to whichever slice of the rows is visible, so the
+    widget count depends on the window height and not on the number of files.
+    """
+
+    def __init__(self, master, on_toggle=None, on_select_folder=None, **kwargs):
+        super().__init__(master, **kwargs)
+        self.store = FileStore()
+        self.positions = None # Store positions shown, None for all of them
+        self.on_toggle = on_toggle # Called with the store position after its checkbox is clicked
+        self.on_select_folder = on_select_folder # Called with (store position, selected) from the context menu
+        self.top_index = 0 # Index of the list row shown in the first widget row
+        self.visible_rows = 1 # Rows that fit fully in the current height
+        self.rows = [] # Pool of {'frame', 'var', 'entry', 'tokens_label', 'index'} dicts, index being the list row shown
+        self.row_height = 0
+
+        self.scrollbar = tk.Scrollbar(self, orient="vertical", command=self.yview)
+        self.rows_frame = tk.Frame(self)
+        self.scrollbar.pack(side="right", fill="y")
+        self.rows_frame.pack(side="left", fill="both", expand=True)
+        self.rows_frame.bind("<Configure>", self._on_configure)
+        self._bind_wheel(self.rows_frame)
+
+        self.context_menu = tk.Menu(self, tearoff=0)
+        self.context_menu.add_command(label="Copy Path", command=self._copy_context_path)
+        if on_select_folder is not None:
+            self.context_menu.add_command(label="Select Folder", command=lambda: self._select_context_folder(True))
+            self.context_menu.add_command(label="Deselect Folder", command=lambda: self._select_context_folder(False))
+        self.context_position = None
+
+    # --- Public API ---
+
+    def set_store(self, store, positions=None, keep_position=False):
+        """Shows store's files, or those at positions, from the top unless keep_position (a filter re-run as files arrive)."""
+        self.store = store
+        self.positions = positions
+        self.context_position = None
+        if not keep_position:
+            self.top_index = 0
+        self.refresh()
+
+    def refresh(self):
+        """Re-renders the visible rows, e.g. after files were appended or selections changed in bulk."""
+        self._render()
+
+    def scroll_to_top(self):
+        self.top_index = 0
+        self._render()
+
+    def yview(self, *args):
+        """Scrollbar command, accepts the same 'moveto'/'scroll' arguments as Canvas.yview."""
+        if not args:
+            return
+        if args[0] == "moveto":
+            self.top_index = int(float(args[1]) * self._row_count())
+        elif args[0] == "scroll":
+            step = int(args[1])
+            if args[2] == "pages":
+                step *= max(1, self.visible_rows - 1)
+            self.top_index += step
+        self._render()
+
+    def _row_count(self):
+        return len(self.store) if self.positions is None else len(self.positions)
+
+    def _position(self, index):
+        return index if self.positions is None else self.positions[index]
+
+    # --- Row pool ---
+
+    def _create_row(self):
+        frame = tk.Frame(self.rows_frame)
+        var = tk.IntVar()
+        row = {'frame': frame, 'var': var, 'entry': None, 'tokens_label': None, 'index': None}
+        cb = tk.Checkbutton(frame, variable=var, anchor="w", command=lambda: self._on_row_toggled(row))
+        cb.pack(side='left')
+        tokens_label = tk.Label(frame, fg='gray40', anchor="e", width=8)
+        tokens_label.pack(side='right')
+        row['tokens_label'] = tokens_label
+        # Use an Entry for the text part to make it selectable/copyable
+        entry = tk.Entry(frame, relief="flat", bg=frame.cget('bg'), fg='black', readonlybackground=frame.cget('bg'))
+        entry.config(state="readonly") # Make it non-editable but selectable
+        entry.pack(side='left', fill='x', expand=True)
+        row['entry'] = entry
+        for widget in (frame, cb, entry, tokens_label):
+            self._bind_wheel(widget)
+            widget.bind("<Button-3>", lambda event: self._show_context_menu(event, row))
+        self.rows.append(row)
+        return row
+
+    def _on_configure(self, event):
+        if not self.row_height:
+            probe = self.rows[0] if self.rows else self._create_row()
+            probe['frame'].update_idletasks()
+            self.row_height = max(1, probe['frame'].winfo_reqheight() + 2) # +2 matches the old pady=1
+        self.visible_rows = max(1, event.height // self.row_height)
+        needed = self.visible_rows + 1 # One partially visible row at the bottom
+        while len(self.rows) < needed:
+            self._create_row()
+        self._render()
+
+    def _render(self):
+        store = self.store
+        total = self._row_count()
+        max_top = max(0, total - self.visible_rows)
+        self.top_index = min(max(0, self.top_index), max_top)
+
+        for i, row in enumerate(self.rows):
+            index = self.top_index + i
+            if index >= total or i > self.visible_rows:
+                row['index'] = None
+                row['frame'].place_forget()
+                continue
+            position = self._position(index)
+            relative_path = store.path(position)
+            if row['index'] != index or row['entry'].get() != relative_path:
+                entry = row['entry']
+                entry.config(state="normal")
+                entry.delete(0, "end")
+                entry.insert(0, relative_path)
+                entry.config(state="readonly")
+            flag = FLAGGED_KINDS.get(store.kind(position))
+            if flag:
+                row['tokens_label'].config(text=flag, fg='red3')
+            else:
+                row['tokens_label'].config(text=format_token_count(store.tokens_at(position)), fg='gray40')
+            row['index'] = index
+            row['var'].set(1 if store.is_selected(position) else 0)
+            row['frame'].place(x=2, y=i * self.row_height, relwidth=1, width=-4)
+
+        if total:
+            self.scrollbar.set(self.top_index / total, min(1.0, (self.top_index + self.visible_rows) / total))
+        else:
+            self.scrollbar.set(0, 1)
+
+    def _on_row_toggled(self, row):
+        if row['index'] is None or row['index'] >= self._row_count():
+            return
+        position = self._position(row['index'])
+        self.store.set_selected(position, row['var'].get() == 1)
+        if self.on_toggle:
+            self.on_toggle(position)
+
+    # --- Mouse wheel and context menu ---
+
+    def _bind_wheel(self, widget):
+        widget.bind("<MouseWheel>", self._on_mousewheel) # Windows / macOS
+        widget.bind("<Button-4>", lambda event: self.yview("scroll", -WHEEL_SCROLL_ROWS, "units")) # X11
+        widget.bind("<Button-5>", lambda event: self.yview("scroll", WHEEL_SCROLL_ROWS, "units"))
+
+    def _on_mousewheel(self, event):
+        if not event.delta:
+            return "break"
+        notches = event.delta // 120 if abs(event.delta) >= 120 else (1 if event.delta > 0 else -1)
+        self.yview("scroll", -notches * WHEEL_SCROLL_ROWS, "units")
+        return "break"
+
+    def _show_context_menu(self, event, row):
+        if row['index'] is None:
+            return
+        self.context_position = self._position(row['index'])
+        self.context_menu.tk_popup(event.x_root, event.y_root)
+
+    def _copy_context_path(self):
+        if self.context_position is not None:
+            self.clipboard_clear()
+            self.clipboard_append(self.store.path(self.context_position))
+
+    def _select_context_folder(self, selected):
+        if self.context_position is not None:
+            self.on_select_folder(self.context_position, selected)
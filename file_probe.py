@@ -0,0 +1,58 @@
+"""Cheap binary / encoding detection from the first few KB of a file."""
+import codecs
+
+PROBE_BYTES = 8192 # Bytes read from the start of a file to classify it
+DEFAULT_MAX_FILE_BYTES = 20 * 1024 * 1024 # Files above this are flagged as too large, [Analysis] max_file_mb
+
+KIND_TEXT = 'text'
+KIND_BINARY = 'binary'
+KIND_TOO_LARGE = 'too_large'
+
+# Longest BOMs first, the UTF-32 LE BOM starts with the UTF-16 LE one
+_BOMS = (
+    (codecs.BOM_UTF32_LE, 'utf-32-le'),
+    (codecs.BOM_UTF32_BE, 'utf-32-be'),
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF16_LE, 'utf-16-le'),
+    (codecs.BOM_UTF16_BE, 'utf-16-be'),
+)
+# Control bytes that show up in ordinary text files
+_TEXT_CONTROL_BYTES = frozenset(b'\t\n\r\f\b\x1b')
+_CONTROL_DELETE_TABLE = bytes(range(32)) + b'\x7f'
+BINARY_CONTROL_RATIO = 0.3 # More control bytes than this (besides the ones above) means binary
+
+
+def sniff_bytes(head):
+    """Classifies the start of a file. Returns (kind, encoding); kind is KIND_TEXT or KIND_BINARY.
+
+    encoding is the BOM's codec if there is one, 'utf-8' if the head decodes as UTF-8 (including
+    plain ASCII), and None for other 8-bit text. Binary files have encoding None.
+    """
+    for bom, encoding in _BOMS:
+        if head.startswith(bom):
+            return KIND_TEXT, encoding
+    if b'\x00' in head:
+        return KIND_BINARY, None
+    if head:
+        controls = len(head) - len(head.translate(None, _CONTROL_DELETE_TABLE))
+        if controls:
+            controls -= sum(head.count(b) for b in _TEXT_CONTROL_BYTES)
+            if controls / len(head) > BINARY_CONTROL_RATIO:
+                return KIND_BINARY, None
+    try:
+        # final=False so a multi-byte character cut off at the end of the probe doesn't count against UTF-8
+        codecs.getincrementaldecoder('utf-8')().decode(head, final=False)
+        return KIND_TEXT, 'utf-8'
+    except UnicodeDecodeError:
+        return KIND_TEXT, None
+
+
+def probe_file(full_path, size, max_file_bytes=DEFAULT_MAX_FILE_BYTES):
+    """(kind, encoding) for a file of the given size, reading at most PROBE_BYTES of it.
+
+    Files larger than max_file_bytes are KIND_TOO_LARGE without being opened. Raises OSError.
+    """
+    if max_file_bytes is not None and size > max_file_bytes:
+        return KIND_TOO_LARGE, None
+    with open(full_path, 'rb') as f:
+        return sniff_bytes(f.read(PROBE_BYTES))
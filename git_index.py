@@ -0,0 +1,199 @@
+"""The files git knows about in a folder, read from .git/index so a repository can be listed without walking it.
+
+Only tracked files are read from the index (versions 2 to 4). Untracked files, when asked for, come
+from `git ls-files --others --exclude-standard`, which applies .gitignore and friends. If the index
+can't be parsed here (split index, unknown version, corruption), `git ls-files` lists the tracked
+files instead. GitIndexError means neither worked, e.g. the folder is not in a repository or git is
+not installed; callers then walk the folder as usual.
+
+The revision helpers at the end run git locally to compare the work tree with a commit, for delta exports.
+"""
+import os
+import struct
+import subprocess
+import sys
+
+GIT_TIMEOUT_S = 60
+_HEADER = struct.Struct('>4sLL')
+_ENTRY_FIXED = 62 # ctime, mtime, dev, ino, mode, uid, gid, size (4 bytes each, times 8), sha1 (20), flags (2)
+_MODE_AND_FLAGS = struct.Struct('>24xL32xH') # The two fields of the fixed part this module needs
+_EXT_FLAGS = struct.Struct('>H')
+_FLAG_EXTENDED = 0x4000
+_FLAG_STAGE = 0x3000
+_EXT_FLAG_SKIP_WORKTREE = 0x4000 # Sparse checkout: the file is not in the work tree
+_MODE_TYPE_MASK = 0o170000
+_FILE_MODE_TYPES = (0o100000, 0o120000) # Regular files and symlinks; gitlinks (submodules) and sparse directories are skipped
+
+
+class GitIndexError(Exception):
+    pass
+
+
+def _decode_paths(raw_paths):
+    """os.fsdecode of NUL-separated paths, decoded in one call instead of one per path."""
+    if not raw_paths:
+        return []
+    return raw_paths.decode(sys.getfilesystemencoding(), sys.getfilesystemencodeerrors()).split('\0')
+
+
+def find_work_tree(folder):
+    """(work tree root, git dir) of the repository folder is in. Raises GitIndexError if there is none."""
+    current = os.path.abspath(folder)
+    while True:
+        dot_git = os.path.join(current, '.git')
+        if os.path.isdir(dot_git):
+            return current, dot_git
+        if os.path.isfile(dot_git): # Worktrees and submodules: 'gitdir: <path>'
+            try:
+                with open(dot_git, 'r', encoding='utf-8') as f:
+                    line = f.readline().strip()
+            except OSError as e:
+                raise GitIndexError(f"Can't read {dot_git}: {e}")
+            if not line.startswith('gitdir:'):
+                raise GitIndexError(f"{dot_git} is not a gitdir link")
+            return current, os.path.join(current, line[len('gitdir:'):].strip())
+        parent = os.path.dirname(current)
+        if parent == current:
+            raise GitIndexError(f"{folder} is not inside a git repository")
+        current = parent
+
+
+def read_index_paths(index_path):
+    """'/'-separated paths of the stage-0 (or first conflicting) files checked out in the work tree, in index order.
+
+    Raises GitIndexError for anything this parser doesn't handle.
+    """
+    try:
+        with open(index_path, 'rb') as f:
+            data = f.read()
+    except OSError as e:
+        raise GitIndexError(f"Can't read {index_path}: {e}")
+    if len(data) < _HEADER.size:
+        raise GitIndexError("Truncated index")
+    signature, version, count = _HEADER.unpack_from(data)
+    if signature != b'DIRC' or version not in (2, 3, 4):
+        raise GitIndexError(f"Unsupported index (signature {signature!r}, version {version})")
+
+    unpack_entry = _MODE_AND_FLAGS.unpack_from
+    find = data.find
+    paths = []
+    previous = b''
+    offset = _HEADER.size
+    end = len(data) - 20 # Trailing checksum
+    for _ in range(count):
+        if offset + _ENTRY_FIXED > end:
+            raise GitIndexError("Truncated index entry")
+        mode, flags = unpack_entry(data, offset)
+        entry_start = offset
+        offset += _ENTRY_FIXED
+        skip_worktree = False
+        if flags & _FLAG_EXTENDED:
+            if version < 3:
+                raise GitIndexError("Extended flags in a version 2 index")
+            skip_worktree = bool(_EXT_FLAGS.unpack_from(data, offset)[0] & _EXT_FLAG_SKIP_WORKTREE)
+            offset += 2
+        if version == 4:
+            # Path compressed against the previous one: varint bytes to drop from its end, then the NUL-terminated rest
+            byte = data[offset]
+            offset += 1
+            strip = byte & 0x7f
+            while byte & 0x80:
+                byte = data[offset]
+                offset += 1
+                strip = ((strip + 1) << 7) | (byte & 0x7f)
+            nul = find(b'\0', offset)
+            path = previous[:len(previous) - strip] + data[offset:nul]
+            offset = nul + 1
+        else:
+            nul = find(b'\0', offset)
+            path = data[offset:nul]
+            offset = entry_start + ((nul - entry_start) // 8 + 1) * 8 # 1-8 NULs pad the entry to a multiple of 8
+        if nul == -1:
+            raise GitIndexError("Unterminated path in index entry")
+        previous = path
+        if skip_worktree or mode & _MODE_TYPE_MASK not in _FILE_MODE_TYPES:
+            continue
+        if flags & _FLAG_STAGE and paths and paths[-1] == path:
+            continue # Later stages of a merge conflict, same file
+        paths.append(path)
+    if data[offset:offset + 4] == b'link': # Extensions follow the last entry; 'link' is only ever the first
+        raise GitIndexError("Split index, entries are in the shared index")
+    return _decode_paths(b'\0'.join(dict.fromkeys(paths)))
+
+
+def _git_output(cwd, *args, stdin=None):
+    try:
+        result = subprocess.run(['git', *args], cwd=cwd, input=stdin, capture_output=True, timeout=GIT_TIMEOUT_S)
+    except (OSError, subprocess.SubprocessError) as e:
+        raise GitIndexError(f"git {args[0]} failed: {e}")
+    if result.returncode != 0:
+        raise GitIndexError(f"git {args[0]} failed: {result.stderr.decode('utf-8', 'replace').strip()}")
+    return result.stdout
+
+
+def _run_git(work_tree, *args):
+    """NUL-separated paths printed by a git command (run with -z)."""
+    return _decode_paths(_git_output(work_tree, *args).rstrip(b'\0'))
+
+
+def list_git_files(folder, include_untracked=False):
+    """Files under folder that git tracks (plus untracked, not ignored ones if asked), relative to folder with '/'.
+
+    Raises GitIndexError if git can't provide the list.
+    """
+    work_tree, git_dir = find_work_tree(folder)
+    try:
+        tracked = read_index_paths(os.path.join(git_dir, 'index'))
+    except GitIndexError as e:
+        print(f"Reading the git index directly failed ({e}), asking git instead")
+        tracked = _run_git(work_tree, 'ls-files', '-z', '--cached')
+    untracked = _run_git(work_tree, 'ls-files', '-z', '--others', '--exclude-standard') if include_untracked else []
+
+    prefix = os.path.relpath(os.path.abspath(folder), work_tree).replace(os.sep, '/')
+    if prefix == '.':
+        return tracked + untracked
+    prefix += '/'
+    return [path[len(prefix):] for path in tracked + untracked if path.startswith(prefix)]
+
+
+# --- Comparing with a revision, for delta exports ---
+
+def revision_paths(folder, revision):
+    """Files under folder in the tree of revision, relative to folder. Raises GitIndexError."""
+    find_work_tree(folder)
+    return _run_git(folder, 'ls-tree', '-r', '-z', '--name-only', revision) # Run in folder: only its subtree, relative paths
+
+
+def revision_changes(folder, revision):
+    """{relative path: status letter} of files under folder that differ between revision and the work tree.
+
+    Status letters are git diff's: 'M' modified, 'A' added (and tracked), 'D' deleted, 'T' type changed.
+    git compares stats first and only reads files whose stats changed. Raises GitIndexError.
+    """
+    find_work_tree(folder)
+    fields = _run_git(folder, 'diff', '--name-status', '--no-renames', '-z', '--relative', revision, '--')
+    return dict(zip(fields[1::2], (status[:1] for status in fields[0::2])))
+
+
+def read_revision_files(folder, revision, relative_paths):
+    """{relative path: bytes at revision} for the paths that exist there, read with one git cat-file. Raises GitIndexError."""
+    relative_paths = list(relative_paths)
+    if not relative_paths:
+        return {}
+    find_work_tree(folder)
+    prefix = _git_output(folder, 'rev-parse', '--show-prefix').decode('utf-8', 'surrogateescape').strip()
+    requests = "".join(f"{revision}:{prefix}{relative_path}\n" for relative_path in relative_paths)
+    output = _git_output(folder, 'cat-file', '--batch', stdin=os.fsencode(requests))
+    contents = {}
+    offset = 0
+    for relative_path in relative_paths:
+        header_end = output.index(b'\n', offset)
+        header = output[offset:header_end].split()
+        offset = header_end + 1
+        if len(header) != 3 or header[-1] == b'missing':
+            continue # '<object> missing' and the like
+        size = int(header[2])
+        if header[1] == b'blob':
+            contents[relative_path] = output[offset:offset + size]
+        offset += size + 1 # Content, then a newline
+    return contents
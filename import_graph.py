@@ -0,0 +1,303 @@
+"""Local import graph of Python and JS/TS files, for selecting everything a file depends on.
+
+Each file's imports are extracted once (Python with ast, JS/TS with a regex over import, export ...
+from and require() after the comments were stripped) and cached by (size, mtime_ns) next to the
+directory index, so recomputing a closure after an edit only re-parses the files that changed. The
+cache holds the import statements as written; resolving them to listed files is cheap and redone
+every time, so adding or excluding files never invalidates it. Big batches are parsed in a process pool.
+
+Resolution is best effort and only finds files in the list: absolute Python imports are looked up
+from the importing file's directory upwards (script folders, the project root) and in src/;
+relative ones from the file's package. JS/TS specifiers are resolved only when relative ('./', '../'),
+trying the usual extensions and index files. Packages from site-packages or node_modules are ignored.
+"""
+import ast
+import json
+import os
+import posixpath
+import re
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+from dir_index import INDEX_CACHE_DIR, cache_file_path, make_cache_dir
+from minifiers import minify_js_lines
+
+IMPORT_GRAPH_VERSION = 2
+PARSE_POOL_MIN_FILES = 64 # Fewer files to parse than this are parsed in the calling thread
+PARSE_BATCH_SIZE = 32 # Files per pool task
+PARSE_MAX_BYTES = 2 * 1024 * 1024 # Bigger files (generated bundles and the like) are treated as importing nothing
+PYTHON_TYPES = frozenset(('py', 'pyw', 'pyi'))
+JS_TYPES = frozenset(('js', 'jsx', 'mjs', 'cjs', 'ts', 'tsx', 'mts', 'cts'))
+JS_RESOLVE_EXTENSIONS = ('.ts', '.tsx', '.d.ts', '.js', '.jsx', '.mjs', '.cjs', '.mts', '.cts', '.json')
+_JS_TO_TS_EXTENSIONS = {'.js': ('.ts', '.tsx'), '.jsx': ('.tsx',), '.mjs': ('.mts',), '.cjs': ('.cts',)}
+PYTHON_EXTRA_ROOTS = ('src',) # Besides the importing file's directory and its parents
+# import x from 'm' / import {a,\n b} from 'm' / export * from 'm' / import 'm' / require('m') / import('m')
+_JS_IMPORT = re.compile(r"""(?<![\w$.])(?:(?:import|export)\b[^'"`;]*?\bfrom\s*|import\s*|(?:require|import)\s*\(\s*)(['"])([^'"\n]+)\1""")
+
+
+def _file_type(relative_path):
+    return os.path.splitext(relative_path)[1].lstrip('.').lower()
+
+
+def supports(relative_path):
+    file_type = _file_type(relative_path)
+    return file_type in PYTHON_TYPES or file_type in JS_TYPES
+
+
+def _collect_python_imports(statements, records):
+    """Appends the import records of statements, descending into statement bodies only (not ast.walk's every node)."""
+    for node in statements:
+        if isinstance(node, ast.Import):
+            records.extend(('py', 0, alias.name, ()) for alias in node.names)
+        elif isinstance(node, ast.ImportFrom):
+            records.append(('py', node.level or 0, node.module or '', tuple(alias.name for alias in node.names)))
+        else: # Imports inside functions, classes, if/try blocks (handlers and match cases have bodies too)
+            for field in ('body', 'orelse', 'finalbody', 'handlers', 'cases'):
+                children = getattr(node, field, None)
+                if isinstance(children, list):
+                    _collect_python_imports(children, records)
+
+
+def extract_imports(file_type, raw_bytes):
+    """The import statements of one file as a tuple of records, () if it has none or can't be parsed.
+
+    Python: ('py', level, module, names) per `from module import names` (level counts the leading dots)
+    and ('py', 0, module, ()) per `import module`. JS/TS: ('js', specifier).
+    """
+    if b'import' not in raw_bytes and b'require' not in raw_bytes:
+        return ()
+    if file_type in PYTHON_TYPES:
+        try:
+            tree = ast.parse(raw_bytes) # bytes, so a coding cookie is honored
+        except (SyntaxError, ValueError):
+            return ()
+        records = []
+        _collect_python_imports(tree.body, records)
+        return tuple(records)
+    if file_type in JS_TYPES:
+        text = raw_bytes.decode('utf-8', errors='replace')
+        code = "".join(minify_js_lines(text.splitlines(keepends=True))) # Commented-out imports don't count
+        return tuple(('js', match.group(2)) for match in _JS_IMPORT.finditer(code))
+    return ()
+
+
+def _parse_files(folder, relative_paths):
+    """Pool task: [(relative_path, records or None if unreadable)]."""
+    results = []
+    for relative_path in relative_paths:
+        try:
+            with open(os.path.join(folder, relative_path), 'rb') as f:
+                raw_bytes = f.read(PARSE_MAX_BYTES + 1)
+        except OSError:
+            results.append((relative_path, None))
+            continue
+        records = () if len(raw_bytes) > PARSE_MAX_BYTES else extract_imports(_file_type(relative_path), raw_bytes)
+        results.append((relative_path, records))
+    return results
+
+
+def _python_module_paths(base_parts, module, known):
+    """Listed files that module (dotted, may be '') names below the base directory parts: a module or a package."""
+    parts = base_parts + [part for part in module.split('.') if part]
+    if not parts:
+        return ['__init__.py'] if '__init__.py' in known else []
+    stem = '/'.join(parts)
+    return [path for path in (stem + '.py', stem + '.pyi', stem + '/__init__.py') if path in known][:1]
+
+
+def _resolve_python(importer, record, known):
+    _kind, level, module, names = record
+    importer_parts = importer.split('/')[:-1]
+    if level:
+        if level - 1 > len(importer_parts):
+            return [] # Above the analyzed folder
+        roots = [importer_parts[:len(importer_parts) - (level - 1)]]
+    else:
+        roots = [importer_parts[:depth] for depth in range(len(importer_parts), -1, -1)]
+        roots.extend([extra] for extra in PYTHON_EXTRA_ROOTS)
+    for root in roots:
+        targets = _python_module_paths(root, module, known)
+        # from package import submodule
+        for name in names:
+            if name != '*':
+                targets.extend(_python_module_paths(root, f"{module}.{name}" if module else name, known))
+        if targets:
+            return targets
+    return []
+
+
+def _resolve_js(importer, specifier, known):
+    if not specifier.startswith(('./', '../', '/')) and specifier not in ('.', '..'):
+        return [] # A package, not a file
+    specifier = specifier.split('?', 1)[0].split('#', 1)[0]
+    if specifier.startswith('/'):
+        base = posixpath.normpath(specifier.lstrip('/'))
+    else:
+        base = posixpath.normpath(posixpath.join(posixpath.dirname(importer), specifier))
+    if base == '..' or base.startswith('../'):
+        return []
+    if base == '.':
+        base = ''
+    candidates = [base]
+    stem, extension = posixpath.splitext(base)
+    candidates.extend(stem + ts_extension for ts_extension in _JS_TO_TS_EXTENSIONS.get(extension, ())) # './a.js' may be a.ts
+    candidates.extend(base + js_extension for js_extension in JS_RESOLVE_EXTENSIONS)
+    index_prefix = base + '/index' if base else 'index'
+    candidates.extend(index_prefix + js_extension for js_extension in JS_RESOLVE_EXTENSIONS)
+    for candidate in candidates:
+        if candidate in known:
+            return [candidate]
+    return []
+
+
+def _records_from_json(records):
+    """extract_imports records back from the lists JSON turned them into."""
+    result = []
+    for record in records:
+        if record[0] == 'py':
+            _language, level, module, names = record
+            result.append(('py', level, module, tuple(names)))
+        else:
+            result.append(('js', record[1]))
+    return tuple(result)
+
+
+def resolve_imports(importer, records, known):
+    """Listed files (paths in the set known) that importer's import records refer to, without duplicates."""
+    targets = []
+    for record in records:
+        if record[0] == 'py':
+            targets.extend(_resolve_python(importer, record, known))
+        else:
+            targets.extend(_resolve_js(importer, record[1], known))
+    return [target for target in dict.fromkeys(targets) if target != importer]
+
+
+class ImportGraph:
+    """Import records per file of one folder, cached on disk as JSON.
+
+    entries maps a relative path to ((size, mtime_ns), records). Use from one thread.
+    """
+
+    def __init__(self, folder, cache_dir=INDEX_CACHE_DIR, processes=None):
+        self.folder = os.path.abspath(folder)
+        self.cache_dir = cache_dir
+        self.cache_path = cache_file_path(self.folder, cache_dir, ".imports")
+        self.processes = processes
+        self.entries = {}
+        self.files_parsed = 0
+        self.files_reused = 0
+
+    def load(self):
+        """Reads the cache file. Returns False, leaving the graph empty, if it is missing, stale or corrupt."""
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if (not isinstance(data, dict) or data.get('version') != IMPORT_GRAPH_VERSION
+                    or data.get('folder') != self.folder or not isinstance(data.get('entries'), dict)):
+                raise ValueError("cache was written for another folder or version")
+            entries = {relative_path: (tuple(stat_key), _records_from_json(records))
+                       for relative_path, (stat_key, records) in data['entries'].items()}
+        except FileNotFoundError:
+            return False
+        except Exception as e:
+            print(f"Discarding unreadable import cache {self.cache_path}: {e}")
+            return False
+        self.entries = entries
+        return True
+
+    def save(self, keep_paths=None):
+        """Atomically writes the cache, dropping entries of files not in keep_paths if given."""
+        if keep_paths is not None:
+            self.entries = {path: entry for path, entry in self.entries.items() if path in keep_paths}
+        make_cache_dir(self.cache_dir)
+        fd, temp_path = tempfile.mkstemp(prefix=".imports.", suffix=".tmp", dir=self.cache_dir)
+        try:
+            with open(fd, 'w', encoding='utf-8') as f:
+                json.dump({'version': IMPORT_GRAPH_VERSION, 'folder': self.folder, 'entries': self.entries},
+                          f, separators=(',', ':'))
+            os.replace(temp_path, self.cache_path)
+        except BaseException:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            raise
+
+    def imports(self, relative_paths, pool=None):
+        """{relative_path: records} for supported files, parsing only those changed since they were cached."""
+        result = {}
+        to_parse = []
+        stat_keys = {}
+        for relative_path in relative_paths:
+            if not supports(relative_path):
+                continue
+            try:
+                st = os.stat(os.path.join(self.folder, relative_path))
+            except OSError:
+                continue
+            stat_key = (st.st_size, st.st_mtime_ns)
+            entry = self.entries.get(relative_path)
+            if entry is not None and entry[0] == stat_key:
+                result[relative_path] = entry[1]
+                self.files_reused += 1
+            else:
+                stat_keys[relative_path] = stat_key
+                to_parse.append(relative_path)
+
+        if pool is not None and len(to_parse) >= PARSE_POOL_MIN_FILES:
+            batches = [to_parse[i:i + PARSE_BATCH_SIZE] for i in range(0, len(to_parse), PARSE_BATCH_SIZE)]
+            parsed = [item for batch in pool.map(_parse_files, [self.folder] * len(batches), batches) for item in batch]
+        else:
+            parsed = _parse_files(self.folder, to_parse)
+        for relative_path, records in parsed:
+            if records is None:
+                continue # Unreadable now, try again next time
+            self.entries[relative_path] = (stat_keys[relative_path], records)
+            result[relative_path] = records
+            self.files_parsed += 1
+        return result
+
+    def closure(self, seeds, listed_paths, max_depth=None, token_budget=None, tokens_of=None, cancel_event=None):
+        """Files in listed_paths that the seeds import, directly or not, in breadth-first order.
+
+        Returns (added, skipped). Seeds themselves are never in added. max_depth limits how many import
+        hops are followed (1: direct imports only). With token_budget, a file whose tokens_of(path)
+        would take the added files over it is skipped and its own imports aren't followed.
+        """
+        known = listed_paths if isinstance(listed_paths, (set, frozenset)) else set(listed_paths)
+        visited = set(seeds)
+        frontier = list(dict.fromkeys(seeds))
+        added = []
+        skipped = []
+        used_tokens = 0
+        depth = 0
+        self.files_parsed = 0
+        self.files_reused = 0
+        pool = None
+        try:
+            while frontier and (max_depth is None or depth < max_depth):
+                if cancel_event is not None and cancel_event.is_set():
+                    break
+                if pool is None and len(frontier) >= PARSE_POOL_MIN_FILES and (self.processes or os.cpu_count() or 1) > 1:
+                    pool = ProcessPoolExecutor(max_workers=self.processes)
+                imports = self.imports(frontier, pool)
+                next_frontier = []
+                for importer in frontier:
+                    for target in resolve_imports(importer, imports.get(importer, ()), known):
+                        if target in visited:
+                            continue
+                        visited.add(target)
+                        tokens = (tokens_of(target) or 0) if tokens_of is not None else 0
+                        if token_budget is not None and used_tokens + tokens > token_budget:
+                            skipped.append(target)
+                            continue
+                        used_tokens += tokens
+                        added.append(target)
+                        next_frontier.append(target)
+                frontier = next_frontier
+                depth += 1
+        finally:
+            if pool is not None:
+                pool.shutdown(wait=True, cancel_futures=True)
+        return added, skipped
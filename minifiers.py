@@ -0,0 +1,355 @@
+"""Comment, blank-line and trailing-whitespace stripping per language, to save tokens in the bundle.
+
+Minifiers work line by line on text the export already decoded (newlines normalized to '\\n'), so
+large files can be streamed through them. They are keyed by exporter_core.file_type_of. String
+literals are never changed: a line whose end lies inside a string keeps its trailing whitespace, and
+blank lines inside multi-line strings stay. Text a minifier can't parse passes through unchanged.
+"""
+import math
+import os
+import re
+import threading
+import tokenize
+from concurrent.futures import ProcessPoolExecutor
+
+from token_budget import BYTES_PER_TOKEN, format_token_count
+
+MINIFY_POOL_MIN_FILES = 200 # Selections this big minify in a process pool
+MINIFY_POOL_MIN_CHARS = 16 * 1024 # Smaller files are minified in the calling thread, shipping them costs more
+MINIFY_STREAM_CHUNK_CHARS = 1024 * 1024
+_JS_REGEX_KEYWORDS = frozenset(('return', 'typeof', 'instanceof', 'in', 'of', 'new', 'delete', 'void', 'throw',
+                                'case', 'do', 'else', 'yield', 'await'))
+_JS_REGEX_AFTER = frozenset('(,=:[!&|?{};+-*%<>~^')
+_IDENTIFIER_CHAR = re.compile(r'[\w$]')
+_MULTILINE_TOKEN_TYPES = {tokenize.STRING}
+if hasattr(tokenize, 'FSTRING_MIDDLE'): # Python 3.12+ splits f-strings into several tokens
+    _MULTILINE_TOKEN_TYPES.add(tokenize.FSTRING_MIDDLE)
+
+
+def _finish_line(text, end_in_literal):
+    """The output for one processed line: kept verbatim if it ends inside a literal, else stripped; None drops it."""
+    if end_in_literal:
+        return text + "\n"
+    text = text.rstrip()
+    return text + "\n" if text else None
+
+
+def minify_python_lines(lines):
+    """Drops comments (except a shebang), blank lines and trailing whitespace, using tokenize to find them."""
+    lines = iter(lines)
+    buffered = {} # row -> line, read by tokenize but not emitted yet
+    comment_cols = {} # row -> column its comment starts at
+    protected = set() # Rows whose line end lies inside a string
+    next_row = 1
+    row_count = 0
+
+    def readline():
+        nonlocal row_count
+        line = next(lines, '')
+        if line:
+            row_count += 1
+            buffered[row_count] = line
+        return line
+
+    def emit_through(last_row):
+        nonlocal next_row
+        for row in range(next_row, last_row + 1):
+            line = buffered.pop(row, '')
+            col = comment_cols.pop(row, None)
+            if row in protected:
+                protected.discard(row)
+                yield line
+                continue
+            if col is not None:
+                line = line[:col]
+            finished = _finish_line(line.rstrip('\n'), False)
+            if finished is not None:
+                yield finished
+        next_row = max(next_row, last_row + 1)
+
+    try:
+        for token in tokenize.generate_tokens(readline):
+            if token.type == tokenize.COMMENT:
+                if not (token.start[0] == 1 and token.string.startswith('#!')):
+                    comment_cols[token.start[0]] = token.start[1]
+            elif token.type in _MULTILINE_TOKEN_TYPES and token.start[0] < token.end[0]:
+                protected.update(range(token.start[0], token.end[0]))
+            elif token.type in (tokenize.NEWLINE, tokenize.NL):
+                yield from emit_through(token.start[0])
+            elif token.type == tokenize.ENDMARKER:
+                yield from emit_through(row_count)
+    except (tokenize.TokenError, SyntaxError):
+        # Not valid Python from here on: what was already emitted is fine, the rest passes through untouched
+        for row in range(next_row, row_count + 1):
+            yield buffered.pop(row, '')
+        yield from lines
+
+
+class _CLikeScanner:
+    """Line-by-line state machine for /* */ comments, and optionally // comments, JS template literals and regex literals."""
+
+    def __init__(self, line_comments, templates, regexes):
+        self.line_comments = line_comments
+        self.templates = templates
+        self.regexes = regexes
+        self.mode = 'code' # 'code', 'block', "'", '"', '`' or '/'
+        self.template_depths = [] # Open braces per ${ ... } currently inside, innermost last
+        self.prev_char = '' # Last significant code character, for telling a regex from a division
+        self.prev_word = ''
+        self.in_class = False # Inside [...] of a regex
+
+    def _regex_allowed(self):
+        if self.prev_word:
+            return self.prev_word in _JS_REGEX_KEYWORDS
+        return self.prev_char == '' or self.prev_char in _JS_REGEX_AFTER
+
+    def _literal_closed(self):
+        self.mode = 'code'
+        self.prev_char = ')' # A literal is a value, so a following '/' divides
+        self.prev_word = ''
+
+    def process(self, line):
+        """The line (without its newline) minus comments, and whether it ends inside a string or template."""
+        out = []
+        i = 0
+        n = len(line)
+        while i < n:
+            c = line[i]
+            mode = self.mode
+            if mode == 'code':
+                pair = line[i:i + 2]
+                if pair == '//' and self.line_comments:
+                    break
+                if pair == '/*':
+                    self.mode = 'block'
+                    out.append(' ')
+                    i += 2
+                    continue
+                if c in '\'"' or (c == '`' and self.templates) or (c == '/' and self.regexes and self._regex_allowed()):
+                    self.mode = c
+                    self.in_class = False
+                elif self.template_depths and c == '{':
+                    self.template_depths[-1] += 1
+                elif self.template_depths and c == '}':
+                    if self.template_depths[-1] == 0:
+                        self.template_depths.pop()
+                        self.mode = '`'
+                    else:
+                        self.template_depths[-1] -= 1
+                if self.mode == 'code' and not c.isspace():
+                    self.prev_word = self.prev_word + c if _IDENTIFIER_CHAR.match(c) else ''
+                    self.prev_char = c
+                out.append(c)
+                i += 1
+            elif mode == 'block':
+                end = line.find('*/', i)
+                if end < 0:
+                    i = n
+                else:
+                    self.mode = 'code'
+                    i = end + 2
+            else:
+                if c == '\\':
+                    out.append(line[i:i + 2])
+                    i += 2
+                    continue
+                out.append(c)
+                i += 1
+                if mode == '`' and c == '$' and line[i:i + 1] == '{':
+                    out.append('{')
+                    i += 1
+                    self.template_depths.append(0)
+                    self.mode = 'code'
+                    self.prev_char, self.prev_word = '{', ''
+                elif mode == '/' and c == '[':
+                    self.in_class = True
+                elif mode == '/' and c == ']':
+                    self.in_class = False
+                elif c == mode and not (mode == '/' and self.in_class):
+                    self._literal_closed()
+
+        end_in_literal = self.mode == '`' or (self.mode in ('\'', '"') and line.endswith('\\'))
+        if self.mode in ('\'', '"', '/') and not end_in_literal:
+            self._literal_closed() # Unterminated on this line: not what we thought it was, recover
+        return "".join(out), end_in_literal
+
+
+def _minify_c_like_lines(lines, line_comments, templates, regexes):
+    scanner = _CLikeScanner(line_comments, templates, regexes)
+    for line in lines:
+        text, end_in_literal = scanner.process(line.rstrip('\n'))
+        finished = _finish_line(text, end_in_literal)
+        if finished is not None:
+            yield finished
+
+
+def minify_js_lines(lines):
+    """Drops // and /* */ comments, blank lines and trailing whitespace from JavaScript / TypeScript.
+
+    Strings, template literals (including ${...} nesting) and regex literals are skipped over; a '/'
+    counts as a regex start after an operator, an opening bracket or a keyword like return. JSX is
+    not handled ('//' in JSX text would look like a comment), which is why .jsx/.tsx aren't minified.
+    """
+    return _minify_c_like_lines(lines, line_comments=True, templates=True, regexes=True)
+
+
+def minify_css_lines(lines):
+    """Drops /* */ comments, blank lines and trailing whitespace; // is left alone (unquoted url(http://...))."""
+    return _minify_c_like_lines(lines, line_comments=False, templates=False, regexes=False)
+
+
+def minify_ini_lines(lines):
+    """Drops full-line ; and # comments, blank lines and trailing whitespace. Inline comments stay, they may be values."""
+    for line in lines:
+        text = line.rstrip()
+        if text and not text.lstrip().startswith((';', '#')):
+            yield text + "\n"
+
+
+MINIFIERS = {}
+for _file_types, _minifier in (
+        (('py', 'pyw', 'pyi'), minify_python_lines),
+        (('js', 'mjs', 'cjs', 'ts', 'mts', 'cts'), minify_js_lines),
+        (('css', 'scss', 'less'), minify_css_lines),
+        (('ini', 'cfg'), minify_ini_lines)):
+    MINIFIERS.update(dict.fromkeys(_file_types, _minifier))
+
+
+def _split_lines(text):
+    """Lines of text with their newline; unlike str.splitlines only '\\n' ends a line (U+2028 can sit in a string)."""
+    lines = [line + "\n" for line in text.split("\n")]
+    lines[-1] = lines[-1][:-1]
+    if not lines[-1]:
+        lines.pop()
+    return lines
+
+
+def minify_text(file_type, text):
+    """text minified for its file type, or unchanged if there is no minifier for it. Picklable for the process pool."""
+    minifier = MINIFIERS.get(file_type)
+    if minifier is None:
+        return text
+    return "".join(minifier(_split_lines(text)))
+
+
+class Minifier:
+    """Minifies files during an export and keeps before/after byte and token counts per file.
+
+    Call begin() before each export: it clears the per-export report but keeps the counts of files seen
+    earlier, so a block served from the ContentCache still shows up in the report. Token counts use
+    tokenizer (see token_budget.load_tokenizer) if given, else bytes / bytes_per_token.
+    Safe to share between the export reader threads.
+    """
+
+    def __init__(self, tokenizer=None, bytes_per_token=BYTES_PER_TOKEN, processes=None):
+        self.tokenizer = tokenizer
+        self.bytes_per_token = bytes_per_token
+        self.processes = processes
+        self.pool = None
+        self.known = {} # (relative_path, stat_key) -> counts, for files that come from the cache next time
+        self.files = {} # relative_path -> (before_bytes, after_bytes, before_tokens, after_tokens), this export
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def supports(file_type):
+        return file_type in MINIFIERS
+
+    def begin(self, file_count=0):
+        """Starts a new report; selections of MINIFY_POOL_MIN_FILES or more get a process pool until end()."""
+        with self.lock:
+            self.files = {}
+        if file_count >= MINIFY_POOL_MIN_FILES and (self.processes or os.cpu_count() or 1) > 1:
+            self.pool = ProcessPoolExecutor(max_workers=self.processes)
+
+    def end(self):
+        if self.pool is not None:
+            self.pool.shutdown(wait=True, cancel_futures=True)
+            self.pool = None
+
+    def _tokens(self, text, nbytes):
+        if self.tokenizer is not None:
+            return self.tokenizer(text)
+        return math.ceil(nbytes / self.bytes_per_token)
+
+    def _record(self, relative_path, stat_key, counts):
+        with self.lock:
+            self.files[relative_path] = counts
+            if stat_key is not None:
+                self.known[(relative_path, stat_key)] = counts
+
+    def reuse(self, relative_path, stat_key):
+        """Adds the counts from an earlier export of the unchanged file; False if there are none."""
+        with self.lock:
+            counts = self.known.get((relative_path, stat_key))
+            if counts is not None:
+                self.files[relative_path] = counts
+            return counts is not None
+
+    def minify(self, relative_path, file_type, text, stat_key=None):
+        """Minified text of one file, recorded in the report. Unsupported types come back unchanged, unrecorded."""
+        if file_type not in MINIFIERS:
+            return text
+        pool = self.pool
+        if pool is not None and len(text) >= MINIFY_POOL_MIN_CHARS:
+            minified = pool.submit(minify_text, file_type, text).result()
+        else:
+            minified = minify_text(file_type, text)
+        before_bytes = len(text.encode('utf-8'))
+        after_bytes = len(minified.encode('utf-8'))
+        self._record(relative_path, stat_key, (before_bytes, after_bytes, self._tokens(text, before_bytes),
+                                               self._tokens(minified, after_bytes)))
+        return minified
+
+    def minify_stream(self, relative_path, file_type, source, stat_key=None):
+        """Yields the minified text of the text file object source in chunks; recorded once it was read to the end."""
+        before_bytes = after_bytes = before_tokens = after_tokens = 0
+        pending = []
+        pending_chars = 0
+
+        def counted_lines():
+            nonlocal before_bytes, before_tokens
+            for line in source:
+                nbytes = len(line.encode('utf-8'))
+                before_bytes += nbytes
+                if self.tokenizer is not None:
+                    before_tokens += self.tokenizer(line)
+                yield line
+
+        for line in MINIFIERS[file_type](counted_lines()):
+            pending.append(line)
+            pending_chars += len(line)
+            if pending_chars >= MINIFY_STREAM_CHUNK_CHARS:
+                chunk = "".join(pending)
+                after_bytes += len(chunk.encode('utf-8'))
+                if self.tokenizer is not None:
+                    after_tokens += self.tokenizer(chunk)
+                yield chunk
+                pending, pending_chars = [], 0
+        chunk = "".join(pending)
+        after_bytes += len(chunk.encode('utf-8'))
+        if self.tokenizer is not None:
+            after_tokens += self.tokenizer(chunk)
+        else:
+            before_tokens = self._tokens(None, before_bytes)
+            after_tokens = self._tokens(None, after_bytes)
+        if chunk:
+            yield chunk
+        self._record(relative_path, stat_key, (before_bytes, after_bytes, before_tokens, after_tokens))
+
+    def report(self):
+        """{'files': [{path, before_bytes, after_bytes, before_tokens, after_tokens}, ...], 'total': {...}} of this export."""
+        with self.lock:
+            files = [{'path': path, 'before_bytes': counts[0], 'after_bytes': counts[1],
+                      'before_tokens': counts[2], 'after_tokens': counts[3]} for path, counts in self.files.items()]
+        total = {key: sum(entry[key] for entry in files)
+                 for key in ('before_bytes', 'after_bytes', 'before_tokens', 'after_tokens')}
+        total['files'] = len(files)
+        return {'files': files, 'total': total}
+
+
+def format_savings(total):
+    """One line like '120 file(s) minified: 1.2 MB -> 0.8 MB, ~310.0k -> ~205.0k tokens (-34%)'."""
+    saved = 1 - total['after_tokens'] / total['before_tokens'] if total['before_tokens'] else 0.0
+    return (f"{total['files']} file(s) minified: {total['before_bytes'] / (1024 * 1024):.1f} MB -> "
+            f"{total['after_bytes'] / (1024 * 1024):.1f} MB, {format_token_count(total['before_tokens'])} -> "
+            f"{format_token_count(total['after_tokens'])} tokens (-{saved:.0%})")
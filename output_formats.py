@@ -0,0 +1,334 @@
+"""Bundle output formats, optional compression and the offset index written next to a bundle.
+
+A format frames each file's content as a block: block_start(path) + escape(content) + block_end(path),
+between one document_start() and document_end() per bundle. escape() works on any chunk of the
+content, so large files can be streamed through it.
+
+Compressed bundles are written as a series of independent members (gzip members, xz streams or zstd
+frames) of about COMPRESS_MEMBER_BYTES each. The concatenation is still an ordinary .gz/.xz/.zst file,
+and the index records where the member holding each block starts, so one file can be read back by
+decompressing a single member or two instead of the whole bundle.
+"""
+import gzip
+import json
+import lzma
+import os
+import re
+import time
+import zlib
+from xml.sax.saxutils import escape as xml_escape, quoteattr
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+INDEX_VERSION = 1
+COMPRESS_MEMBER_BYTES = 1024 * 1024 # Uncompressed bytes per member; smaller reads back faster, bigger compresses better
+GZIP_LEVEL = 6
+XZ_PRESET = 6
+ZSTD_LEVEL = 10
+COMPRESSION_NONE = 'none'
+COMPRESSION_EXTENSIONS = {'gzip': '.gz', 'xz': '.xz', 'zstd': '.zst'}
+
+# Characters XML 1.0 cannot represent at all, not even escaped
+_XML_INVALID = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]')
+_BACKTICK_RUNS = re.compile('`+')
+
+
+class PlainFormat:
+    """The original '-- BEGIN FILE: path --' / '-- END FILE: path --' framing."""
+
+    name = 'plain'
+    extension = '.txt'
+    rescans_streamed = False # True if block_start needs scan_chunk's result over the whole content
+
+    def document_start(self):
+        return ""
+
+    def document_end(self):
+        return ""
+
+    def block_start(self, normalized_rel_path, scan=None):
+        return f"-- BEGIN FILE: {normalized_rel_path} --\n"
+
+    def escape(self, chunk):
+        return chunk
+
+    def block_end(self, normalized_rel_path, scan=None):
+        return f"\n-- END FILE: {normalized_rel_path} --\n\n"
+
+    def scan_chunk(self, chunk, scan):
+        return scan
+
+    def reference_block(self, normalized_rel_path, original_rel_path):
+        """Short block standing in for a file whose content is identical to an earlier one's."""
+        return f"-- DUPLICATE FILE: {normalized_rel_path} (same content as {original_rel_path}) --\n\n"
+
+    def removed_block(self, normalized_rel_path):
+        """Block of a delta export for a file deleted since the base it was compared with."""
+        return f"-- REMOVED FILE: {normalized_rel_path} --\n\n"
+
+    def diff_block(self, normalized_rel_path, diff_text, base_label):
+        """Block of a delta export holding a unified diff of the file against base_label instead of its content."""
+        return (f"-- BEGIN DIFF: {normalized_rel_path} (since {base_label}) --\n{diff_text}"
+                f"\n-- END DIFF: {normalized_rel_path} --\n\n")
+
+    def render_block(self, relative_path, file_content):
+        """The whole block for one file."""
+        normalized_rel_path = relative_path.replace('\\', '/')
+        scan = self.scan_chunk(file_content, None) if self.rescans_streamed else None
+        return (self.block_start(normalized_rel_path, scan) + self.escape(file_content)
+                + self.block_end(normalized_rel_path, scan))
+
+
+class XmlFormat(PlainFormat):
+    """<file path="..."> elements inside one <files> root; content is escaped, control characters dropped."""
+
+    name = 'xml'
+    extension = '.xml'
+
+    def document_start(self):
+        return '<?xml version="1.0" encoding="UTF-8"?>\n<files>\n'
+
+    def document_end(self):
+        return "</files>\n"
+
+    def block_start(self, normalized_rel_path, scan=None):
+        return f"<file path={quoteattr(_XML_INVALID.sub('', normalized_rel_path))}>\n"
+
+    def escape(self, chunk):
+        return xml_escape(_XML_INVALID.sub('', chunk))
+
+    def block_end(self, normalized_rel_path, scan=None):
+        return "\n</file>\n"
+
+    def reference_block(self, normalized_rel_path, original_rel_path):
+        return (f"<file path={quoteattr(_XML_INVALID.sub('', normalized_rel_path))} "
+                f"duplicate-of={quoteattr(_XML_INVALID.sub('', original_rel_path))}/>\n")
+
+    def removed_block(self, normalized_rel_path):
+        return f"<removed path={quoteattr(_XML_INVALID.sub('', normalized_rel_path))}/>\n"
+
+    def diff_block(self, normalized_rel_path, diff_text, base_label):
+        return (f"<diff path={quoteattr(_XML_INVALID.sub('', normalized_rel_path))} "
+                f"since={quoteattr(_XML_INVALID.sub('', base_label))}>\n{self.escape(diff_text)}\n</diff>\n")
+
+
+class MarkdownFormat(PlainFormat):
+    """A heading per file and a fenced code block one backtick longer than any backtick run in the content."""
+
+    name = 'markdown'
+    extension = '.md'
+    rescans_streamed = True
+
+    def scan_chunk(self, chunk, scan):
+        """(longest backtick run, run at the end of the content so far), carried across chunk boundaries."""
+        longest, trailing = scan or (0, 0)
+        leading = len(chunk) - len(chunk.lstrip('`'))
+        if leading == len(chunk):
+            trailing += leading
+            return max(longest, trailing), trailing
+        longest = max(longest, trailing + leading, max(map(len, _BACKTICK_RUNS.findall(chunk)), default=0))
+        return longest, len(chunk) - len(chunk.rstrip('`'))
+
+    def _fence(self, scan):
+        return '`' * max(3, (scan[0] if scan else 0) + 1)
+
+    def block_start(self, normalized_rel_path, scan=None):
+        language = os.path.splitext(normalized_rel_path)[1][1:].lower()
+        return f"## {normalized_rel_path}\n\n{self._fence(scan)}{language}\n"
+
+    def block_end(self, normalized_rel_path, scan=None):
+        return f"\n{self._fence(scan)}\n\n"
+
+    def reference_block(self, normalized_rel_path, original_rel_path):
+        return f"## {normalized_rel_path}\n\nSame content as {original_rel_path}.\n\n"
+
+    def removed_block(self, normalized_rel_path):
+        return f"## {normalized_rel_path}\n\nRemoved.\n\n"
+
+    def diff_block(self, normalized_rel_path, diff_text, base_label):
+        fence = self._fence(self.scan_chunk(diff_text, None))
+        return f"## {normalized_rel_path} (changes since {base_label})\n\n{fence}diff\n{diff_text}\n{fence}\n\n"
+
+
+class JsonlFormat(PlainFormat):
+    """One {"path": ..., "content": ...} JSON object per line."""
+
+    name = 'jsonl'
+    extension = '.jsonl'
+
+    def block_start(self, normalized_rel_path, scan=None):
+        return '{"path": ' + json.dumps(normalized_rel_path, ensure_ascii=False) + ', "content": "'
+
+    def escape(self, chunk):
+        return json.dumps(chunk, ensure_ascii=False)[1:-1]
+
+    def block_end(self, normalized_rel_path, scan=None):
+        return '"}\n'
+
+    def reference_block(self, normalized_rel_path, original_rel_path):
+        return json.dumps({'path': normalized_rel_path, 'duplicate_of': original_rel_path}, ensure_ascii=False) + "\n"
+
+    def removed_block(self, normalized_rel_path):
+        return json.dumps({'path': normalized_rel_path, 'removed': True}, ensure_ascii=False) + "\n"
+
+    def diff_block(self, normalized_rel_path, diff_text, base_label):
+        return json.dumps({'path': normalized_rel_path, 'diff': diff_text, 'since': base_label}, ensure_ascii=False) + "\n"
+
+
+PLAIN_FORMAT = PlainFormat()
+OUTPUT_FORMATS = {fmt.name: fmt for fmt in (PLAIN_FORMAT, XmlFormat(), MarkdownFormat(), JsonlFormat())}
+
+
+def get_output_format(name):
+    """The format called name ('' or None for plain). Raises ValueError."""
+    if not name:
+        return PLAIN_FORMAT
+    try:
+        return OUTPUT_FORMATS[name.strip().lower()]
+    except KeyError:
+        raise ValueError(f"Unknown output format {name!r}, expected one of: {', '.join(OUTPUT_FORMATS)}")
+
+
+def available_compressions():
+    """Compression names usable here; zstd needs the optional zstandard package."""
+    return [COMPRESSION_NONE, 'gzip', 'xz'] + (['zstd'] if zstandard is not None else [])
+
+
+def check_compression(name):
+    """name normalized to None (no compression), 'gzip', 'xz' or 'zstd'. Raises ValueError."""
+    name = (name or COMPRESSION_NONE).strip().lower()
+    if name not in available_compressions():
+        if name == 'zstd':
+            raise ValueError("zstd compression needs the zstandard package (pip install zstandard)")
+        raise ValueError(f"Unknown compression {name!r}, expected one of: {', '.join(available_compressions())}")
+    return None if name == COMPRESSION_NONE else name
+
+
+def _new_compressor(compression):
+    """An object with compress(data) and flush() producing one complete member."""
+    if compression == 'gzip':
+        return zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31) # wbits 31: gzip header and trailer
+    if compression == 'xz':
+        return lzma.LZMACompressor(lzma.FORMAT_XZ, preset=XZ_PRESET)
+    return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+
+
+def _open_decompressed(raw, compression):
+    """A readable binary stream decompressing raw from its current position, across member boundaries."""
+    if compression == 'gzip':
+        return gzip.GzipFile(fileobj=raw, mode='rb')
+    if compression == 'xz':
+        return lzma.LZMAFile(raw, mode='rb')
+    if zstandard is None:
+        raise ValueError("Reading zstd bundles needs the zstandard package")
+    return zstandard.ZstdDecompressor().stream_reader(raw, read_across_frames=True)
+
+
+class BundleWriter:
+    """Writes bundle text to a binary file as UTF-8, compressed in members if asked, and tracks block positions.
+
+    mark() / rollback() let the exporter drop a block it could only partly read; with compression, mark()
+    ends the current member so the compressed file can simply be truncated back to it.
+    """
+
+    def __init__(self, raw, compression=None):
+        self.raw = raw
+        self.compression = compression
+        self.offset = 0 # Uncompressed bytes written so far
+        self.compressor = None
+        self.member_offset = 0 # File offset of the current member
+        self.member_bytes = 0 # Uncompressed bytes in the current member
+
+    def write(self, text):
+        data = text.encode('utf-8')
+        if not data:
+            return
+        self.offset += len(data)
+        if self.compression is None:
+            self.raw.write(data)
+            return
+        if self.compressor is None:
+            self.member_offset = self.raw.tell()
+            self.member_bytes = 0
+            self.compressor = _new_compressor(self.compression)
+        self.raw.write(self.compressor.compress(data))
+        self.member_bytes += len(data)
+        if self.member_bytes >= COMPRESS_MEMBER_BYTES:
+            self._end_member()
+
+    def _end_member(self):
+        if self.compressor is not None:
+            self.raw.write(self.compressor.flush())
+            self.compressor = None
+
+    def position(self):
+        """Index fields for a block starting at the next byte written."""
+        if self.compression is None:
+            return {'offset': self.offset}
+        if self.compressor is None:
+            return {'offset': self.offset, 'member': self.raw.tell(), 'skip': 0}
+        return {'offset': self.offset, 'member': self.member_offset, 'skip': self.member_bytes}
+
+    def mark(self):
+        self._end_member()
+        return self.raw.tell(), self.offset
+
+    def rollback(self, mark):
+        self.compressor = None
+        self.raw.seek(mark[0])
+        self.raw.truncate()
+        self.offset = mark[1]
+
+    def close(self):
+        """Ends the last member; the raw file stays open."""
+        self._end_member()
+
+
+def _read_exactly(stream, size):
+    """size bytes from stream, or fewer at its end; some decompressors return short reads."""
+    parts = []
+    while size > 0:
+        data = stream.read(min(size, COMPRESS_MEMBER_BYTES))
+        if not data:
+            break
+        parts.append(data)
+        size -= len(data)
+    return b"".join(parts)
+
+
+def index_path_for(output_path):
+    return f"{output_path}.index.json"
+
+
+def build_index(output_path, output_format, compression, entries):
+    """The index dict for a bundle; entries are {'path', 'offset', 'length'[, 'member', 'skip']} per file."""
+    return {
+        'version': INDEX_VERSION,
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'bundle': os.path.basename(output_path),
+        'format': output_format.name,
+        'compression': compression or COMPRESSION_NONE,
+        'files': entries,
+    }
+
+
+def read_indexed_block(index_path, relative_path):
+    """The block of one exported file, read via the bundle's index without scanning or decompressing the rest."""
+    with open(index_path, 'r', encoding='utf-8') as f:
+        index = json.load(f)
+    compression = check_compression(index['compression'])
+    normalized_rel_path = relative_path.replace('\\', '/')
+    entry = next((e for e in index['files'] if e['path'] == normalized_rel_path), None)
+    if entry is None:
+        raise KeyError(f"{relative_path} is not in {index_path}")
+    with open(os.path.join(os.path.dirname(os.path.abspath(index_path)), index['bundle']), 'rb') as raw:
+        if compression is None:
+            raw.seek(entry['offset'])
+            return raw.read(entry['length']).decode('utf-8')
+        raw.seek(entry['member'])
+        with _open_decompressed(raw, compression) as stream:
+            _read_exactly(stream, entry['skip']) # Seeking forward in a decompressing stream reads anyway
+            return _read_exactly(stream, entry['length']).decode('utf-8')
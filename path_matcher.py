@@ -0,0 +1,140 @@
+import re
+
+GLOB_CHARS = ('*', '?', '[')
+
+
+def is_glob(pattern):
+    return any(c in pattern for c in GLOB_CHARS)
+
+
+def glob_to_regex(pattern):
+    """Translates a gitignore-style glob to a regex source matching a whole '/'-separated path.
+
+    '*' and '?' stay inside one path component, '**' spans any number of components.
+    """
+    regex = []
+    i = 0
+    n = len(pattern)
+    while i < n:
+        c = pattern[i]
+        if pattern.startswith('**/', i):
+            regex.append('(?:.*/)?') # Zero or more leading directories
+            i += 3
+        elif pattern.startswith('/**', i) and i + 3 == n:
+            regex.append('(?:/.*)?') # Everything below
+            i += 3
+        elif pattern.startswith('**', i):
+            regex.append('.*')
+            i += 2
+        elif c == '*':
+            regex.append('[^/]*')
+            i += 1
+        elif c == '?':
+            regex.append('[^/]')
+            i += 1
+        elif c == '[':
+            end = pattern.find(']', i + 1)
+            if end == -1:
+                regex.append(re.escape(c))
+                i += 1
+            else:
+                body = pattern[i + 1:end]
+                if body.startswith('!'):
+                    body = '^' + body[1:]
+                regex.append('[' + body.replace('\\', '\\\\') + ']')
+                i = end + 1
+        else:
+            regex.append(re.escape(c))
+            i += 1
+    return ''.join(regex)
+
+
+def _compile_alternation(sources):
+    if not sources:
+        return None
+    return re.compile('|'.join(f'(?:{source})' for source in sources))
+
+
+class ExclusionMatcher:
+    """Blacklist, exclude-string and extension checks compiled once per scan.
+
+    - Plain blacklist entries are root-relative paths; they exclude the path itself and
+      everything below it. They are kept in a set, one hash lookup per entry.
+    - Blacklist entries and exclude strings containing glob characters are globs. Globs
+      without a '/' match a single name at any depth ('*.min.js'), others match the whole
+      relative path ('**/generated/**').
+    - Other exclude strings are plain substrings, combined into one regex.
+    - Extensions are normalized the same way analyze_folder does (no dot, lowercase).
+    """
+
+    def __init__(self, blacklist=(), exclude_strings=(), exclude_extensions=()):
+        literal_paths = set()
+        name_globs = []
+        path_globs = []
+        substrings = []
+
+        for entry in blacklist:
+            entry = entry.replace('\\', '/').strip('/')
+            if not entry:
+                continue
+            if is_glob(entry):
+                (path_globs if '/' in entry else name_globs).append(glob_to_regex(entry))
+            else:
+                literal_paths.add(entry)
+
+        for exclude_str in exclude_strings:
+            if not exclude_str:
+                continue
+            if is_glob(exclude_str):
+                exclude_str = exclude_str.replace('\\', '/').strip('/')
+                (path_globs if '/' in exclude_str else name_globs).append(glob_to_regex(exclude_str))
+            else:
+                substrings.append(exclude_str)
+
+        self.blacklist_paths = frozenset(literal_paths)
+        self.name_glob_regex = _compile_alternation(name_globs)
+        self.path_glob_regex = _compile_alternation(path_globs)
+        # Longest first so overlapping literals don't shadow each other in the alternation
+        self.substring_regex = _compile_alternation(
+            [re.escape(s) for s in sorted(set(substrings), key=len, reverse=True)])
+        self.exclude_extensions = frozenset(e.lstrip('.').lower() for e in exclude_extensions)
+
+    def _matches_common(self, relative_path, name):
+        if relative_path in self.blacklist_paths:
+            return True
+        if self.substring_regex is not None and self.substring_regex.search(relative_path):
+            return True
+        if self.name_glob_regex is not None and self.name_glob_regex.fullmatch(name):
+            return True
+        if self.path_glob_regex is not None and self.path_glob_regex.fullmatch(relative_path):
+            return True
+        return False
+
+    # excludes_dir/excludes_file assume a top-down walk: the entry's parent directories already
+    # passed excludes_dir, so blacklist entries only need an exact match here.
+
+    def excludes_dir(self, relative_path, name):
+        """True if the directory (and so its whole subtree) should be skipped."""
+        return self._matches_common(relative_path, name)
+
+    def excludes_file(self, relative_path, name):
+        """True if the file should be left out of the list."""
+        if self._matches_common(relative_path, name):
+            return True
+        if self.exclude_extensions:
+            # Same result as os.path.splitext(name)[1].lstrip('.').lower(), without the call overhead
+            dot = name.rfind('.')
+            extension = name[dot + 1:].lower() if dot > 0 and name[:dot].lstrip('.') else ''
+            if extension in self.exclude_extensions:
+                return True
+        return False
+
+    def excludes_path(self, relative_path):
+        """Checks a file path that did not come from a top-down walk, including all of its parent directories."""
+        slash = relative_path.find('/')
+        while slash != -1:
+            dir_path = relative_path[:slash]
+            if self.excludes_dir(dir_path, dir_path.rpartition('/')[2]):
+                return True
+            slash = relative_path.find('/', slash + 1)
+        return self.excludes_file(relative_path, relative_path.rpartition('/')[2])
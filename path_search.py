@@ -0,0 +1,118 @@
+"""Search over the analyzed paths for the file list filter: substring, glob and fuzzy modes.
+
+The index is every path lowercased, with '\\' turned into '/', joined into one newline-separated
+string, plus an array of the offset each path starts at. A query is then a str.find or compiled
+regex run over that string in C, and each hit is mapped back to its path with a bisect and skips
+the rest of that line, so a keystroke costs one pass over a few MB instead of one Python-level
+comparison per path. When str.count says most paths will match anyway, a plain loop over the
+keys is cheaper than a find and a bisect per hit and is used instead. Appending paths is a join,
+cheap enough to do for every scan batch.
+"""
+import re
+from array import array
+from bisect import bisect_right
+from itertools import accumulate
+
+from path_matcher import glob_to_regex
+
+SEARCH_MODES = ('substring', 'glob', 'fuzzy')
+DENSE_HIT_RATIO = 0.1 # Above this share of matching paths, test every key instead of seeking hit by hit
+
+
+def _search_key(path):
+    return path.replace('\\', '/').replace('\n', ' ').lower()
+
+
+def _longest_literal(glob):
+    """Longest run of glob characters that every match must contain, for prefiltering."""
+    runs = re.split(r'\*+|\?|\[[^\]]*\]?', glob)
+    return max((run.strip('/') for run in runs), key=len, default='') # '**/' may also match no directory at all
+
+
+class PathIndex:
+    """Paths in list order; searches return the positions of matching paths in that order (fuzzy: best first)."""
+
+    def __init__(self, paths=()):
+        self.keys = [] # Lowercased paths
+        self.text = ""
+        self.starts = array('q', [0]) # starts[i] is where path i begins; the last entry is len(text)
+        self.pending = [] # Keys appended since the last search, joined into text lazily
+        self.extend(paths)
+
+    def __len__(self):
+        return len(self.keys) + len(self.pending)
+
+    def extend(self, paths):
+        self.pending.extend(_search_key(path) for path in paths)
+
+    def _flush(self):
+        if not self.pending:
+            return
+        ends = accumulate((len(key) + 1 for key in self.pending), initial=self.starts[-1])
+        next(ends) # The old end, already in starts
+        self.starts.extend(ends)
+        self.text += "\n".join(self.pending) + "\n"
+        self.keys.extend(self.pending)
+        self.pending = []
+
+    def _dense(self, needle):
+        return self.text.count(needle) > len(self.keys) * DENSE_HIT_RATIO
+
+    def search(self, mode, query):
+        """Positions of the paths matching query; an empty query matches nothing. Raises ValueError for an unknown mode."""
+        query = _search_key(query.strip())
+        if not query:
+            return []
+        self._flush()
+        if mode == 'substring':
+            return self._substring(query)
+        if mode == 'glob':
+            return self._glob(query)
+        if mode == 'fuzzy':
+            return self._fuzzy(query)
+        raise ValueError(f"Unknown search mode {mode!r}, expected one of: {', '.join(SEARCH_MODES)}")
+
+    def _substring(self, query):
+        if self._dense(query):
+            return [position for position, key in enumerate(self.keys) if query in key]
+        text, starts = self.text, self.starts
+        positions = []
+        found = text.find(query)
+        while found != -1:
+            position = bisect_right(starts, found) - 1
+            positions.append(position)
+            found = text.find(query, starts[position + 1]) # Next path; one hit per path is enough
+        return positions
+
+    def _glob(self, pattern):
+        """Like the exclusion globs: a pattern without '/' matches the file name, otherwise the whole path."""
+        try:
+            matcher = re.compile(glob_to_regex(pattern.strip('/')))
+        except re.error as e:
+            raise ValueError(f"Invalid glob {pattern!r}: {e}")
+        literal = _longest_literal(pattern)
+        candidates = self._substring(literal) if len(literal) >= 2 else range(len(self.keys))
+        keys = self.keys
+        if '/' in pattern.strip('/'):
+            return [position for position in candidates if matcher.fullmatch(keys[position])]
+        return [position for position in candidates if matcher.fullmatch(keys[position].rpartition('/')[2])]
+
+    def _fuzzy(self, query):
+        """Paths containing the query's characters in order, shortest leftmost match first, then shortest path.
+
+        Each gap is '[^c\\n]*' for the next character c, so the regex never backtracks into a gap.
+        """
+        chars = [c for c in query if not c.isspace()]
+        if len(chars) == 1: # Every match is one character long, so only the path length ranks them
+            return sorted(self._substring(chars[0]), key=lambda position: len(self.keys[position]))
+        pattern = re.escape(chars[0]) + "".join(f"[^{re.escape(c)}\n]*{re.escape(c)}" for c in chars[1:])
+        search = re.compile(pattern).search
+        text, starts = self.text, self.starts
+        scored = []
+        match = search(text)
+        while match is not None:
+            position = bisect_right(starts, match.start()) - 1
+            scored.append((match.end() - match.start(), len(self.keys[position]), position))
+            match = search(text, starts[position + 1])
+        scored.sort()
+        return [position for _span, _length, position in scored]
@@ -0,0 +1,134 @@
+"""Compact store of the analyzed files and their selection, for lists of 100k+ files.
+
+Files are rows across parallel columns instead of a dict each: interned paths in a list, the
+selection as one byte per file, token estimates in an array and file_probe kinds as one-byte codes.
+Whole-list operations work on columns: counts use bytearray.count, selected paths come from
+itertools.compress, and select all / invert combine the byte columns as big integers, so none of
+them runs Python code per file. Per-file access (the visible rows) goes through a position.
+"""
+import sys
+from array import array
+from itertools import compress
+
+from exporter_core import file_type_of
+from file_probe import KIND_BINARY, KIND_TEXT, KIND_TOO_LARGE
+from path_search import PathIndex
+
+KIND_CODES = (None, KIND_TEXT, KIND_BINARY, KIND_TOO_LARGE) # Index is the byte stored in the kinds column
+_KIND_TO_CODE = {kind: code for code, kind in enumerate(KIND_CODES)}
+_SELECTABLE = bytes([1, 1, 0, 0]) + bytes(252) # bytes.translate table: kind code -> 1 unless flagged
+NO_TOKENS = -1 # Tokens column value for "no estimate"
+
+
+def _mask_to_int(mask):
+    return int.from_bytes(mask, 'little')
+
+
+def _int_to_mask(value, length):
+    return bytearray(value.to_bytes(length, 'little'))
+
+
+class FileStore:
+    """The analyzed files in list order; position i is the i-th file in every column and in the search index.
+
+    Bulk selection leaves binary / too-large files unticked; they are only selected one by one.
+    """
+
+    def __init__(self, records=()):
+        self.paths = []
+        self.selected = bytearray() # 1 per selected file
+        self.tokens = array('q')
+        self.kinds = bytearray()
+        self.index = PathIndex() # Search over paths, same positions
+        self.type_positions = {} # file_type_of -> array of positions, for select by extension
+        self.extend(records)
+
+    def __len__(self):
+        return len(self.paths)
+
+    def extend(self, records):
+        """Appends (relative_path, selected, tokens or None, file_probe kind or None) records."""
+        first = len(self.paths)
+        for relative_path, selected, tokens, kind in records:
+            position = len(self.paths)
+            self.paths.append(sys.intern(relative_path))
+            self.selected.append(1 if selected else 0)
+            self.tokens.append(NO_TOKENS if tokens is None else tokens)
+            self.kinds.append(_KIND_TO_CODE[kind])
+            file_type = file_type_of(relative_path)
+            positions = self.type_positions.get(file_type)
+            if positions is None:
+                positions = self.type_positions[file_type] = array('l')
+            positions.append(position)
+        self.index.extend(self.paths[first:])
+
+    # --- One file ---
+
+    def path(self, position):
+        return self.paths[position]
+
+    def is_selected(self, position):
+        return self.selected[position] == 1
+
+    def set_selected(self, position, selected):
+        self.selected[position] = 1 if selected else 0
+
+    def tokens_at(self, position):
+        tokens = self.tokens[position]
+        return None if tokens == NO_TOKENS else tokens
+
+    def kind(self, position):
+        return KIND_CODES[self.kinds[position]]
+
+    # --- Whole list ---
+
+    def file_types(self):
+        return set(self.type_positions)
+
+    def selected_paths(self):
+        return list(compress(self.paths, self.selected))
+
+    def selected_count(self):
+        return self.selected.count(1)
+
+    def selected_tokens(self):
+        return sum(tokens for tokens in compress(self.tokens, self.selected) if tokens > 0)
+
+    def flagged_count(self):
+        return len(self.kinds) - self.kinds.translate(_SELECTABLE).count(1)
+
+    def select_all(self):
+        selectable = _mask_to_int(self.kinds.translate(_SELECTABLE))
+        self.selected = _int_to_mask(_mask_to_int(self.selected) | selectable, len(self.selected))
+
+    def clear(self):
+        self.selected = bytearray(len(self.selected))
+
+    def invert(self):
+        """Flips every selectable file; selected flagged files end up unticked."""
+        selectable = _mask_to_int(self.kinds.translate(_SELECTABLE))
+        self.selected = _int_to_mask((_mask_to_int(self.selected) ^ selectable) & selectable, len(self.selected))
+
+    def set_positions(self, positions, selected):
+        """Ticks or unticks the files at positions, e.g. search matches; flagged files are never ticked."""
+        column = self.selected
+        if not selected:
+            for position in positions:
+                column[position] = 0
+            return
+        kinds = self.kinds
+        for position in positions:
+            column[position] = _SELECTABLE[kinds[position]] or column[position]
+
+    def select_type(self, file_type):
+        """Ticks every file of one file_type_of type, or all files for '*'."""
+        if file_type == "*":
+            self.select_all()
+        else:
+            self.set_positions(self.type_positions.get(file_type, ()), True)
+
+    def positions_under(self, directory):
+        """Positions of the files below a '/'-separated relative directory."""
+        prefix = directory.replace('\\', '/').strip('/') + '/'
+        return [position for position, relative_path in enumerate(self.paths)
+                if relative_path.replace('\\', '/').startswith(prefix)]
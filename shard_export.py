@@ -0,0 +1,415 @@
+"""Sharded export: the bundle split into several files by a byte or token limit, plus a JSON manifest.
+
+For output_path 'bundle.txt' the shards are 'bundle.part001.txt', 'bundle.part002.txt', ... and the
+manifest is 'bundle.manifest.json'. The manifest lists, for every exported file, the shard its block is
+in with the block's byte offset and length, so readers can seek straight to a file. Only one layout is
+kept at an output path: a sharded export removes 'bundle.txt' and its index, and a single-file export
+there should call remove_sharded_layout.
+"""
+import json
+import math
+import os
+import re
+import tempfile
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+
+from exporter_core import (
+    EXPORT_CHUNK_SIZE, EXPORT_READ_WORKERS, file_type_of, iter_export_reads, match_output_permissions,
+    open_export_text,
+)
+from file_probe import DEFAULT_MAX_FILE_BYTES
+from output_formats import PLAIN_FORMAT, index_path_for
+from token_budget import BYTES_PER_TOKEN
+
+MANIFEST_VERSION = 1
+SHARD_WRITE_WORKERS = 4 # Shards written at the same time; also caps the finished shards held in memory
+LIMIT_BYTES = 'bytes'
+LIMIT_TOKENS = 'tokens'
+MAX_UTF8_CHAR_BYTES = 4
+_LIMIT_PATTERN = re.compile(r'\s*([0-9][0-9_,]*(?:\.[0-9]+)?)\s*([kmg]?)\s*(b|tokens?)\s*')
+
+
+def parse_shard_limit(text):
+    """('bytes' or 'tokens', value) from e.g. '20MB', '512 KB', '100k tokens'; None for an empty text. Raises ValueError."""
+    text = (text or '').strip()
+    if not text:
+        return None
+    match = _LIMIT_PATTERN.fullmatch(text.lower())
+    if not match:
+        raise ValueError(f"Shard limit must look like '20MB' or '100k tokens', got {text!r}")
+    number, multiplier, unit = match.groups()
+    kind = LIMIT_BYTES if unit == 'b' else LIMIT_TOKENS
+    base = 1024 if kind == LIMIT_BYTES else 1000
+    value = int(float(number.replace('_', '').replace(',', '')) * base ** ' kmg'.index(multiplier or ' '))
+    if value <= 0:
+        raise ValueError("Shard limit must be positive")
+    _check_shard_room(kind, value, BYTES_PER_TOKEN)
+    return kind, value
+
+
+def _check_shard_room(kind, value, bytes_per_token):
+    """Raises ValueError unless a shard of value fits a part's framing plus one character."""
+    if kind == LIMIT_BYTES and value < MIN_SHARD_BYTES:
+        raise ValueError(f"Shard limit must be at least {MIN_SHARD_BYTES} B to hold a part of a file")
+    if kind == LIMIT_TOKENS and value * bytes_per_token < MIN_SHARD_BYTES:
+        raise ValueError(f"Shard limit must be at least {math.ceil(MIN_SHARD_BYTES / bytes_per_token)} tokens "
+                         f"to hold a part of a file")
+
+
+def shard_path(output_path, shard_number):
+    base, extension = os.path.splitext(output_path)
+    return f"{base}.part{shard_number:03d}{extension}"
+
+
+def manifest_path_for(output_path):
+    return f"{os.path.splitext(output_path)[0]}.manifest.json"
+
+
+class ShardLimit:
+    """How big a shard may get: kind is LIMIT_BYTES or LIMIT_TOKENS.
+
+    Token limits count with tokenizer (see token_budget.load_tokenizer) if given, else bytes / bytes_per_token.
+    """
+
+    def __init__(self, kind, value, tokenizer=None, bytes_per_token=BYTES_PER_TOKEN):
+        """Raises ValueError for limits too small for a part's framing, see MIN_SHARD_BYTES."""
+        _check_shard_room(kind, value, bytes_per_token)
+        self.kind = kind
+        self.value = value
+        self.tokenizer = tokenizer
+        self.bytes_per_token = bytes_per_token
+
+    def measure(self, data, text=None):
+        """Size of the encoded block data (text is its str, if at hand) in the limit's unit."""
+        if self.kind == LIMIT_BYTES:
+            return len(data)
+        if self.tokenizer is not None:
+            return self.tokenizer(text if text is not None else data.decode('utf-8'))
+        return math.ceil(len(data) / self.bytes_per_token)
+
+    def bytes_budget(self):
+        """Roughly how many bytes fit in one shard; used to cut files that don't fit in one."""
+        return self.value if self.kind == LIMIT_BYTES else int(self.value * self.bytes_per_token)
+
+
+def _part_framing(normalized_rel_path, part_number):
+    part_label = f"{normalized_rel_path} (part {part_number})"
+    return PLAIN_FORMAT.block_start(part_label), PLAIN_FORMAT.block_end(part_label)
+
+
+# Smallest shard: a part's framing (for an empty path) and one character
+MIN_SHARD_BYTES = len("".join(_part_framing('', 99999)).encode('utf-8')) + MAX_UTF8_CHAR_BYTES
+
+
+def _iter_content_parts(chunks, budget):
+    """Re-cuts text chunks into encoded pieces of at most budget bytes, preferring to cut after a newline.
+
+    A piece is never cut inside a UTF-8 sequence, so with a budget smaller than a character that
+    character makes up a piece on its own.
+    """
+    buffer = bytearray()
+    yielded = False
+    for chunk in chunks:
+        buffer += chunk.encode('utf-8')
+        while len(buffer) > budget:
+            cut = budget
+            while cut > 0 and (buffer[cut] & 0xC0) == 0x80:
+                cut -= 1 # Don't split a UTF-8 sequence
+            if cut == 0:
+                cut = 1 # The first character alone is over budget: take it whole
+                while cut < len(buffer) and (buffer[cut] & 0xC0) == 0x80:
+                    cut += 1
+            newline = buffer.rfind(b'\n', 0, cut)
+            if newline >= cut // 2:
+                cut = newline + 1
+            yield bytes(buffer[:cut])
+            del buffer[:cut]
+            yielded = True
+    if buffer or not yielded:
+        yield bytes(buffer)
+
+
+def _iter_text_chunks(source):
+    with source:
+        while True:
+            chunk = source.read(EXPORT_CHUNK_SIZE)
+            if not chunk:
+                return
+            yield chunk
+
+
+def _minified_chunks(minifier, normalized_rel_path, file_type, source):
+    with source:
+        yield from minifier.minify_stream(normalized_rel_path, file_type, source)
+
+
+def _write_shard(output_dir, temp_prefix, shard_number, pieces, trace):
+    """Writes one shard to a temp file. Returns (temp_path, [(entry_index, offset, length)], size)."""
+    started = perf_counter()
+    fd, temp_path = tempfile.mkstemp(prefix=temp_prefix, suffix=".tmp", dir=output_dir)
+    placements = []
+    offset = 0
+    try:
+        with open(fd, 'wb') as outfile:
+            for entry_index, data in pieces:
+                outfile.write(data)
+                placements.append((entry_index, offset, len(data)))
+                offset += len(data)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+    if trace is not None:
+        trace.add('write', perf_counter() - started, nbytes=offset, item=f"part{shard_number:03d}")
+    return temp_path, placements, offset
+
+
+class _ShardFiller:
+    """Packs blocks into shards in order and hands every full shard to the writer pool."""
+
+    def __init__(self, limit, output_dir, temp_prefix, trace):
+        self.limit = limit
+        self.output_dir = output_dir
+        self.temp_prefix = temp_prefix
+        self.trace = trace
+        self.pool = ThreadPoolExecutor(max_workers=SHARD_WRITE_WORKERS, thread_name_prefix="shard-write")
+        self.pending = deque() # Futures of shards being written, oldest first
+        self.written = [] # _write_shard results in shard order
+        self.pieces = []
+        self.units = 0
+
+    def add(self, entry_index, data, units):
+        if self.pieces and self.units + units > self.limit.value:
+            self.flush()
+        self.pieces.append((entry_index, data))
+        self.units += units
+        return len(self.written) + len(self.pending) # Index of the shard the block goes to
+
+    def flush(self):
+        if not self.pieces:
+            return
+        shard_number = len(self.written) + len(self.pending) + 1
+        self.pending.append(self.pool.submit(_write_shard, self.output_dir, self.temp_prefix, shard_number,
+                                             self.pieces, self.trace))
+        self.pieces = []
+        self.units = 0
+        while len(self.pending) > SHARD_WRITE_WORKERS:
+            self.written.append(self.pending.popleft().result())
+
+    def finish(self):
+        """Waits for every shard. Returns the _write_shard results; temp files are cleaned up if a write failed."""
+        self.flush()
+        try:
+            while self.pending:
+                self.written.append(self.pending.popleft().result())
+        except BaseException:
+            self.discard()
+            raise
+        finally:
+            self.pool.shutdown(wait=True)
+        return self.written
+
+    def discard(self):
+        self.pool.shutdown(wait=True, cancel_futures=True)
+        for future in self.pending:
+            if future.done() and not future.cancelled() and future.exception() is None:
+                self.written.append(future.result())
+        self.pending.clear()
+        for temp_path, _placements, _size in self.written:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+        self.written = []
+
+
+def _remove_stale_shards(output_path, first_unused):
+    """Deletes shards left over from an earlier export that needed more of them."""
+    shard_number = first_unused
+    while os.path.exists(shard_path(output_path, shard_number)):
+        try:
+            os.remove(shard_path(output_path, shard_number))
+        except OSError as e:
+            print(f"Could not remove stale shard {shard_path(output_path, shard_number)}: {e}")
+            return
+        shard_number += 1
+
+
+def _remove_stale_output(path):
+    """Deletes path, an earlier export's output in the other layout, if it is there."""
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        print(f"Could not remove stale export output {path}: {e}")
+
+
+def remove_sharded_layout(output_path):
+    """Deletes the shards and manifest of an earlier sharded export to output_path, once a single file replaced them."""
+    _remove_stale_output(manifest_path_for(output_path)) # First, so no reader follows it to missing shards
+    _remove_stale_shards(output_path, 1)
+
+
+def write_sharded_export(folder, relative_paths, output_path, limit, should_commit=None, workers=EXPORT_READ_WORKERS,
+                         cache=None, max_file_bytes=DEFAULT_MAX_FILE_BYTES, trace=None, dedup=None, minifier=None,
+                         records=None, keep_content=None):
+    """Like write_export_bundle, but fills shards of at most limit (a ShardLimit) and writes a manifest.
+
+    Files keep the bundle order and a file's block is only split when it alone exceeds the limit; its parts
+    are then framed as '-- BEGIN FILE: path (part N) --' and held in memory until the file was read completely,
+    so a read error leaves no partial parts behind. Full shards are written by a small thread pool while the
+    next one fills. Everything goes to temp files first and is renamed into place, manifest last, only if
+    should_commit(exported_count, export_errors) allows it, and then a single-file bundle at output_path (and its
+    index) from an earlier export is removed. dedup, minifier, records and keep_content work as in
+    write_export_bundle. Returns (exported_count, export_errors, committed, manifest_path). Write errors propagate.
+    """
+    output_path = os.path.abspath(output_path)
+    output_dir = os.path.dirname(output_path)
+    manifest_path = manifest_path_for(output_path)
+    filler = _ShardFiller(limit, output_dir, f".{os.path.basename(output_path)}.", trace)
+    entries = [] # Manifest entries, offsets filled in once the shards are written
+    exported_count = 0
+    export_errors = []
+    committed = False
+    if minifier is not None:
+        minifier.begin(len(relative_paths))
+    try:
+        for relative_path, block, read_error, digest, stat_key in iter_export_reads(
+                folder, relative_paths, workers, cache, max_file_bytes, trace, PLAIN_FORMAT,
+                dedup is not None or records is not None, minifier, keep_content=keep_content):
+            normalized_rel_path = relative_path.replace('\\', '/')
+            full_file_path = os.path.join(folder, relative_path)
+            if read_error is None and dedup is not None:
+                try:
+                    if block is None:
+                        stream_size = os.path.getsize(full_file_path)
+                        original, digest = dedup.check_streamed(normalized_rel_path, full_file_path, stream_size)
+                    else:
+                        original = dedup.check(normalized_rel_path, digest, len(block))
+                except OSError as e:
+                    read_error = e
+                    original = None
+                if original is not None:
+                    data = PLAIN_FORMAT.reference_block(normalized_rel_path, original).encode('utf-8')
+                    entries.append({'path': normalized_rel_path, 'duplicate_of': original})
+                    entries[-1]['shard'] = filler.add(len(entries) - 1, data, limit.measure(data))
+                    exported_count += 1
+                    if records is not None:
+                        records[relative_path] = stat_key + (digest,)
+                    continue
+            if read_error is None and block is not None:
+                data = block.encode('utf-8')
+                units = limit.measure(data, block)
+                if units <= limit.value:
+                    entries.append({'path': normalized_rel_path})
+                    entries[-1]['shard'] = filler.add(len(entries) - 1, data, units)
+                    exported_count += 1
+                    if records is not None:
+                        records[relative_path] = stat_key + (digest,)
+                    continue
+                # The plain format doesn't escape, so the content is what its framing surrounds
+                header = PLAIN_FORMAT.block_start(normalized_rel_path)
+                footer = PLAIN_FORMAT.block_end(normalized_rel_path)
+                chunks = [block[len(header):len(block) - len(footer)]]
+            elif read_error is None:
+                try:
+                    source = open_export_text(full_file_path)
+                    file_type = file_type_of(normalized_rel_path)
+                    if minifier is not None and minifier.supports(file_type):
+                        chunks = _minified_chunks(minifier, normalized_rel_path, file_type, source)
+                    else:
+                        chunks = _iter_text_chunks(source)
+                except Exception as e:
+                    read_error = e
+            if read_error is not None:
+                export_errors.append(f"Could not read file: {relative_path}. Error: {read_error}")
+                continue
+
+            header, footer = _part_framing(normalized_rel_path, 99999)
+            budget = max(1, limit.bytes_budget() - len((header + footer).encode('utf-8')))
+            try:
+                parts = list(_iter_content_parts(chunks, budget))
+            except Exception as e:
+                export_errors.append(f"Could not read file: {relative_path}. Error: {e}")
+                continue
+            if len(parts) == 1:
+                # Streamed because of its size, but fits in one shard after all
+                data = (PLAIN_FORMAT.block_start(normalized_rel_path).encode('utf-8') + parts[0]
+                        + PLAIN_FORMAT.block_end(normalized_rel_path).encode('utf-8'))
+                entries.append({'path': normalized_rel_path})
+                entries[-1]['shard'] = filler.add(len(entries) - 1, data, limit.measure(data))
+            else:
+                for part_number, content in enumerate(parts, 1):
+                    header, footer = _part_framing(normalized_rel_path, part_number)
+                    data = header.encode('utf-8') + content + footer.encode('utf-8')
+                    entries.append({'path': normalized_rel_path, 'part': part_number, 'parts': len(parts)})
+                    entries[-1]['shard'] = filler.add(len(entries) - 1, data, limit.measure(data))
+            if dedup is not None and block is None:
+                dedup.record_streamed(normalized_rel_path, full_file_path, stream_size, digest)
+            exported_count += 1
+            if records is not None:
+                records[relative_path] = stat_key + (digest,)
+
+        written = filler.finish()
+        shards = []
+        for shard_index, (_temp_path, placements, size) in enumerate(written):
+            for entry_index, offset, length in placements:
+                entries[entry_index]['offset'] = offset
+                entries[entry_index]['length'] = length
+            shards.append({'path': os.path.basename(shard_path(output_path, shard_index + 1)), 'bytes': size,
+                           'blocks': len(placements)})
+        manifest = {
+            'version': MANIFEST_VERSION,
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'folder': os.path.abspath(folder),
+            'limit': {'kind': limit.kind, 'value': limit.value},
+            'shards': shards,
+            'files': entries,
+        }
+
+        if should_commit is None or should_commit(exported_count, export_errors):
+            for shard_index, (temp_path, _placements, _size) in enumerate(written):
+                final_path = shard_path(output_path, shard_index + 1)
+                match_output_permissions(temp_path, final_path)
+                os.replace(temp_path, final_path)
+            fd, temp_manifest = tempfile.mkstemp(prefix=f".{os.path.basename(manifest_path)}.", suffix=".tmp",
+                                                 dir=output_dir)
+            try:
+                with open(fd, 'w', encoding='utf-8') as f:
+                    json.dump(manifest, f, indent=1)
+                match_output_permissions(temp_manifest, manifest_path)
+                os.replace(temp_manifest, manifest_path)
+            except BaseException:
+                os.remove(temp_manifest)
+                raise
+            committed = True
+            _remove_stale_shards(output_path, len(written) + 1)
+            _remove_stale_output(output_path) # A single-file bundle and its index from an earlier export
+            _remove_stale_output(index_path_for(output_path))
+    finally:
+        if minifier is not None:
+            minifier.end()
+        if not committed:
+            filler.discard()
+    return exported_count, export_errors, committed, manifest_path if committed else None
+
+
+def read_manifest_block(manifest_path, relative_path):
+    """The text of one exported file's block(s), read straight from its shard(s) via the manifest."""
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    manifest_dir = os.path.dirname(os.path.abspath(manifest_path))
+    blocks = []
+    for entry in manifest['files']:
+        if entry['path'] != relative_path:
+            continue
+        with open(os.path.join(manifest_dir, manifest['shards'][entry['shard']]['path']), 'rb') as shard:
+            shard.seek(entry['offset'])
+            blocks.append(shard.read(entry['length']).decode('utf-8'))
+    return "".join(blocks)
@@ -0,0 +1,139 @@
+"""Compact encoding of the file lists in version 2 .llmexport files, and the diff shown when one is loaded.
+
+Version 1 stored 'analyzed_files' and 'selected_files' as two full path lists. Version 2 stores:
+
+    "file_tree":     the analyzed paths as a prefix tree, each directory name written once. A directory is
+                     [name, [children...]], a file just its name, e.g. ["README.md", ["src", ["a.py", "b.py"]]]
+    "selected_runs": the selection as alternating run lengths over the files in tree order, starting
+                     with a run of unselected files, e.g. [2, 1] is "not, not, selected"
+    "extra_selected_files": selected paths that are not in the tree (rare, kept as a plain list)
+
+The whole file may also be gzip-compressed; readers recognize it by the gzip magic bytes.
+"""
+import gzip
+import json
+
+GZIP_MAGIC = b'\x1f\x8b'
+STATE_GZIP_LEVEL = 6
+
+
+def encode_path_tree(relative_paths):
+    """Returns (tree, ordered_paths): the nested-list tree and the paths in the order the tree lists them.
+
+    Paths are grouped by directory in order of first appearance; duplicates collapse into one entry.
+    """
+    root = {} # name -> None for files, name + '/' -> {...} for directories, so a file and a folder can share a name
+    last_directory = None
+    for relative_path in relative_paths:
+        directory, _sep, name = relative_path.rpartition('/')
+        if directory != last_directory: # Walk order lists a directory's files together
+            node = root
+            for part in directory.split('/') if directory else ():
+                child = node.get(part + '/')
+                if child is None:
+                    child = node[part + '/'] = {}
+                node = child
+            last_directory = directory
+        node[name] = None
+
+    ordered_paths = []
+
+    def build(node, prefix):
+        entries = []
+        for key, child in node.items():
+            if child is None:
+                entries.append(key)
+                ordered_paths.append(prefix + key)
+            else:
+                entries.append([key[:-1], build(child, prefix + key)])
+        return entries
+
+    return build(root, ''), ordered_paths
+
+
+def decode_path_tree(tree):
+    """The paths of a file_tree in tree order. Raises ValueError if it is malformed."""
+    paths = []
+
+    def walk(entries, prefix):
+        if not isinstance(entries, list):
+            raise ValueError("file_tree entries must be lists")
+        for entry in entries:
+            if isinstance(entry, str):
+                paths.append(prefix + entry)
+            elif isinstance(entry, list) and len(entry) == 2 and isinstance(entry[0], str):
+                walk(entry[1], prefix + entry[0] + '/')
+            else:
+                raise ValueError(f"Malformed file_tree entry: {entry!r:.80}")
+
+    walk(tree, '')
+    return paths
+
+
+def encode_selection(ordered_paths, selected_files):
+    """Alternating run lengths (unselected first) of which ordered_paths are in selected_files."""
+    runs = []
+    current = False
+    length = 0
+    for relative_path in ordered_paths:
+        if (relative_path in selected_files) != current:
+            runs.append(length)
+            current = not current
+            length = 0
+        length += 1
+    if current:
+        runs.append(length) # A trailing unselected run carries no information
+    return runs
+
+
+def decode_selection(ordered_paths, runs):
+    """The set of selected paths described by selected_runs. Raises ValueError if it is malformed."""
+    selected = set()
+    position = 0
+    for i, length in enumerate(runs):
+        if not isinstance(length, int) or length < 0:
+            raise ValueError(f"Malformed selected_runs entry: {length!r}")
+        if i % 2:
+            selected.update(ordered_paths[position:position + length])
+        position += length
+    return selected
+
+
+def dump_state(state_data, state_filepath, compress=False):
+    """Writes state_data as compact JSON, gzip-compressed if compress."""
+    text = json.dumps(state_data, separators=(',', ':')) # One dumps call uses the C encoder, json.dump doesn't
+    if compress:
+        with gzip.open(state_filepath, 'wt', encoding='utf-8', compresslevel=STATE_GZIP_LEVEL) as f:
+            f.write(text)
+    else:
+        with open(state_filepath, 'w', encoding='utf-8') as f:
+            f.write(text)
+
+
+def load_state_json(state_filepath):
+    """Parses a plain or gzip-compressed state file. Raises OSError/ValueError."""
+    with open(state_filepath, 'rb') as f:
+        data = f.read()
+    if data.startswith(GZIP_MAGIC):
+        try:
+            data = gzip.decompress(data)
+        except (OSError, EOFError) as e:
+            raise ValueError(f"Corrupt compressed state file: {e}")
+    return json.loads(data.decode('utf-8'))
+
+
+def diff_file_lists(saved_files, saved_selected, current_files):
+    """What changed in the tree since a state file was saved.
+
+    Returns {'added': current files not in the saved list, 'removed': saved files no longer present,
+    'removed_selected': the removed files that were selected, 'selected_present': count of selected files still there}.
+    """
+    saved = set(saved_files)
+    current = set(current_files)
+    removed = [relative_path for relative_path in saved_files if relative_path not in current]
+    return {
+        'added': [relative_path for relative_path in current_files if relative_path not in saved],
+        'removed': removed,
+        'removed_selected': [relative_path for relative_path in removed if relative_path in saved_selected],
+        'selected_present': len(saved_selected & current),
+    }
@@ -0,0 +1,149 @@
+import json
+import os
+import shutil
+import subprocess
+import time
+
+import pytest
+
+import delta_export
+from delta_export import LAST_EXPORT_LABEL, ExportSnapshot, revision_delta, snapshot_delta
+from exporter_core import write_export_bundle
+
+GIT_ENV = {**os.environ, 'GIT_AUTHOR_NAME': 'test', 'GIT_AUTHOR_EMAIL': 'test@example.com',
+           'GIT_COMMITTER_NAME': 'test', 'GIT_COMMITTER_EMAIL': 'test@example.com', 'GIT_CONFIG_NOSYSTEM': '1'}
+FILES = {
+    'keep.txt': 'unchanged\n',
+    'edit.py': 'def f():\n    return 1\n',
+    'gone.txt': 'deleted later\n',
+    'sub/touch.txt': 'same bytes, new mtime\n',
+}
+
+
+@pytest.fixture
+def folder(tmp_path, monkeypatch):
+    monkeypatch.setattr(delta_export, 'MTIME_RACE_WINDOW_NS', 0) # Files written just now are trusted by their stat
+    root = tmp_path / 'project'
+    for relative_path, content in FILES.items():
+        path = root / relative_path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content, encoding='utf-8')
+    return root
+
+
+def full_export(folder, cache_dir, output_path, keep_contents=True):
+    """What a full export with a snapshot does: record what it read, replacing the old snapshot."""
+    snapshot = ExportSnapshot(str(folder), str(cache_dir))
+    records = {}
+    started_at_ns = time.time_ns()
+    write_export_bundle(str(folder), sorted(FILES), str(output_path), workers=2, records=records,
+                        keep_content=snapshot.store_content if keep_contents else None)
+    snapshot.record(records, started_at_ns, replace=True)
+    snapshot.save()
+    return snapshot
+
+
+def change_files(folder):
+    time.sleep(0.01) # A new mtime_ns, even on coarse clocks
+    (folder / 'edit.py').write_text('def f():\n    return 2\n', encoding='utf-8')
+    (folder / 'gone.txt').unlink()
+    (folder / 'new.txt').write_text('added\n', encoding='utf-8')
+    os.utime(folder / 'sub/touch.txt') # Touched only
+
+
+def test_snapshot_round_trip(folder, tmp_path):
+    snapshot = full_export(folder, tmp_path / 'cache', tmp_path / 'out.txt')
+    loaded = ExportSnapshot(str(folder), str(tmp_path / 'cache'))
+    assert loaded.load() and loaded.exists
+    assert loaded.files == snapshot.files
+    assert sorted(loaded.files) == sorted(FILES)
+    assert loaded.taken_at_ns == snapshot.taken_at_ns
+    for relative_path, (size, mtime_ns, digest) in loaded.files.items():
+        st = os.stat(folder / relative_path)
+        assert (size, mtime_ns) == (st.st_size, st.st_mtime_ns)
+        assert loaded.read_content(digest) == (folder / relative_path).read_bytes()
+    assert loaded.read_content(None) is None
+
+
+def test_unreadable_snapshot_is_discarded(folder, tmp_path):
+    snapshot = full_export(folder, tmp_path / 'cache', tmp_path / 'out.txt')
+    other = ExportSnapshot(str(tmp_path), str(tmp_path / 'cache')) # Another folder
+    assert not other.load()
+    with open(snapshot.snapshot_path, 'w', encoding='utf-8') as f:
+        json.dump({'version': 0}, f)
+    stale = ExportSnapshot(str(folder), str(tmp_path / 'cache'))
+    assert not stale.load() and stale.files == {}
+
+
+def test_snapshot_delta_with_diffs(folder, tmp_path):
+    full_export(folder, tmp_path / 'cache', tmp_path / 'out.txt')
+    change_files(folder)
+    snapshot = ExportSnapshot(str(folder), str(tmp_path / 'cache'))
+    assert snapshot.load()
+    selection = sorted(FILES) + ['new.txt']
+    delta = snapshot_delta(snapshot, selection, as_diffs=True)
+    assert delta['since'] == LAST_EXPORT_LABEL
+    assert delta['added'] == ['new.txt']
+    assert delta['modified'] == ['edit.py']
+    assert delta['removed'] == ['gone.txt']
+    assert delta['paths'] == ['edit.py', 'new.txt']
+
+    records = {}
+    output_path = tmp_path / 'delta.txt'
+    write_export_bundle(str(folder), delta['paths'], str(output_path), workers=1, diff=delta['diff'],
+                        removed_paths=delta['removed'], records=records, keep_content=snapshot.store_content)
+    bundle = output_path.read_text(encoding='utf-8')
+    assert '-- BEGIN DIFF: edit.py (since last export) --' in bundle
+    assert '-    return 1\n+    return 2' in bundle
+    assert '-- BEGIN FILE: new.txt --\nadded\n' in bundle
+    assert '-- REMOVED FILE: gone.txt --' in bundle
+
+    snapshot.record(records, snapshot.compared_at_ns, delta['removed'])
+    snapshot.save()
+    assert sorted(snapshot.files) == ['edit.py', 'keep.txt', 'new.txt', 'sub/touch.txt']
+    assert snapshot.read_content(snapshot.files['edit.py'][2]) == (folder / 'edit.py').read_bytes()
+    again = ExportSnapshot(str(folder), str(tmp_path / 'cache'))
+    again.load()
+    assert snapshot_delta(again, selection)['paths'] == []
+
+
+def test_delta_without_kept_contents_writes_files_whole(folder, tmp_path):
+    full_export(folder, tmp_path / 'cache', tmp_path / 'out.txt', keep_contents=False)
+    change_files(folder)
+    snapshot = ExportSnapshot(str(folder), str(tmp_path / 'cache'))
+    snapshot.load()
+    delta = snapshot_delta(snapshot, sorted(FILES), as_diffs=True)
+    assert delta['modified'] == ['edit.py']
+    assert delta['diff'][0] == {} # Nothing to diff against
+    assert not os.path.exists(snapshot.content_dir)
+
+
+def test_save_prunes_contents_no_longer_referred_to(folder, tmp_path):
+    snapshot = full_export(folder, tmp_path / 'cache', tmp_path / 'out.txt')
+    old_digest = snapshot.files['edit.py'][2]
+    change_files(folder)
+    records = {}
+    write_export_bundle(str(folder), ['edit.py'], str(tmp_path / 'out.txt'), workers=1, records=records,
+                        keep_content=snapshot.store_content)
+    snapshot.record(records, time.time_ns())
+    snapshot.save()
+    assert old_digest.hex() not in os.listdir(snapshot.content_dir)
+    assert snapshot.files['edit.py'][2].hex() in os.listdir(snapshot.content_dir)
+
+
+@pytest.mark.skipif(shutil.which('git') is None, reason="needs the git command")
+def test_revision_delta(folder):
+    def git(*args):
+        subprocess.run(['git', *args], cwd=folder, env=GIT_ENV, check=True, capture_output=True)
+
+    git('init', '-q')
+    git('add', '-A')
+    git('commit', '-q', '-m', 'initial')
+    change_files(folder)
+    delta = revision_delta(str(folder), 'HEAD', sorted(FILES) + ['new.txt'], as_diffs=True)
+    assert delta['since'] == 'HEAD'
+    assert delta['added'] == ['new.txt']
+    assert delta['modified'] == ['edit.py']
+    assert delta['removed'] == ['gone.txt']
+    assert delta['paths'] == ['edit.py', 'new.txt']
+    assert delta['diff'] == ({'edit.py': FILES['edit.py']}, 'HEAD')
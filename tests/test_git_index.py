@@ -0,0 +1,114 @@
+import os
+import shutil
+import subprocess
+
+import pytest
+
+from git_index import (
+    GitIndexError, list_git_files, read_index_paths, read_revision_files, revision_changes, revision_paths,
+)
+
+pytestmark = pytest.mark.skipif(shutil.which('git') is None, reason="needs the git command")
+
+GIT_ENV = {**os.environ, 'GIT_AUTHOR_NAME': 'test', 'GIT_AUTHOR_EMAIL': 'test@example.com',
+           'GIT_COMMITTER_NAME': 'test', 'GIT_COMMITTER_EMAIL': 'test@example.com', 'GIT_CONFIG_NOSYSTEM': '1'}
+FILES = [
+    'README.md',
+    'src/app/__init__.py',
+    'src/app/main.py',
+    'src/app/models/user.py',
+    'src/app/models/user_test.py', # Shares a long prefix with the previous path, the case v4 compresses
+    'src/lib/with space.txt',
+    'docs/café.md',
+    'z.txt',
+]
+
+
+def git(repo, *args):
+    return subprocess.run(['git', *args], cwd=repo, env=GIT_ENV, check=True, capture_output=True).stdout
+
+
+def ls_files(repo):
+    """git's own list of the checked out files, each once (a conflict lists one entry per stage)."""
+    tagged = git(repo, 'ls-files', '-z', '-t').decode('utf-8').split('\0')[:-1]
+    return list(dict.fromkeys(entry[2:] for entry in tagged if not entry.startswith('S '))) # S: skip-worktree
+
+
+@pytest.fixture
+def repo(tmp_path):
+    git(tmp_path, 'init', '-q')
+    for relative_path in FILES:
+        full_path = tmp_path / relative_path
+        full_path.parent.mkdir(parents=True, exist_ok=True)
+        full_path.write_text(f"content of {relative_path}\n", encoding='utf-8')
+    if hasattr(os, 'symlink'):
+        os.symlink('z.txt', tmp_path / 'link.txt')
+    git(tmp_path, 'add', '-A')
+    git(tmp_path, 'commit', '-q', '-m', 'initial')
+    return tmp_path
+
+
+@pytest.mark.parametrize('version', [2, 3, 4])
+def test_read_index_paths_matches_ls_files(repo, version):
+    git(repo, 'update-index', '--index-version', str(version))
+    assert read_index_paths(os.path.join(repo, '.git', 'index')) == ls_files(repo)
+
+
+@pytest.mark.parametrize('version', [3, 4])
+def test_skip_worktree_entries_are_left_out(repo, version):
+    git(repo, 'update-index', '--index-version', str(version))
+    git(repo, 'update-index', '--skip-worktree', 'src/app/main.py')
+    paths = read_index_paths(os.path.join(repo, '.git', 'index'))
+    assert 'src/app/main.py' not in paths
+    assert paths == ls_files(repo)
+
+
+@pytest.mark.parametrize('version', [2, 3, 4])
+def test_conflicted_file_is_listed_once(repo, version):
+    git(repo, 'checkout', '-q', '-b', 'other')
+    (repo / 'z.txt').write_text("other side\n", encoding='utf-8')
+    git(repo, 'commit', '-q', '-am', 'other')
+    git(repo, 'checkout', '-q', '-')
+    (repo / 'z.txt').write_text("this side\n", encoding='utf-8')
+    git(repo, 'commit', '-q', '-am', 'this')
+    subprocess.run(['git', 'merge', '-q', 'other'], cwd=repo, env=GIT_ENV, capture_output=True) # Conflicts
+    git(repo, 'update-index', '--index-version', str(version))
+    paths = read_index_paths(os.path.join(repo, '.git', 'index'))
+    assert paths.count('z.txt') == 1
+    assert paths == ls_files(repo)
+
+
+def test_split_index_falls_back_to_ls_files(repo):
+    git(repo, 'update-index', '--split-index')
+    (repo / 'g.txt').write_text("new\n", encoding='utf-8')
+    git(repo, 'add', 'g.txt') # In the split index, everything else only in the shared one
+    with pytest.raises(GitIndexError):
+        read_index_paths(os.path.join(repo, '.git', 'index'))
+    assert list_git_files(str(repo)) == ls_files(repo)
+    assert 'g.txt' in ls_files(repo) and 'README.md' in ls_files(repo)
+
+
+def test_unsupported_index_raises(tmp_path):
+    index_path = tmp_path / 'index'
+    index_path.write_bytes(b'DIRC\0\0\0\x09\0\0\0\0' + b'\0' * 20)
+    with pytest.raises(GitIndexError):
+        read_index_paths(str(index_path))
+
+
+def test_list_git_files_relative_to_subfolder(repo):
+    (repo / 'src' / 'app' / 'new.py').write_text("untracked\n", encoding='utf-8')
+    (repo / '.gitignore').write_text("*.log\n", encoding='utf-8')
+    (repo / 'src' / 'app' / 'debug.log').write_text("ignored\n", encoding='utf-8')
+    assert list_git_files(str(repo / 'src' / 'app')) == ['__init__.py', 'main.py', 'models/user.py',
+                                                         'models/user_test.py']
+    assert list_git_files(str(repo / 'src' / 'app'), include_untracked=True)[-1] == 'new.py'
+
+
+def test_revision_helpers(repo):
+    (repo / 'src' / 'app' / 'main.py').write_text("changed\n", encoding='utf-8')
+    os.remove(repo / 'src' / 'app' / '__init__.py')
+    folder = str(repo / 'src')
+    assert revision_changes(folder, 'HEAD') == {'app/main.py': 'M', 'app/__init__.py': 'D'}
+    assert 'app/models/user.py' in revision_paths(folder, 'HEAD')
+    assert read_revision_files(folder, 'HEAD', ['app/main.py', 'app/missing.py']) == {
+        'app/main.py': b"content of src/app/main.py\n"}
@@ -0,0 +1,58 @@
+import pytest
+
+from minifiers import Minifier, minify_text
+
+# Each case: (file type, source, minified). String, template and regex literals must come through untouched.
+CASES = [
+    # Python: '#' inside strings isn't a comment, nor is it in f-strings (tokenized differently on 3.12+)
+    ('py', 'x = "a # b"  # note\n', 'x = "a # b"\n'),
+    ('py', "name = f'{value!r} # {other}'  # trailing\n", "name = f'{value!r} # {other}'\n"),
+    ('py', 'pattern = f"{a:#x}"\n', 'pattern = f"{a:#x}"\n'),
+    # A line ending inside a triple-quoted string keeps its trailing whitespace and blank lines
+    ('py', 'doc = """first   \n\n# not a comment\n  """  # comment\n\n\n',
+     'doc = """first   \n\n# not a comment\n  """\n'),
+    ('py', 'msg = f"""{a}  \n\n# {b}\n"""\n', 'msg = f"""{a}  \n\n# {b}\n"""\n'),
+    ('py', '#!/usr/bin/env python\n# comment\nx = 1\n', '#!/usr/bin/env python\nx = 1\n'),
+    # Unparseable Python (an unterminated string here) passes through unchanged from where tokenize gave up
+    ('py', 'x = 1  # ok\ns = """open  # not\n\n', 'x = 1\ns = """open  # not\n\n'),
+
+    # JavaScript: comment markers inside strings and template literals stay
+    ('js', "const s = '// not' + \"/* not */\"; // comment\n", "const s = '// not' + \"/* not */\";\n"),
+    ('js', 'const t = `http://x /* y */`; /* c */ f();\n', 'const t = `http://x /* y */`;   f();\n'),
+    ('js', 'const t = `a  \n\n// kept\n${x /* c */ + `/* n */`}`;\n',
+     'const t = `a  \n\n// kept\n${x   + `/* n */`}`;\n'),
+    # Regex literals after '=', '(' and return aren't comments
+    ('js', 'const re = /\\/\\/foo/; // c\n', 'const re = /\\/\\/foo/;\n'),
+    ('js', 'if (/[/*]/.test(s)) x(); // c\n', 'if (/[/*]/.test(s)) x();\n'),
+    ('js', 'function f() { return /\\/*x/g; }\n', 'function f() { return /\\/*x/g; }\n'),
+    # A '/' after a value divides, so the '//' after it is a comment
+    ('js', 'const half = total / 2; // half\n', 'const half = total / 2;\n'),
+    ('js', 'const r = (a) / b / c; // c\n', 'const r = (a) / b / c;\n'),
+
+    # CSS: only /* */ comments, '//' in an unquoted url stays
+    ('css', 'a { background: url(http://x/y.png); } /* c */\n/* multi\nline */\nb {}\n',
+     'a { background: url(http://x/y.png); }\nb {}\n'),
+    ('css', 'a::after { content: "/* kept */"; }\n', 'a::after { content: "/* kept */"; }\n'),
+
+    # INI: full-line comments go, inline ones may be values
+    ('ini', '; comment\n[section]\n  # comment\nkey = value ; kept\n\n', '[section]\nkey = value ; kept\n'),
+]
+
+
+@pytest.mark.parametrize('file_type, source, expected', CASES)
+def test_minify_text(file_type, source, expected):
+    assert minify_text(file_type, source) == expected
+
+
+def test_unsupported_type_is_unchanged():
+    source = '// not a comment here\n\n'
+    assert minify_text('txt', source) == source
+
+
+@pytest.mark.parametrize('file_type, source, expected', CASES)
+def test_stream_matches_whole_text(file_type, source, expected):
+    minifier = Minifier()
+    streamed = "".join(minifier.minify_stream('file.' + file_type, file_type, iter(source.splitlines(True))))
+    assert streamed == expected
+    before_bytes, after_bytes = minifier.files['file.' + file_type][:2]
+    assert (before_bytes, after_bytes) == (len(source.encode('utf-8')), len(expected.encode('utf-8')))
@@ -0,0 +1,136 @@
+import gzip
+import io
+import json
+import lzma
+import xml.etree.ElementTree as ElementTree
+
+import pytest
+
+import output_formats
+from exporter_core import write_export_bundle
+from output_formats import (
+    OUTPUT_FORMATS, PLAIN_FORMAT, BundleWriter, MarkdownFormat, available_compressions, check_compression,
+    get_output_format, index_path_for, read_indexed_block,
+)
+
+FILES = {
+    'a.py': 'print("hello")\n',
+    'docs/readme.md': 'Some ```code``` and ``ticks``\n````\n',
+    'odd <name> & "q".txt': 'line one\n<tag attr="x">&amp;</tag>\ttab\n',
+    'unicode.txt': 'héllo wörld ✓ \U0001F600\n',
+    'empty.txt': '',
+}
+
+
+@pytest.fixture
+def folder(tmp_path):
+    root = tmp_path / 'project'
+    for relative_path, content in FILES.items():
+        path = root / relative_path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content, encoding='utf-8')
+    return root
+
+
+def decompress(data, compression):
+    if compression == 'gzip':
+        return gzip.decompress(data)
+    if compression == 'xz':
+        return lzma.decompress(data)
+    if compression == 'zstd':
+        return output_formats.zstandard.ZstdDecompressor().stream_reader(io.BytesIO(data), read_across_frames=True).read()
+    return data
+
+
+def test_get_output_format():
+    assert get_output_format('') is PLAIN_FORMAT
+    assert get_output_format(' Markdown ').name == 'markdown'
+    with pytest.raises(ValueError):
+        get_output_format('yaml')
+
+
+def test_check_compression():
+    assert check_compression(None) is None
+    assert check_compression('none') is None
+    assert check_compression(' GZIP ') == 'gzip'
+    with pytest.raises(ValueError):
+        check_compression('bzip2')
+
+
+def test_markdown_fence_is_longer_than_any_backtick_run():
+    markdown = MarkdownFormat()
+    block = markdown.render_block('x.md', 'a ```` b')
+    assert block.startswith('## x.md\n\n`````md\n')
+    assert block.endswith('\n`````\n\n')
+    # A run split across streamed chunks counts as one
+    scan = None
+    for chunk in ('a ``', '`', '`` b', '``'):
+        scan = markdown.scan_chunk(chunk, scan)
+    assert scan == (5, 2)
+
+
+def test_jsonl_blocks_are_json():
+    jsonl = get_output_format('jsonl')
+    for relative_path, content in FILES.items():
+        assert json.loads(jsonl.render_block(relative_path, content)) == {'path': relative_path, 'content': content}
+
+
+def test_xml_document_parses(folder, tmp_path):
+    output_path = tmp_path / 'out.xml'
+    write_export_bundle(str(folder), sorted(FILES), str(output_path), workers=1,
+                        output_format=get_output_format('xml'))
+    root = ElementTree.parse(output_path).getroot()
+    assert [(element.get('path'), element.text.strip('\n')) for element in root] == [
+        (relative_path, FILES[relative_path].strip('\n')) for relative_path in sorted(FILES)]
+
+
+@pytest.mark.parametrize('compression', available_compressions())
+@pytest.mark.parametrize('format_name', sorted(OUTPUT_FORMATS))
+def test_indexed_round_trip(folder, tmp_path, monkeypatch, format_name, compression):
+    monkeypatch.setattr(output_formats, 'COMPRESS_MEMBER_BYTES', 64) # Several members, blocks spanning them
+    compression = check_compression(compression)
+    output_format = get_output_format(format_name)
+    output_path = tmp_path / ('out' + output_format.extension)
+    relative_paths = sorted(FILES)
+    exported_count, errors, committed = write_export_bundle(
+        str(folder), relative_paths, str(output_path), workers=2, output_format=output_format,
+        compression=compression, write_index=True)
+    assert (exported_count, errors, committed) == (len(FILES), [], True)
+
+    expected = (output_format.document_start()
+                + "".join(output_format.render_block(p, FILES[p]) for p in relative_paths)
+                + output_format.document_end())
+    assert decompress(output_path.read_bytes(), compression).decode('utf-8') == expected
+
+    index_path = index_path_for(str(output_path))
+    with open(index_path, encoding='utf-8') as f:
+        index = json.load(f)
+    assert index['format'] == format_name
+    assert [entry['path'] for entry in index['files']] == relative_paths
+    for relative_path in relative_paths:
+        assert read_indexed_block(index_path, relative_path) == output_format.render_block(relative_path,
+                                                                                           FILES[relative_path])
+    with pytest.raises(KeyError):
+        read_indexed_block(index_path, 'missing.txt')
+
+
+def test_export_without_index_removes_a_stale_one(folder, tmp_path):
+    output_path = tmp_path / 'out.txt'
+    write_export_bundle(str(folder), ['a.py'], str(output_path), workers=1, write_index=True)
+    assert (tmp_path / 'out.txt.index.json').exists()
+    write_export_bundle(str(folder), ['a.py'], str(output_path), workers=1)
+    assert not (tmp_path / 'out.txt.index.json').exists()
+
+
+@pytest.mark.parametrize('compression', [None, 'gzip', 'xz'])
+def test_bundle_writer_rollback_drops_a_partial_block(compression):
+    raw = io.BytesIO()
+    writer = BundleWriter(raw, compression)
+    writer.write("kept\n")
+    mark = writer.mark()
+    writer.write("dropped\n")
+    writer.rollback(mark)
+    writer.write("after\n")
+    writer.close()
+    assert writer.offset == len("kept\nafter\n")
+    assert decompress(raw.getvalue(), compression) == b"kept\nafter\n"
@@ -0,0 +1,100 @@
+import re
+
+import pytest
+
+from path_matcher import ExclusionMatcher, glob_to_regex, is_glob
+
+
+@pytest.mark.parametrize('pattern, path, matches', [
+    ('*.js', 'app.js', True),
+    ('*.js', 'src/app.js', False), # '*' stays inside one component
+    ('src/*.js', 'src/app.js', True),
+    ('src/*.js', 'src/lib/app.js', False),
+    ('file?.txt', 'file1.txt', True),
+    ('file?.txt', 'file10.txt', False),
+    ('?', '/', False),
+    ('**/generated', 'generated', True), # '**/' is zero or more directories
+    ('**/generated', 'a/b/generated', True),
+    ('**/generated', 'a/generated/b', False),
+    ('build/**', 'build', True), # '/**' at the end is everything below, and the directory itself
+    ('build/**', 'build/a/b.o', True),
+    ('build/**', 'builder/a', False),
+    ('a/**/z', 'a/z', True),
+    ('a/**/z', 'a/b/c/z', True),
+    ('**/generated/**', 'x/generated/y/z.py', True),
+    ('lib**', 'lib/deep/file', True),
+    ('[abc].py', 'b.py', True),
+    ('[abc].py', 'd.py', False),
+    ('[!abc].py', 'd.py', True),
+    ('[!abc].py', 'a.py', False),
+    ('[a-c]x', 'bx', True),
+    ('[unclosed', '[unclosed', True), # A '[' without ']' is literal
+    ('a.b', 'axb', False), # Other characters are literal
+    ('(x)+', '(x)+', True),
+])
+def test_glob_to_regex(pattern, path, matches):
+    assert bool(re.fullmatch(glob_to_regex(pattern), path)) == matches
+
+
+def test_is_glob():
+    assert is_glob('*.log') and is_glob('file?') and is_glob('[ab]')
+    assert not is_glob('node_modules') and not is_glob('src/main.py')
+
+
+def test_blacklist_literal_paths_are_root_relative():
+    matcher = ExclusionMatcher(blacklist=['build', '\\src\\gen\\'])
+    assert matcher.excludes_dir('build', 'build')
+    assert not matcher.excludes_dir('src/build', 'build')
+    assert matcher.excludes_dir('src/gen', 'gen') # Backslashes and surrounding slashes are normalized
+    assert matcher.excludes_file('build', 'build')
+    assert matcher.excludes_path('build/out/a.o') # Everything below, for paths not from a walk
+    assert not matcher.excludes_path('builder/a.o')
+
+
+def test_globs_without_slash_match_names_at_any_depth():
+    matcher = ExclusionMatcher(blacklist=['*.min.js'], exclude_strings=['__pycache__*'])
+    assert matcher.excludes_file('app.min.js', 'app.min.js')
+    assert matcher.excludes_file('static/js/app.min.js', 'app.min.js')
+    assert not matcher.excludes_file('static/js/app.js', 'app.js')
+    assert matcher.excludes_dir('pkg/__pycache__', '__pycache__')
+    assert matcher.excludes_path('pkg/__pycache__/mod.pyc')
+
+
+def test_globs_with_slash_match_the_whole_path():
+    matcher = ExclusionMatcher(blacklist=['docs/*.md'], exclude_strings=['**/generated/**'])
+    assert matcher.excludes_file('docs/index.md', 'index.md')
+    assert not matcher.excludes_file('docs/api/index.md', 'index.md')
+    assert not matcher.excludes_file('index.md', 'index.md')
+    assert matcher.excludes_dir('generated', 'generated')
+    assert matcher.excludes_dir('src/generated', 'generated')
+    assert matcher.excludes_path('src/generated/models.py')
+    assert not matcher.excludes_path('src/generator.py')
+
+
+def test_exclude_strings_without_glob_characters_are_substrings():
+    matcher = ExclusionMatcher(exclude_strings=['test', 'testing_long', ''])
+    assert matcher.excludes_file('src/my_tests.py', 'my_tests.py')
+    assert matcher.excludes_dir('testing_long', 'testing_long')
+    assert matcher.excludes_dir('a/test', 'test')
+    assert not matcher.excludes_file('src/main.py', 'main.py')
+
+
+@pytest.mark.parametrize('name, excluded', [
+    ('app.LOG', True),
+    ('archive.tar.gz', True),
+    ('.log', False), # A dotfile has no extension
+    ('..log', False),
+    ('log', False),
+    ('app.log.txt', False),
+    ('.hidden.log', True),
+])
+def test_extensions(name, excluded):
+    matcher = ExclusionMatcher(exclude_extensions=['.log', 'GZ'])
+    assert matcher.excludes_file(name, name) == excluded
+    assert not matcher.excludes_dir(name, name) # Extensions never exclude directories
+
+
+def test_empty_matcher_excludes_nothing():
+    matcher = ExclusionMatcher(blacklist=['', '/'])
+    assert not matcher.excludes_dir('a', 'a')
+    assert not matcher.excludes_path('a/b/c.txt')
@@ -0,0 +1,86 @@
+import pytest
+
+from file_probe import KIND_BINARY, KIND_TEXT, KIND_TOO_LARGE
+from selection_model import FileStore
+
+RECORDS = [
+    ('README.md', False, 120, KIND_TEXT),
+    ('src/main.py', True, 300, KIND_TEXT),
+    ('src/util.py', False, None, None), # Not estimated or probed yet
+    ('src/logo.png', False, 50, KIND_BINARY),
+    ('src/pkg/mod.py', True, 80, KIND_TEXT),
+    ('data/dump.sql', True, None, KIND_TOO_LARGE), # Ticked one by one, flagged anyway
+    ('srcfile.txt', False, 10, KIND_TEXT),
+]
+
+
+@pytest.fixture
+def store():
+    return FileStore(RECORDS)
+
+
+def test_columns_round_trip(store):
+    assert len(store) == len(RECORDS)
+    for position, (relative_path, selected, tokens, kind) in enumerate(RECORDS):
+        assert store.path(position) == relative_path
+        assert store.is_selected(position) == selected
+        assert store.tokens_at(position) == tokens
+        assert store.kind(position) == kind
+
+
+def test_whole_list_queries(store):
+    assert store.selected_paths() == ['src/main.py', 'src/pkg/mod.py', 'data/dump.sql']
+    assert store.selected_count() == 3
+    assert store.selected_tokens() == 380 # Files without an estimate count as nothing
+    assert store.flagged_count() == 2
+    assert store.file_types() == {'md', 'py', 'png', 'sql', 'txt'}
+
+
+def test_select_all_leaves_flagged_files_alone(store):
+    store.select_all()
+    assert store.selected_paths() == ['README.md', 'src/main.py', 'src/util.py', 'src/pkg/mod.py', 'data/dump.sql',
+                                      'srcfile.txt']
+    store.clear()
+    assert store.selected_count() == 0
+    assert len(store.selected) == len(store)
+
+
+def test_invert_unticks_selected_flagged_files(store):
+    store.invert()
+    assert store.selected_paths() == ['README.md', 'src/util.py', 'srcfile.txt']
+    store.invert()
+    assert store.selected_paths() == ['src/main.py', 'src/pkg/mod.py']
+
+
+def test_set_positions_never_ticks_flagged_files(store):
+    store.clear()
+    store.set_positions(range(len(store)), True)
+    assert store.selected_paths() == ['README.md', 'src/main.py', 'src/util.py', 'src/pkg/mod.py', 'srcfile.txt']
+    store.set_selected(3, True) # One by one it can be ticked
+    assert store.is_selected(3)
+    store.set_positions([1, 3], False)
+    assert store.selected_paths() == ['README.md', 'src/util.py', 'src/pkg/mod.py', 'srcfile.txt']
+
+
+def test_select_type(store):
+    store.clear()
+    store.select_type('py')
+    assert store.selected_paths() == ['src/main.py', 'src/util.py', 'src/pkg/mod.py']
+    store.select_type('png')
+    assert store.selected_count() == 3
+    store.select_type('*')
+    assert store.selected_count() == 5
+
+
+def test_positions_under(store):
+    assert store.positions_under('src') == [1, 2, 3, 4] # Not srcfile.txt
+    assert store.positions_under('/src/pkg/') == [4]
+    assert store.positions_under('missing') == []
+
+
+def test_extend_keeps_positions_and_search_in_step(store):
+    store.extend([('src/new.py', True, 5, KIND_TEXT)])
+    assert store.path(len(store) - 1) == 'src/new.py'
+    assert store.selected_paths()[-1] == 'src/new.py'
+    assert store.index.search('substring', 'new.py') == [len(store) - 1]
+    assert list(store.type_positions['py']) == [1, 2, 4, 7]
@@ -0,0 +1,202 @@
+import itertools
+import json
+import os
+
+import pytest
+
+import exporter_core
+from exporter_core import render_file_block, write_export_bundle
+from output_formats import index_path_for
+from shard_export import (
+    LIMIT_BYTES, LIMIT_TOKENS, MIN_SHARD_BYTES, ShardLimit, _iter_content_parts, manifest_path_for, parse_shard_limit,
+    read_manifest_block, remove_sharded_layout, shard_path, write_sharded_export,
+)
+
+
+@pytest.mark.parametrize('text, parsed', [
+    ('', None),
+    ('20MB', (LIMIT_BYTES, 20 * 1024 * 1024)),
+    ('512 KB', (LIMIT_BYTES, 512 * 1024)),
+    ('1.5kb', (LIMIT_BYTES, 1536)),
+    ('100k tokens', (LIMIT_TOKENS, 100000)),
+    ('2,000 token', (LIMIT_TOKENS, 2000)),
+])
+def test_parse_shard_limit(text, parsed):
+    assert parse_shard_limit(text) == parsed
+
+
+@pytest.mark.parametrize('text', ['20', '20 MiB', 'lots', '0KB', '20B', '10 tokens'])
+def test_parse_shard_limit_rejects(text):
+    with pytest.raises(ValueError):
+        parse_shard_limit(text)
+
+
+def test_shard_limit_needs_room_for_a_part():
+    ShardLimit(LIMIT_BYTES, MIN_SHARD_BYTES)
+    with pytest.raises(ValueError):
+        ShardLimit(LIMIT_BYTES, MIN_SHARD_BYTES - 1)
+    with pytest.raises(ValueError):
+        ShardLimit(LIMIT_TOKENS, 30, bytes_per_token=2.0)
+
+
+@pytest.mark.parametrize('chunks, budget, parts', [
+    (['é' * 5], 1, ['é'] * 5), # Budget smaller than a character: one character per part
+    (['a\U0001F600b'], 3, ['a', '\U0001F600', 'b']),
+    (['\U0001F600' * 2, '✓'], 5, ['\U0001F600', '\U0001F600', '✓']),
+    (['ab\ncdef'], 4, ['ab\n', 'cdef']),
+    ([''], 4, ['']),
+])
+def test_content_parts_never_split_a_character(chunks, budget, parts):
+    # islice so a regression fails instead of hanging
+    pieces = list(itertools.islice(_iter_content_parts(chunks, budget), 100))
+    assert [piece.decode('utf-8') for piece in pieces] == parts
+
+
+def test_multibyte_file_at_the_smallest_limit(tmp_path):
+    folder = tmp_path / 'project'
+    content = 'héllo wörld \U0001F600\n' * 3
+    relative_paths = make_files(folder, {'a.txt': content})
+    output_path = tmp_path / 'bundle.txt'
+    exported_count, errors, committed, manifest_path = write_sharded_export(
+        str(folder), relative_paths, str(output_path), ShardLimit(*parse_shard_limit(f'{MIN_SHARD_BYTES}B')), workers=1)
+    assert (exported_count, errors, committed) == (1, [], True)
+    text = read_manifest_block(manifest_path, 'a.txt')
+    pieces = []
+    for entry in read_manifest(output_path)['files']:
+        header = f"-- BEGIN FILE: a.txt (part {entry['part']}) --\n"
+        footer = f"\n-- END FILE: a.txt (part {entry['part']}) --\n\n"
+        assert text.startswith(header)
+        end = text.index(footer)
+        pieces.append(text[len(header):end])
+        text = text[end + len(footer):]
+    assert "".join(pieces) == content
+
+
+def test_paths():
+    assert shard_path('/out/bundle.txt', 7) == '/out/bundle.part007.txt'
+    assert manifest_path_for('/out/bundle.txt') == '/out/bundle.manifest.json'
+
+
+def make_files(folder, files):
+    for relative_path, content in files.items():
+        path = folder / relative_path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content, encoding='utf-8')
+    return sorted(files)
+
+
+def read_manifest(output_path):
+    with open(manifest_path_for(str(output_path)), encoding='utf-8') as f:
+        return json.load(f)
+
+
+def test_blocks_fill_shards_in_order(tmp_path):
+    folder = tmp_path / 'project'
+    files = {f'f{i}.txt': f'file {i}\n' * 20 for i in range(10)}
+    relative_paths = make_files(folder, files)
+    block_bytes = len(render_file_block('f0.txt', files['f0.txt']).encode('utf-8'))
+    output_path = tmp_path / 'out' / 'bundle.txt'
+    output_path.parent.mkdir()
+    limit = ShardLimit(LIMIT_BYTES, block_bytes * 3)
+    exported_count, errors, committed, manifest_path = write_sharded_export(str(folder), relative_paths,
+                                                                            str(output_path), limit, workers=2)
+    assert (exported_count, errors, committed) == (10, [], True)
+    assert manifest_path == manifest_path_for(str(output_path))
+
+    manifest = read_manifest(output_path)
+    assert [shard['path'] for shard in manifest['shards']] == [f'bundle.part{n:03d}.txt' for n in (1, 2, 3, 4)]
+    assert [shard['blocks'] for shard in manifest['shards']] == [3, 3, 3, 1]
+    assert [entry['path'] for entry in manifest['files']] == relative_paths
+    for shard in manifest['shards']:
+        assert os.path.getsize(output_path.parent / shard['path']) == shard['bytes'] <= limit.value
+    # The shards concatenated are the unsharded bundle
+    joined = "".join((output_path.parent / shard['path']).read_text(encoding='utf-8') for shard in manifest['shards'])
+    assert joined == "".join(render_file_block(p, files[p]) for p in relative_paths)
+    for relative_path in relative_paths:
+        assert read_manifest_block(manifest_path, relative_path) == render_file_block(relative_path,
+                                                                                              files[relative_path])
+
+
+@pytest.mark.parametrize('streamed', [False, True])
+def test_a_file_bigger_than_a_shard_is_split_into_parts(tmp_path, monkeypatch, streamed):
+    if streamed:
+        monkeypatch.setattr(exporter_core, 'EXPORT_PREFETCH_MAX_BYTES', 0) # The writer reads it in chunks
+    folder = tmp_path / 'project'
+    content = "".join(f"line {i} with ünïcode ✓\n" for i in range(400))
+    relative_paths = make_files(folder, {'big.txt': content, 'small.txt': 'small\n'})
+    output_path = tmp_path / 'bundle.txt'
+    limit = ShardLimit(LIMIT_BYTES, 1024)
+    exported_count, errors, committed, manifest_path = write_sharded_export(str(folder), relative_paths,
+                                                                            str(output_path), limit, workers=1)
+    assert (exported_count, errors, committed) == (2, [], True)
+
+    manifest = read_manifest(output_path)
+    parts = [entry for entry in manifest['files'] if entry['path'] == 'big.txt']
+    assert len(parts) > 1
+    assert [entry['part'] for entry in parts] == list(range(1, len(parts) + 1))
+    assert all(entry['parts'] == len(parts) for entry in parts)
+    assert all(shard['bytes'] <= limit.value for shard in manifest['shards'])
+
+    text = read_manifest_block(manifest_path, 'big.txt')
+    pieces = []
+    for part_number in range(1, len(parts) + 1):
+        header = f"-- BEGIN FILE: big.txt (part {part_number}) --\n"
+        footer = f"\n-- END FILE: big.txt (part {part_number}) --\n\n"
+        assert text.startswith(header)
+        end = text.index(footer)
+        pieces.append(text[len(header):end])
+        text = text[end + len(footer):]
+    assert text == ""
+    assert "".join(pieces) == content
+    assert all(piece.endswith('\n') for piece in pieces[:-1]) # Cut after a newline where there is one
+
+
+def test_token_limit(tmp_path):
+    folder = tmp_path / 'project'
+    relative_paths = make_files(folder, {f'f{i}.txt': 'x' * 400 for i in range(4)})
+    output_path = tmp_path / 'bundle.txt'
+    # Each block is a bit over 100 tokens at 4 bytes per token, so two never share a shard
+    write_sharded_export(str(folder), relative_paths, str(output_path), ShardLimit(LIMIT_TOKENS, 150), workers=1)
+    assert [shard['blocks'] for shard in read_manifest(output_path)['shards']] == [1, 1, 1, 1]
+
+
+def test_fewer_shards_remove_the_stale_ones(tmp_path):
+    folder = tmp_path / 'project'
+    relative_paths = make_files(folder, {f'f{i}.txt': 'x' * 400 for i in range(4)})
+    output_path = tmp_path / 'bundle.txt'
+    write_sharded_export(str(folder), relative_paths, str(output_path), ShardLimit(LIMIT_BYTES, 500), workers=1)
+    assert os.path.exists(shard_path(str(output_path), 4))
+    write_sharded_export(str(folder), relative_paths[:2], str(output_path), ShardLimit(LIMIT_BYTES, 500), workers=1)
+    assert os.path.exists(shard_path(str(output_path), 2))
+    assert not os.path.exists(shard_path(str(output_path), 3))
+    assert not os.path.exists(shard_path(str(output_path), 4))
+
+
+def test_should_commit_false_leaves_nothing(tmp_path):
+    folder = tmp_path / 'project'
+    relative_paths = make_files(folder, {'a.txt': 'a\n'})
+    output_path = tmp_path / 'bundle.txt'
+    result = write_sharded_export(str(folder), relative_paths + ['missing.txt'], str(output_path),
+                                  ShardLimit(LIMIT_BYTES, 1024), workers=1, should_commit=lambda count, errors: not errors)
+    assert result[0] == 1 and len(result[1]) == 1 and result[2:] == (False, None)
+    assert sorted(os.listdir(tmp_path)) == ['project']
+
+
+def test_switching_layouts_removes_the_other_ones_files(tmp_path):
+    folder = tmp_path / 'project'
+    relative_paths = make_files(folder, {f'f{i}.txt': 'x' * 400 for i in range(3)})
+    output_path = tmp_path / 'out' / 'bundle.txt'
+    output_path.parent.mkdir()
+    write_export_bundle(str(folder), relative_paths, str(output_path), workers=1, write_index=True)
+    assert sorted(os.listdir(output_path.parent)) == ['bundle.txt', 'bundle.txt.index.json']
+
+    write_sharded_export(str(folder), relative_paths, str(output_path), ShardLimit(LIMIT_BYTES, 500), workers=1)
+    assert sorted(os.listdir(output_path.parent)) == ['bundle.manifest.json', 'bundle.part001.txt',
+                                                      'bundle.part002.txt', 'bundle.part003.txt']
+
+    # What the CLI and the UI do after a single-file export
+    _count, _errors, committed = write_export_bundle(str(folder), relative_paths, str(output_path), workers=1)
+    assert committed
+    remove_sharded_layout(str(output_path))
+    assert sorted(os.listdir(output_path.parent)) == ['bundle.txt']
+    assert not os.path.exists(index_path_for(str(output_path)))
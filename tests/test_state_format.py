@@ -0,0 +1,96 @@
+import gzip
+import json
+
+import pytest
+
+from exporter_core import STATE_VERSION, build_state_data, read_state_file, state_file_lists, write_state_file
+from state_format import (
+    GZIP_MAGIC, decode_path_tree, decode_selection, diff_file_lists, encode_path_tree, encode_selection,
+)
+
+# os.walk order: a directory's files together, subdirectories after; 'docs' is both a file and a folder name
+WALK_ORDER = [
+    'README.md',
+    'docs',
+    'src/main.py',
+    'src/util.py',
+    'src/pkg/__init__.py',
+    'src/pkg/mod.py',
+    'docs/index.md',
+    'z/y/x/deep.txt',
+]
+
+
+def state_data(selected):
+    return build_state_data('/project', '/project/out.txt', 'node_modules', '.log', '*', WALK_ORDER, selected)
+
+
+@pytest.mark.parametrize('compress', [False, True])
+@pytest.mark.parametrize('selected', [
+    set(),
+    set(WALK_ORDER),
+    {'README.md'},
+    {'src/util.py', 'src/pkg/mod.py', 'z/y/x/deep.txt'},
+    {'docs', 'not/analyzed.py'}, # Selected but not in the tree: kept as extra_selected_files
+])
+def test_v2_round_trip(tmp_path, compress, selected):
+    state_path = tmp_path / 'project.llmexport'
+    write_state_file(str(state_path), state_data(selected), compress=compress)
+    assert state_path.read_bytes().startswith(GZIP_MAGIC) == compress
+    loaded = read_state_file(str(state_path))
+    assert loaded['version'] == STATE_VERSION == 2
+    assert loaded['analysis']['file_count'] == len(WALK_ORDER)
+    assert state_file_lists(loaded) == (WALK_ORDER, selected)
+
+
+def test_gzip_file_holds_the_plain_json(tmp_path):
+    plain_path = tmp_path / 'plain.llmexport'
+    gzip_path = tmp_path / 'compressed.llmexport'
+    write_state_file(str(plain_path), state_data({'README.md'}))
+    write_state_file(str(gzip_path), state_data({'README.md'}), compress=True)
+    assert gzip.decompress(gzip_path.read_bytes()) == plain_path.read_bytes()
+
+
+def test_corrupt_gzip_raises_value_error(tmp_path):
+    state_path = tmp_path / 'broken.llmexport'
+    state_path.write_bytes(GZIP_MAGIC + b'not really gzip')
+    with pytest.raises(ValueError):
+        read_state_file(str(state_path))
+
+
+def test_v1_state_still_loads(tmp_path):
+    state_path = tmp_path / 'old.llmexport'
+    state_path.write_text(json.dumps({
+        'version': 1,
+        'analysis': {'analyzed_files': ['a.py', 7, 'b/c.py'], 'selected_files': ['b/c.py', None]},
+    }), encoding='utf-8')
+    assert state_file_lists(read_state_file(str(state_path))) == (['a.py', 'b/c.py'], {'b/c.py'})
+
+
+def test_path_tree_writes_each_directory_once():
+    tree, ordered_paths = encode_path_tree(['a/b/one.py', 'a/b/two.py', 'a/three.py', 'a/b/one.py'])
+    assert tree == [['a', [['b', ['one.py', 'two.py']], 'three.py']]]
+    assert ordered_paths == ['a/b/one.py', 'a/b/two.py', 'a/three.py']
+    assert decode_path_tree(tree) == ordered_paths
+
+
+@pytest.mark.parametrize('selected, runs', [
+    (set(), []),
+    ({'a'}, [0, 1]),
+    ({'b', 'c'}, [1, 2]),
+    ({'a', 'd'}, [0, 1, 2, 1]),
+])
+def test_selection_runs(selected, runs):
+    ordered_paths = ['a', 'b', 'c', 'd']
+    assert encode_selection(ordered_paths, selected) == runs
+    assert decode_selection(ordered_paths, runs) == selected
+
+
+def test_malformed_lists_are_dropped():
+    assert state_file_lists({'analysis': {'file_tree': [['dir']], 'selected_runs': []}}) == ([], set())
+    assert state_file_lists({'analysis': {'file_tree': ['a'], 'selected_runs': [-1]}}) == ([], set())
+
+
+def test_diff_file_lists():
+    diff = diff_file_lists(['a', 'b', 'c'], {'b', 'c'}, ['c', 'd'])
+    assert diff == {'added': ['d'], 'removed': ['a', 'b'], 'removed_selected': ['b'], 'selected_present': 1}
@@ -0,0 +1,112 @@
+import itertools
+import os
+
+import pytest
+
+from token_budget import (
+    DEFAULT_PRIORITY, PriorityRules, TokenEstimator, _best_subset, format_token_count, load_tokenizer, pack_to_budget,
+    select_within_budget,
+)
+
+
+def word_count(text):
+    return len(text.split())
+
+
+@pytest.mark.parametrize('tokens, text', [
+    (None, ''), (0, '~0'), (999, '~999'), (1000, '~1.0k'), (12345, '~12.3k'), (2500000, '~2.5M'),
+])
+def test_format_token_count(tokens, text):
+    assert format_token_count(tokens) == text
+
+
+def test_load_tokenizer():
+    assert load_tokenizer('') is None
+    assert load_tokenizer('os.path:basename')('a/b') == 'b'
+    for spec in ('no_colon', ':count', 'module:'):
+        with pytest.raises(ValueError):
+            load_tokenizer(spec)
+    with pytest.raises(ValueError):
+        load_tokenizer('os:sep') # Not callable
+
+
+def test_heuristic_includes_the_framing():
+    estimator = TokenEstimator(bytes_per_token=4.0)
+    framing = len(TokenEstimator.framing_text('a.py'))
+    assert estimator.heuristic('a.py', 100) == -(-(100 + framing) // 4)
+
+
+def test_estimate_is_cached_until_the_file_changes(tmp_path):
+    (tmp_path / 'a.txt').write_text('one two three')
+    estimator = TokenEstimator(tokenizer=word_count)
+    framing = word_count(TokenEstimator.framing_text('a.txt'))
+    assert estimator.estimate(str(tmp_path), 'a.txt') == 3 + framing
+    st = os.stat(tmp_path / 'a.txt')
+    (tmp_path / 'a.txt').write_text('four five six seven')
+    os.utime(tmp_path / 'a.txt', ns=(st.st_atime_ns, st.st_mtime_ns))
+    # Same (size, mtime_ns) as what was counted: the cached count is trusted
+    assert estimator.estimate(str(tmp_path), 'a.txt', stat=(st.st_size, st.st_mtime_ns)) == 3 + framing
+    os.utime(tmp_path / 'a.txt', ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+    assert estimator.estimate(str(tmp_path), 'a.txt') == 4 + framing
+
+
+def test_estimate_refuses_what_the_export_refuses(tmp_path):
+    (tmp_path / 'big.txt').write_text('x' * 100)
+    (tmp_path / 'bin.dat').write_bytes(b'\x00\x01\x02' * 100)
+    with pytest.raises(ValueError):
+        TokenEstimator(max_file_bytes=10).estimate(str(tmp_path), 'big.txt')
+    with pytest.raises(ValueError):
+        TokenEstimator(tokenizer=word_count).estimate(str(tmp_path), 'bin.dat')
+
+
+def test_priority_rules():
+    rules = PriorityRules('src/**=3, *.md=0, docs/*=2.5')
+    assert rules.priority_of('src/deep/main.py') == 3
+    assert rules.priority_of('src/README.md') == 3 # First match wins
+    assert rules.priority_of('notes/README.md') == 0 # No '/': the name at any depth
+    assert rules.priority_of('docs/guide.txt') == 2.5
+    assert rules.priority_of('docs/api/guide.txt') == DEFAULT_PRIORITY
+    assert PriorityRules('').priority_of('x') == DEFAULT_PRIORITY
+    for raw in ('src/**', '=3', '*.md=high'):
+        with pytest.raises(ValueError):
+            PriorityRules(raw)
+
+
+@pytest.mark.parametrize('weights, capacity', [
+    ([5, 9, 3, 7, 2], 10),
+    ([5, 9, 3, 7, 2], 100),
+    ([11, 12, 13], 10),
+    ([4, 4, 4, 0], 8),
+    ([3, 34, 4, 12, 5, 2], 9),
+])
+def test_best_subset_is_optimal_for_small_weights(weights, capacity):
+    chosen = _best_subset(weights, capacity)
+    best = max(sum(combination) for r in range(len(weights) + 1)
+               for combination in itertools.combinations(weights, r) if sum(combination) <= capacity)
+    assert sum(weights[i] for i in chosen) == best
+    assert len(set(chosen)) == len(chosen)
+
+
+def test_best_subset_never_exceeds_a_scaled_capacity():
+    weights = [1234567, 7654321, 3333333, 999999, 5000001]
+    chosen = _best_subset(weights, 9000000)
+    assert sum(weights[i] for i in chosen) <= 9000000
+
+
+def test_pack_to_budget_takes_tiers_in_priority_order():
+    candidates = [('low.txt', 50, 0), ('a.py', 60, 2), ('b.py', 30, 2), ('c.md', 20, 1), ('d.md', 50, 1)]
+    chosen, used, skipped = pack_to_budget(candidates, 120)
+    # Priority 2 fits whole (90), then the best of priority 1 in the 30 left (c.md), nothing left for priority 0
+    assert chosen == ['a.py', 'b.py', 'c.md']
+    assert used == 110
+    assert skipped == ['low.txt', 'd.md']
+
+
+def test_select_within_budget_keeps_unreadable_files(tmp_path):
+    (tmp_path / 'a.txt').write_text('x' * 400)
+    estimator = TokenEstimator(bytes_per_token=4.0)
+    chosen, used, skipped = select_within_budget(str(tmp_path), ['a.txt', 'missing.txt'], 10, estimator,
+                                                 PriorityRules(''))
+    assert chosen == ['missing.txt'] # Counts as 0 tokens, so the export reports it as a read error
+    assert skipped == ['a.txt']
+    assert used == 0
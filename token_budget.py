@@ -0,0 +1,214 @@
+"""Token estimates per file and packing a selection into a token budget."""
+import importlib
+import math
+import os
+import re
+import threading
+
+from file_probe import DEFAULT_MAX_FILE_BYTES, KIND_BINARY, PROBE_BYTES, sniff_bytes
+from path_matcher import glob_to_regex
+
+BYTES_PER_TOKEN = 4.0 # Rough average for source code with common BPE tokenizers
+DEFAULT_PRIORITY = 1
+PACK_MAX_BUCKETS = 4096 # Token resolution of the exact subset search
+PACK_EXACT_MAX_ITEMS = 20000 # Bigger tiers fall back to smallest-first filling
+
+
+def load_tokenizer(spec):
+    """Returns a count(text) -> int callable for spec, or None for an empty spec.
+
+    'tiktoken:<encoding>' uses the optional tiktoken package, 'module:function' imports any
+    function that takes a string and returns a token count. Raises ImportError/ValueError.
+    """
+    spec = (spec or '').strip()
+    if not spec:
+        return None
+    module_name, sep, attribute = spec.partition(':')
+    if not sep or not module_name or not attribute:
+        raise ValueError(f"Tokenizer must look like 'tiktoken:<encoding>' or 'module:function', got {spec!r}")
+    if module_name == 'tiktoken':
+        import tiktoken
+        encoding = tiktoken.get_encoding(attribute)
+        return lambda text: len(encoding.encode(text, disallowed_special=()))
+    count = getattr(importlib.import_module(module_name), attribute)
+    if not callable(count):
+        raise ValueError(f"{spec} is not callable")
+    return count
+
+
+def format_token_count(tokens):
+    if tokens is None:
+        return ""
+    if tokens < 1000:
+        return f"~{tokens}"
+    if tokens < 1000000:
+        return f"~{tokens / 1000:.1f}k"
+    return f"~{tokens / 1000000:.1f}M"
+
+
+class TokenEstimator:
+    """Estimates the tokens a file adds to the bundle, including its BEGIN/END framing.
+
+    Without a tokenizer the estimate is size / bytes_per_token and needs no read. With one, the
+    file is read and counted. Results are cached by path and keyed on (size, mtime_ns), so a
+    file is only recounted after it changes. Files the export would refuse (over max_file_bytes,
+    or binary when a tokenizer has to read them) raise ValueError instead. Safe to share between threads.
+    """
+
+    def __init__(self, tokenizer=None, bytes_per_token=BYTES_PER_TOKEN, max_file_bytes=DEFAULT_MAX_FILE_BYTES):
+        self.tokenizer = tokenizer
+        self.bytes_per_token = bytes_per_token
+        self.max_file_bytes = max_file_bytes
+        self.cache = {} # relative_path -> ((size, mtime_ns), tokens)
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def framing_text(relative_path):
+        return f"-- BEGIN FILE: {relative_path} --\n\n-- END FILE: {relative_path} --\n\n"
+
+    def heuristic(self, relative_path, size):
+        """Size-only estimate, used for the file list where reading every file would be too slow."""
+        return math.ceil((size + len(self.framing_text(relative_path))) / self.bytes_per_token)
+
+    def estimate(self, folder, relative_path, stat=None):
+        """Tokens for one file; stat is an optional (size, mtime_ns) tuple to skip the os.stat. Raises OSError/ValueError."""
+        if stat is None:
+            st = os.stat(os.path.join(folder, relative_path))
+            stat = (st.st_size, st.st_mtime_ns)
+        with self.lock:
+            cached = self.cache.get(relative_path)
+        if cached is not None and cached[0] == stat:
+            return cached[1]
+        if self.max_file_bytes is not None and stat[0] > self.max_file_bytes:
+            raise ValueError(f"{relative_path} is over the {self.max_file_bytes} byte limit")
+
+        if self.tokenizer is None:
+            tokens = self.heuristic(relative_path, stat[0])
+        else:
+            with open(os.path.join(folder, relative_path), 'rb') as f:
+                head = f.read(PROBE_BYTES)
+                kind, encoding = sniff_bytes(head)
+                if kind == KIND_BINARY:
+                    raise ValueError(f"{relative_path} looks binary")
+                raw_bytes = head + f.read()
+            text = raw_bytes.decode(encoding or 'utf-8', errors='ignore').replace('\r\n', '\n').replace('\r', '\n')
+            tokens = self.tokenizer(text) + self.tokenizer(self.framing_text(relative_path))
+        with self.lock:
+            self.cache[relative_path] = (stat, tokens)
+        return tokens
+
+
+class PriorityRules:
+    """Per-file priorities from 'glob=priority' rules, e.g. 'src/**=3, *.md=0'. First match wins.
+
+    Globs without a '/' match the file name at any depth, like the exclusion globs. Files matching
+    no rule get DEFAULT_PRIORITY. Higher priorities are packed first.
+    """
+
+    def __init__(self, rules_raw=''):
+        self.rules = []
+        for rule in rules_raw.split(','):
+            rule = rule.strip()
+            if not rule:
+                continue
+            pattern, sep, priority = rule.rpartition('=')
+            if not sep or not pattern.strip():
+                raise ValueError(f"Priority rule must look like 'glob=number', got {rule!r}")
+            try:
+                priority = float(priority)
+            except ValueError:
+                raise ValueError(f"Priority in {rule!r} is not a number")
+            pattern = pattern.strip().replace('\\', '/').strip('/')
+            self.rules.append(('/' in pattern, re.compile(glob_to_regex(pattern)), priority))
+
+    def priority_of(self, relative_path):
+        name = relative_path.rpartition('/')[2]
+        for matches_path, regex, priority in self.rules:
+            if regex.fullmatch(relative_path if matches_path else name):
+                return priority
+        return DEFAULT_PRIORITY
+
+
+def _best_subset(weights, capacity):
+    """Indices of weights whose sum is as large as possible without exceeding capacity (subset sum).
+
+    Weights are scaled down to at most PACK_MAX_BUCKETS units, rounding up so the true sum never
+    exceeds capacity, and reachable sums are tracked as bits of one Python int.
+    """
+    if capacity <= 0:
+        return []
+    if len(weights) > PACK_EXACT_MAX_ITEMS:
+        chosen = []
+        for i in sorted(range(len(weights)), key=weights.__getitem__):
+            if weights[i] > capacity:
+                break
+            chosen.append(i)
+            capacity -= weights[i]
+        return chosen
+
+    scale = max(1, math.ceil(capacity / PACK_MAX_BUCKETS))
+    scaled = [math.ceil(w / scale) for w in weights]
+    scaled_capacity = capacity // scale
+    mask = (1 << (scaled_capacity + 1)) - 1
+    reachable = 1
+    history = []
+    for w in scaled:
+        history.append(reachable)
+        if w <= scaled_capacity:
+            reachable = (reachable | (reachable << w)) & mask
+
+    total = reachable.bit_length() - 1
+    chosen = []
+    for i in range(len(scaled) - 1, -1, -1):
+        if scaled[i] == 0:
+            chosen.append(i) # Free, always fits
+            continue
+        if (history[i] >> total) & 1:
+            continue # total was reachable without item i
+        chosen.append(i)
+        total -= scaled[i]
+    return chosen
+
+
+def pack_to_budget(candidates, budget):
+    """Picks the files to export from candidates, a list of (relative_path, tokens, priority).
+
+    Priority tiers are taken from highest to lowest. A tier that fits is taken whole; for the first
+    one that doesn't, the subset filling the remaining budget best is chosen, and lower tiers can
+    still use whatever is left. Returns (chosen_paths in candidate order, used_tokens, skipped_paths).
+    """
+    tiers = {}
+    for index, (_path, tokens, priority) in enumerate(candidates):
+        tiers.setdefault(priority, []).append(index)
+
+    remaining = budget
+    chosen = set()
+    for priority in sorted(tiers, reverse=True):
+        indices = tiers[priority]
+        tier_tokens = sum(candidates[i][1] for i in indices)
+        if tier_tokens <= remaining:
+            picked = indices
+        else:
+            picked = [indices[i] for i in _best_subset([candidates[i][1] for i in indices], remaining)]
+        chosen.update(picked)
+        remaining -= sum(candidates[i][1] for i in picked)
+
+    chosen_paths = [c[0] for i, c in enumerate(candidates) if i in chosen]
+    skipped_paths = [c[0] for i, c in enumerate(candidates) if i not in chosen]
+    return chosen_paths, budget - remaining, skipped_paths
+
+
+def select_within_budget(folder, relative_paths, budget, estimator, priority_rules):
+    """Estimates every candidate and packs them into budget; see pack_to_budget for the result.
+
+    Files that can't be stat'ed or read, or that the export will refuse, count as 0 tokens and stay
+    in, so the export reports them as read errors the same way it does without a budget.
+    """
+    candidates = []
+    for relative_path in relative_paths:
+        try:
+            tokens = estimator.estimate(folder, relative_path)
+        except (OSError, ValueError):
+            tokens = 0
+        candidates.append((relative_path, tokens, priority_rules.priority_of(relative_path)))
+    return pack_to_budget(candidates, budget)
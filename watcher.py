@@ -0,0 +1,319 @@
+"""Watches a set of files and reports changes in debounced bursts, for automatic re-export."""
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+import sys
+import threading
+import time
+
+WATCH_DEBOUNCE_S = 0.5 # Quiet time after the last change before a burst is reported
+WATCH_MAX_DELAY_S = 5.0 # A burst that never goes quiet is still reported after this long
+WATCH_POLL_INTERVAL_S = 1.0 # Stat interval of the polling fallback
+
+# From <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+# IN_MODIFY is left out on purpose: a save usually fires it many times, IN_CLOSE_WRITE once
+INOTIFY_MASK = (IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+                | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR)
+_EVENT_HEADER = struct.Struct('iIII') # wd, mask, cookie, len
+
+
+def _load_libc_inotify():
+    """The libc handle if this platform has inotify, else None."""
+    if not sys.platform.startswith('linux'):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        libc.inotify_init1
+        libc.inotify_add_watch
+    except (OSError, AttributeError):
+        return None
+    libc.inotify_add_watch.argtypes = (ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32)
+    libc.inotify_rm_watch.argtypes = (ctypes.c_int, ctypes.c_int)
+    return libc
+
+
+def _group_by_dir(folder, relative_paths):
+    """{full directory path: {file name: relative_path}} for the paths."""
+    dirs = {}
+    for relative_path in relative_paths:
+        full_path = os.path.join(folder, relative_path)
+        dirs.setdefault(os.path.dirname(full_path), {})[os.path.basename(full_path)] = relative_path
+    return dirs
+
+
+class InotifyBackend:
+    """One inotify watch per directory holding a watched file, so editors that save by rename are caught too.
+
+    A directory that is missing, or whose watch goes away (deleted, moved), is polled every
+    WATCH_POLL_INTERVAL_S until it can be watched again; its files are then reported as changed.
+    """
+
+    name = "inotify"
+
+    def __init__(self, libc, folder):
+        self.libc = libc
+        self.folder = folder
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.wake_read, self.wake_write = os.pipe()
+        os.set_blocking(self.wake_write, False)
+        self.watches = {} # wd -> (directory, {file name: relative_path})
+        self.dir_watches = {} # directory -> wd
+        self.lost = {} # directory -> {file name: relative_path}, for wanted directories without a watch
+
+    def _add_watch(self, directory):
+        """The new watch descriptor for directory, or None if it doesn't exist. Raises OSError (e.g. out of watches)."""
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(directory), INOTIFY_MASK)
+        if wd < 0:
+            error = ctypes.get_errno()
+            if error in (errno.ENOENT, errno.ENOTDIR):
+                return None
+            raise OSError(error, f"inotify_add_watch failed for {directory}: {os.strerror(error)}")
+        self.dir_watches[directory] = wd
+        return wd
+
+    def update(self, relative_paths):
+        """Watches exactly the directories of relative_paths. Raises OSError (e.g. out of watches)."""
+        wanted = _group_by_dir(self.folder, relative_paths)
+        for directory in set(self.dir_watches) - set(wanted):
+            self.libc.inotify_rm_watch(self.fd, self.dir_watches.pop(directory))
+        self.lost = {}
+        for directory, names in wanted.items():
+            wd = self.dir_watches.get(directory)
+            if wd is None:
+                wd = self._add_watch(directory)
+                if wd is None:
+                    self.lost[directory] = names # Watched once it exists
+                    continue
+            self.watches[wd] = (directory, names)
+        self.watches = {wd: entry for wd, entry in self.watches.items() if self.dir_watches.get(entry[0]) == wd}
+
+    def _rewatch_lost(self):
+        """Watches lost directories that exist again. Returns their files' paths, which may have changed meanwhile."""
+        changed = set()
+        for directory, names in list(self.lost.items()):
+            try:
+                wd = self._add_watch(directory)
+            except OSError as e:
+                print(f"Still polling for {directory}: {e}")
+                continue
+            if wd is not None:
+                del self.lost[directory]
+                self.watches[wd] = (directory, names)
+                changed.update(names.values())
+        return changed
+
+    def wait(self, timeout):
+        """Blocks up to timeout seconds (None for ever). Returns the set of changed relative paths."""
+        if self.lost: # Check on them while waiting
+            timeout = WATCH_POLL_INTERVAL_S if timeout is None else min(timeout, WATCH_POLL_INTERVAL_S)
+        readable, _, _ = select.select([self.fd, self.wake_read], [], [], timeout)
+        if self.wake_read in readable:
+            os.read(self.wake_read, 4096)
+        changed = self._read_events() if self.fd in readable else set()
+        if self.lost:
+            changed |= self._rewatch_lost()
+        return changed
+
+    def _read_events(self):
+        """The relative paths the pending inotify events are about."""
+        changed = set()
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return changed
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(data):
+            wd, mask, _cookie, name_len = _EVENT_HEADER.unpack_from(data, offset)
+            name = data[offset + _EVENT_HEADER.size:offset + _EVENT_HEADER.size + name_len].rstrip(b'\0')
+            offset += _EVENT_HEADER.size + name_len
+            if mask & IN_Q_OVERFLOW:
+                for _directory, names in self.watches.values(): # Events were lost, assume everything changed
+                    changed.update(names.values())
+                continue
+            entry = self.watches.get(wd)
+            if entry is None:
+                continue
+            directory, names = entry
+            if mask & (IN_DELETE_SELF | IN_MOVE_SELF | IN_IGNORED):
+                changed.update(names.values()) # The directory itself went away
+                if mask & IN_MOVE_SELF:
+                    self.libc.inotify_rm_watch(self.fd, wd) # Would follow the directory to its new name
+                del self.watches[wd]
+                if self.dir_watches.get(directory) == wd:
+                    del self.dir_watches[directory]
+                self.lost[directory] = names # Watched again once a directory by that name is back
+                continue
+            relative_path = names.get(os.fsdecode(name))
+            if relative_path is not None:
+                changed.add(relative_path)
+        return changed
+
+    def wake(self):
+        try:
+            os.write(self.wake_write, b'x')
+        except BlockingIOError:
+            pass # A wake-up is already pending
+        except OSError:
+            pass # Closed, nothing left to wake
+
+    def close(self):
+        for fd in (self.fd, self.wake_read, self.wake_write):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+
+
+class PollingBackend:
+    """Stats every watched file each WATCH_POLL_INTERVAL_S and reports the ones whose (size, mtime_ns) changed."""
+
+    name = "polling"
+
+    def __init__(self, folder, poll_interval_s=WATCH_POLL_INTERVAL_S):
+        self.folder = folder
+        self.poll_interval_s = poll_interval_s
+        self.snapshot = {} # relative_path -> (size, mtime_ns) or None if missing
+        self.wake_event = threading.Event()
+
+    def _stat(self, relative_path):
+        try:
+            st = os.stat(os.path.join(self.folder, relative_path))
+        except OSError:
+            return None
+        return (st.st_size, st.st_mtime_ns)
+
+    def update(self, relative_paths):
+        # Newly watched files get a baseline; they are not reported as changed
+        self.snapshot = {p: self.snapshot[p] if p in self.snapshot else self._stat(p) for p in relative_paths}
+
+    def wait(self, timeout):
+        interval = self.poll_interval_s if timeout is None else min(timeout, self.poll_interval_s)
+        if self.wake_event.wait(interval):
+            self.wake_event.clear()
+        changed = set()
+        for relative_path, previous in self.snapshot.items():
+            current = self._stat(relative_path)
+            if current != previous:
+                self.snapshot[relative_path] = current
+                changed.add(relative_path)
+        return changed
+
+    def wake(self):
+        self.wake_event.set()
+
+    def close(self):
+        pass
+
+
+class FileWatcher:
+    """Calls on_change(changed_relative_paths) from a background thread once a burst of changes settles.
+
+    Uses inotify where the platform has it and falls back to stat polling otherwise (or when the
+    inotify watch limit is hit). Changes are collected until nothing changed for debounce_s, so a burst
+    of saves gives one callback; a burst lasting longer than WATCH_MAX_DELAY_S is reported anyway.
+    """
+
+    def __init__(self, folder, relative_paths, on_change, debounce_s=WATCH_DEBOUNCE_S,
+                 poll_interval_s=WATCH_POLL_INTERVAL_S, use_inotify=True):
+        self.folder = os.path.abspath(folder)
+        self.on_change = on_change
+        self.debounce_s = debounce_s
+        self.poll_interval_s = poll_interval_s
+        self.backend = None
+        libc = _load_libc_inotify() if use_inotify else None
+        if libc is not None:
+            try:
+                self.backend = InotifyBackend(libc, self.folder)
+                self.backend.update(relative_paths)
+            except OSError as e:
+                print(f"inotify unavailable, polling for changes instead: {e}")
+                if self.backend is not None:
+                    self.backend.close()
+                self.backend = None
+        if self.backend is None:
+            self.backend = PollingBackend(self.folder, poll_interval_s)
+            self.backend.update(relative_paths)
+        self.lock = threading.Lock()
+        self.pending_paths = None # New path list handed over by set_paths, applied on the watcher thread
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="file-watcher", daemon=True)
+
+    @property
+    def backend_name(self):
+        return self.backend.name
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def set_paths(self, relative_paths):
+        """Replaces the watched files; safe to call from any thread."""
+        with self.lock:
+            self.pending_paths = list(relative_paths)
+            self.backend.wake() # Under the lock: the watcher thread may be replacing the backend
+
+    def stop(self):
+        self.stop_event.set()
+        with self.lock:
+            self.backend.wake()
+        if self.thread.is_alive() and self.thread is not threading.current_thread():
+            self.thread.join()
+        self.backend.close()
+
+    def _apply_pending_paths(self):
+        with self.lock:
+            relative_paths, self.pending_paths = self.pending_paths, None
+        if relative_paths is None:
+            return
+        try:
+            self.backend.update(relative_paths)
+        except OSError as e:
+            print(f"inotify failed, polling for changes instead: {e}")
+            backend = PollingBackend(self.folder, self.poll_interval_s)
+            backend.update(relative_paths)
+            with self.lock:
+                failed, self.backend = self.backend, backend
+            failed.close() # Nobody wakes it any more, its descriptors can go
+
+    def _run(self):
+        changed = set()
+        first_change = last_change = None
+        while not self.stop_event.is_set():
+            self._apply_pending_paths()
+            if changed:
+                now = time.monotonic()
+                timeout = max(0.0, min(last_change + self.debounce_s, first_change + WATCH_MAX_DELAY_S) - now)
+            else:
+                timeout = None # Nothing pending, sleep until the next event
+            new_changes = self.backend.wait(timeout)
+            if self.stop_event.is_set():
+                break
+            now = time.monotonic()
+            if new_changes:
+                if not changed:
+                    first_change = now
+                changed |= new_changes
+                last_change = now
+            if changed and (now - last_change >= self.debounce_s or now - first_change >= WATCH_MAX_DELAY_S):
+                burst, changed = changed, set()
+                try:
+                    self.on_change(burst)
+                except Exception as e:
+                    print(f"Watch callback failed: {e}")
@@ -0,0 +1,102 @@
+"""Per-project memory of the GUI in one SQLite file: exclusions and selected files for every folder opened.
+
+Projects are keyed by their normalized absolute folder; selections are one (project, path) row per
+selected file, so restoring a project is one indexed query and saving a change only touches the rows
+that changed. Paths are stored as-is, commas and all.
+"""
+import os
+import sqlite3
+import time
+
+WORKSPACE_FILE = "code_exporter_workspace.db" # Relative like code_exporter_config.ini
+SCHEMA_VERSION = 1
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS projects (
+    id INTEGER PRIMARY KEY,
+    folder TEXT NOT NULL UNIQUE,
+    exclude_strings TEXT NOT NULL DEFAULT '',
+    exclude_extensions TEXT NOT NULL DEFAULT '',
+    last_used REAL NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS selections (
+    project_id INTEGER NOT NULL REFERENCES projects(id) ON DELETE CASCADE,
+    path TEXT NOT NULL,
+    PRIMARY KEY (project_id, path)
+) WITHOUT ROWID;
+"""
+
+
+def folder_key(folder):
+    return os.path.normcase(os.path.abspath(folder))
+
+
+class WorkspaceStore:
+    """Projects and their selections. Use from one thread; every method commits before returning."""
+
+    def __init__(self, db_path=WORKSPACE_FILE):
+        """Opens or creates the database. Raises sqlite3.Error."""
+        self.db_path = db_path
+        self.conn = sqlite3.connect(db_path)
+        try:
+            self.conn.execute("PRAGMA journal_mode=WAL") # Small appends instead of rewriting pages under a lock
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+            self.conn.execute("PRAGMA foreign_keys=ON")
+            version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+            if version > SCHEMA_VERSION:
+                raise sqlite3.DatabaseError(f"{db_path} was written by a newer version (schema {version})")
+            with self.conn:
+                self.conn.executescript(_SCHEMA)
+                self.conn.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+        except sqlite3.Error:
+            self.conn.close()
+            raise
+
+    def close(self):
+        self.conn.close()
+
+    def _project_id(self, folder, create=False):
+        key = folder_key(folder)
+        row = self.conn.execute("SELECT id FROM projects WHERE folder = ?", (key,)).fetchone()
+        if row is not None:
+            return row[0]
+        if not create:
+            return None
+        return self.conn.execute("INSERT INTO projects (folder, last_used) VALUES (?, ?)", (key, time.time())).lastrowid
+
+    def project(self, folder):
+        """{'exclude_strings', 'exclude_extensions', 'last_used'} saved for folder, or None if it is unknown."""
+        row = self.conn.execute("SELECT exclude_strings, exclude_extensions, last_used FROM projects WHERE folder = ?",
+                                (folder_key(folder),)).fetchone()
+        if row is None:
+            return None
+        return {'exclude_strings': row[0], 'exclude_extensions': row[1], 'last_used': row[2]}
+
+    def save_project(self, folder, exclude_strings, exclude_extensions):
+        with self.conn:
+            project_id = self._project_id(folder, create=True)
+            self.conn.execute("UPDATE projects SET exclude_strings = ?, exclude_extensions = ?, last_used = ? WHERE id = ?",
+                              (exclude_strings, exclude_extensions, time.time(), project_id))
+
+    def selected_paths(self, folder):
+        project_id = self._project_id(folder)
+        if project_id is None:
+            return set()
+        return {row[0] for row in self.conn.execute("SELECT path FROM selections WHERE project_id = ?", (project_id,))}
+
+    def update_selection(self, folder, added=(), removed=()):
+        """Adds and removes selected paths for folder; paths not mentioned keep their state."""
+        with self.conn:
+            project_id = self._project_id(folder, create=True)
+            self.conn.executemany("INSERT OR IGNORE INTO selections (project_id, path) VALUES (?, ?)",
+                                  ((project_id, path) for path in added))
+            self.conn.executemany("DELETE FROM selections WHERE project_id = ? AND path = ?",
+                                  ((project_id, path) for path in removed))
+
+    def replace_selection(self, folder, selected_paths):
+        """Makes selected_paths the whole selection of folder."""
+        with self.conn:
+            project_id = self._project_id(folder, create=True)
+            self.conn.execute("DELETE FROM selections WHERE project_id = ?", (project_id,))
+            self.conn.executemany("INSERT OR IGNORE INTO selections (project_id, path) VALUES (?, ?)",
+                                  ((project_id, path) for path in selected_paths))